@@ -0,0 +1,73 @@
+import asyncio
+import concurrent.futures
+import functools
+import threading
+
+import http_utils
+import totle_client
+
+##############################################################################################
+#
+# asyncio front end for the (blocking) API clients
+#
+# Every client keeps its synchronous get_quote; the coroutines below run those calls on a shared
+# worker pool so that any number of quotes can be in flight at once, bounded by one global limit
+# (MAX_CONCURRENCY) no matter how many pairs, trade sizes, or aggregators are being compared.
+
+MAX_CONCURRENCY = 16
+
+_executor = None
+_semaphores = {} # event loop => asyncio.Semaphore (a semaphore can only be used on the loop it was created for)
+_lock = threading.Lock()
+
+
+def configure(max_concurrency):
+    """Sets the global limit on in-flight quote requests"""
+    global MAX_CONCURRENCY, _executor
+    with _lock:
+        MAX_CONCURRENCY = max_concurrency
+        if _executor: _executor.shutdown(wait=False)
+        _executor = None
+        _semaphores.clear()
+    # make sure the connection pools can hold at least one connection per concurrent request
+    if http_utils.POOL_MAXSIZE < max_concurrency: http_utils.configure(pool_maxsize=max_concurrency)
+
+def executor():
+    global _executor
+    with _lock:
+        if not _executor:
+            _executor = concurrent.futures.ThreadPoolExecutor(max_workers=MAX_CONCURRENCY, thread_name_prefix='quote')
+        return _executor
+
+def semaphore():
+    loop = asyncio.get_running_loop()
+    with _lock:
+        if loop not in _semaphores:
+            _semaphores[loop] = asyncio.Semaphore(MAX_CONCURRENCY)
+        return _semaphores[loop]
+
+async def run(func, *args, **kwargs):
+    """Runs the blocking func(*args, **kwargs) on the quote worker pool under the global concurrency limit"""
+    async with semaphore():
+        future = asyncio.get_running_loop().run_in_executor(executor(), functools.partial(func, *args, **kwargs))
+        try:
+            return await asyncio.shield(future)
+        except asyncio.CancelledError:
+            # the worker thread can't be interrupted, so hold the slot until it is done to keep the limit honest
+            await asyncio.wait([future])
+            raise
+
+
+##############################################################################################
+#
+# Quote coroutines
+#
+
+async def get_quote(client, from_token, to_token, from_amount=None, to_amount=None, dex=None, verbose=False, debug=False):
+    """Async version of client.get_quote for any aggregator client module (dexag_client, oneinch_client, etc.)"""
+    dex_kw = {'dex': dex} if dex else {} # clients have different defaults for dex (e.g. dexag uses 'all')
+    return await run(client.get_quote, from_token, to_token, from_amount=from_amount, to_amount=to_amount, verbose=verbose, debug=debug, **dex_kw)
+
+async def try_swap(label, from_token, to_token, exchange=None, params={}, verbose=False, debug=False):
+    """Async version of totle_client.try_swap"""
+    return await run(totle_client.try_swap, label, from_token, to_token, exchange=exchange, params=params, verbose=verbose, debug=debug)
@@ -1,4 +1,5 @@
-import requests
+import http_utils
+import json_utils
 
 API_BASE = 'https://api.binance.com/api/v1'
 EXCHANGE_INFO_ENDPOINT = API_BASE + '/exchangeInfo'
@@ -24,7 +25,7 @@ def fee_pct():
 
 def get_pairs(quote='ETH'):
     """Returns pairs for the given quote asset"""
-    j = requests.get(EXCHANGE_INFO_ENDPOINT).json()
+    j = json_utils.loads(http_utils.get(EXCHANGE_INFO_ENDPOINT).content)
 
     # if j.get('msg'): # not sure this simple query can possibly return an error
     return [ (s['baseAsset'], s['quoteAsset']) for s in j['symbols'] if s['quoteAsset'] == quote ]
@@ -38,7 +39,7 @@ DEPTH_LEVELS = [5, 10, 20, 50, 100, 500, 1000, 5000]
 
 def get_depth(base, quote, level=4):
     query = { 'symbol': base + quote, 'limit': DEPTH_LEVELS[level] }
-    j = requests.get(DEPTH_ENDPOINT, params=query).json()
+    j = json_utils.loads(http_utils.get(DEPTH_ENDPOINT, params=query).content)
 
     if j.get('msg'):
         raise BinanceAPIException(f"{j['msg']} ({j['code']}): request was {query} response was {j}")
@@ -1,4 +1,5 @@
-import requests
+import http_utils
+import json_utils
 
 API_BASE = 'https://api.cryptowat.ch'
 
@@ -26,7 +27,7 @@ def orderbook_endpoint(cex_name, base, quote):
 
 def get_trades(base, quote):
     """returns an array of dicts, which include timestamp, price, and amount for each trade"""
-    j = requests.get(trades_endpoint(base, quote)).json()
+    j = json_utils.loads(http_utils.get(trades_endpoint(base, quote)).content)
 
     # {"result": [ [0, 1571697560, 0.0057971780392391387, 1023.32814569], [0, 1571698284, 0.00581010009964029642, 138.079838830444032476] ], ... }
     result = []
@@ -42,7 +43,7 @@ def get_books(cex_name, base, quote='ETH'):
     #   liquid quoine bitbay hitbtc binance binance-us huobi poloniex coinbase-pro bitstamp bit-z bithumb coinone dex okcoin
     # https://api.cryptowat.ch/markets/binance/omgeth/orderbook
     url = orderbook_endpoint(cex_name, base, quote)
-    j = requests.get(orderbook_endpoint(cex_name, base, quote)).json()
+    j = json_utils.loads(http_utils.get(orderbook_endpoint(cex_name, base, quote)).content)
     r = j['result']
     return r['bids'], r['asks']
 
@@ -127,8 +127,10 @@ def check_cw_api_with_totle_trades_api(verbose=False, print_last=False):
         for a in e.args: print(a)
 
 ########################################################################################################################
-# main
+def main():
+    # recommend_better_tokens()
+    check_cw_api_with_totle_trades_api()
 
-# recommend_better_tokens()
-check_cw_api_with_totle_trades_api()
+if __name__ == "__main__":
+    main()
 
@@ -5,8 +5,8 @@ import os
 import sys
 from datetime import datetime
 from collections import defaultdict
+from array import array
 import csv
-import json
 
 import dexag_client
 import oneinch_client
@@ -14,68 +14,126 @@ import paraswap_client
 import totle_client
 
 import exchange_utils
-from v2_compare_prices import canonicalize_and_sort_splits
+import json_utils
+import summary_index
+from split_utils import canonicalize_and_sort_splits, canonical_splits_from_str, parse_literal
+from v2_compare_prices import read_savings_parquet
 
 CSV_DATA_DIR = f"{os.path.dirname(os.path.abspath(__file__))}/outputs"
 
 # don't lru_cache() a generator, the second time it will not produce any data
 def csv_row_gen(file, only_splits=False, only_non_splits=False, only_totle_splits=False, only_totle_non_splits=False):
     # print(f"csv_row_gen doing {file}, only_splits={only_splits}, only_non_splits={only_non_splits}) ...")
-    with open(file, newline='') as csvfile:
-        reader = csv.DictReader(csvfile, fieldnames=None)
-
-        for row in reader:
-            splits = canonicalize_and_sort_splits(row.get('splits'))
-            totle_splits = canonicalize_and_sort_splits(row.get('totle_splits'))
-
-            if only_splits and len(splits) < 2: continue
-            if only_totle_splits and len(totle_splits) < 2: continue
-            if only_non_splits and len(splits) > 1: continue
-            if only_totle_non_splits and len(totle_splits) > 1: continue
+    columns = load_savings_csv(file)
+    row_columns = [ columns[c] for c in "id time action trade_size token exchange exchange_price totle_used totle_price pct_savings splits totle_splits ex_prices".split() ]
 
-            id, time, action = row['id'], row['time'], row['action']  # datetime.fromisoformat(row['time']).isoformat(' ', 'seconds')
+    for id, time, action, trade_size, token, exchange, exchange_price, totle_used, totle_price, pct_savings, splits, totle_splits, ex_prices in zip(*row_columns):
+        if only_splits and len(splits) < 2: continue
+        if only_totle_splits and len(totle_splits) < 2: continue
+        if only_non_splits and len(splits) > 1: continue
+        if only_totle_non_splits and len(totle_splits) > 1: continue
 
-            trade_size, token = float(row['trade_size']), row['token']
-            exchange, exchange_price = row['exchange'], float(row['exchange_price'])
-            totle_used, totle_price, pct_savings = row['totle_used'], float(row['totle_price']), float(row['pct_savings']),
-            # Some older CSVs have the non-splittable dexs in the ex_prices column
-            ex_prices = exchange_utils.canonical_and_splittable(eval(row.get('ex_prices') or '{}'))
+        if pct_savings < -1.0:
+            print(f"{pct_savings} vs {exchange} buying {token} for {trade_size} ETH using {totle_used} {totle_splits} id={id}")
 
-            if pct_savings < -1.0:
-                print(f"{pct_savings} vs {exchange} buying {token} for {trade_size} ETH using {totle_used} {totle_splits} id={id}")
+        yield time, action, trade_size, token, exchange, exchange_price, totle_used, totle_price, pct_savings, splits, ex_prices
 
-            yield time, action, trade_size, token, exchange, exchange_price, totle_used, totle_price, pct_savings, splits, ex_prices
 
+########################################################################################################################
+# Typed column loader for savings CSVs
+
+SAVINGS_COLUMNS = "time id action trade_size token quote exchange exchange_price totle_used totle_price totle_splits pct_savings splits ex_prices".split()
+FLOAT_COLUMNS = ['trade_size', 'exchange_price', 'totle_price', 'pct_savings']
+SPLIT_COLUMNS = ['splits', 'totle_splits']
+
+@functools.lru_cache(maxsize=65536)
+def parse_ex_prices(ex_prices_str):
+    # Some older CSVs have the non-splittable dexs in the ex_prices column
+    return exchange_utils.canonical_and_splittable(parse_literal(ex_prices_str))
+
+def load_savings_csv(file):
+    """Returns the columns of a savings CSV (or a .parquet file written by SavingsParquet) as a dict of column name => list.
+    Float columns are array('d'), splits and ex_prices are parsed dicts. Identical split strings share one parsed object,
+    so don't modify them. Columns missing from older files are filled with None (or {} for splits and ex_prices)"""
+    if file.endswith('.parquet'):
+        rows = list(read_savings_parquet(file))
+        header = list(rows[0].keys()) if rows else []
+        raw_columns = { c: [ r[c] for r in rows ] for c in header }
+        if 'time' in raw_columns: raw_columns['time'] = [ t and t.isoformat() for t in raw_columns['time'] ]
+    else:
+        with open(file, newline='') as csvfile:
+            reader = csv.reader(csvfile)
+            header = next(reader, [])
+            rows = [ r if len(r) == len(header) else (r + [''] * len(header))[:len(header)] for r in reader ]
+        raw_columns = dict(zip(header, map(list, zip(*rows)))) if rows else { c: [] for c in header }
+
+    n_rows = len(rows)
+    columns = {}
+    for c in set(SAVINGS_COLUMNS) | set(header):
+        values = raw_columns.get(c)
+        if c in SPLIT_COLUMNS:
+            columns[c] = [ canonical_splits_from_str(v) if isinstance(v, str) else canonicalize_and_sort_splits(v) for v in values ] if values else [{}] * n_rows
+        elif c == 'ex_prices':
+            columns[c] = [ parse_ex_prices(v) if isinstance(v, str) else exchange_utils.canonical_and_splittable(v or {}) for v in values ] if values else [{}] * n_rows
+        elif c in FLOAT_COLUMNS:
+            columns[c] = array('d', map(float, values)) if values else [None] * n_rows
+        else:
+            columns[c] = values if values else [None] * n_rows
+
+    return columns
+
+
+def parse_csv_file(file, **kwargs):
+    """Returns (per_token_savings, slip_price_diff_splits) for a single file as plain dicts (see parse_csv_files)"""
+    per_token_savings, slip_price_diff_splits = {}, {}
+    per_file_base_prices = {}
+    for _, _, trade_size, token, exchange, exchange_price, _, totle_price, pct_savings, splits, _ in csv_row_gen(file, **kwargs):
+        if not per_file_base_prices.get(token): # this assumes prices recorded from lowest to highest for a token
+            per_file_base_prices[token] = totle_price  # should be same for all aggs, but is slightly different sometimes
+
+        slip = (totle_price / per_file_base_prices[token]) - 1.0  # should be 0 for the lowest trade_size
+        # i.e. slip = (totle_price - per_file_base_prices[token]) / per_file_base_prices[token]
+
+        slip = 0.0 if slip < 0.0 and slip > -0.00001 else slip # get rid of -0.0000
+        price_diff = (totle_price - exchange_price) / exchange_price
+
+        slip_price_diff_splits.setdefault(token, {}).setdefault(trade_size, {}).setdefault(exchange, []).append((slip, price_diff, splits))
+        per_token_savings.setdefault(token, {}).setdefault(trade_size, {}).setdefault(exchange, []).append(pct_savings)
 
+    return per_token_savings, slip_price_diff_splits
 
 @functools.lru_cache()
 def parse_csv_files(csv_files, **kwargs):
     """Returns 2 dicts containing pct savings and prices/split data both having the form
     token: { trade_size:  {exchange: [sample, sample, ...], ...}
     kwargs have these defaults: only_splits=False, only_non_splits=False
+    With the summary_index enabled, only new or changed files are parsed
     """
 
     per_token_savings = defaultdict(lambda: defaultdict(lambda: defaultdict(list)))
     slip_price_diff_splits = defaultdict(lambda: defaultdict(lambda: defaultdict(list)))
 
+    kind = summary_index.index_kind('parse_csv_files', **kwargs)
     for file in csv_files:
-        per_file_base_prices = {}
-        for _, _, trade_size, token, exchange, exchange_price, _, totle_price, pct_savings, splits, _ in csv_row_gen(file, **kwargs):
-            if not per_file_base_prices.get(token): # this assumes prices recorded from lowest to highest for a token
-                per_file_base_prices[token] = totle_price  # should be same for all aggs, but is slightly different sometimes
-
-            slip = (totle_price / per_file_base_prices[token]) - 1.0  # should be 0 for the lowest trade_size
-            # i.e. slip = (totle_price - per_file_base_prices[token]) / per_file_base_prices[token]
-
-            slip = 0.0 if slip < 0.0 and slip > -0.00001 else slip # get rid of -0.0000
-            price_diff = (totle_price - exchange_price) / exchange_price
-
-            slip_price_diff_splits[token][trade_size][exchange].append((slip, price_diff, splits))
-            per_token_savings[token][trade_size][exchange].append(pct_savings)
-
+        file_savings, file_slip_price_diff_splits = summary_index.file_partial(kind, file, lambda f: parse_csv_file(f, **kwargs))
+        summary_index.merge_samples(per_token_savings, file_savings)
+        summary_index.merge_samples(slip_price_diff_splits, file_slip_price_diff_splits)
 
     return per_token_savings, slip_price_diff_splits
 
+def read_slippage_csv(file):
+    """Returns {trade_size: [ (price, slippage, cost), ... ]} for a single *buy_slippage.csv file"""
+    print(f"reading {file} ...")
+    ts_pscs = {}
+    with open(file, newline='') as csvfile:
+        reader = csv.DictReader(csvfile, fieldnames=None)
+        # time,action,trade_size,token,exchange,exchange_price,slippage,cost
+        for row in reader:
+            # time = datetime.fromisoformat(row['time']).isoformat(' ', 'seconds')
+            trade_size = float(row['trade_size'])
+            ts_pscs.setdefault(trade_size, []).append( (float(row['exchange_price']), float(row['slippage']), float(row['cost'])) )
+    return ts_pscs
+
 @functools.lru_cache()
 def read_slippage_csvs(csv_files=None):
     """Returns a dict of price_slip_cost data points, i.e. {token: {trade_size: {exchange: [ (psc), (psc) ] }}}"""
@@ -83,16 +141,11 @@ def read_slippage_csvs(csv_files=None):
 
     tok_ts_ex_pscs = defaultdict(lambda: defaultdict(lambda: defaultdict(list)))
 
+    kind = summary_index.index_kind('read_slippage_csvs')
     for file in csv_files:
-        print(f"reading {file} ...")
         f_exchange, f_token, *_ = os.path.basename(file).split('_')
-        with open(file, newline='') as csvfile:
-            reader = csv.DictReader(csvfile, fieldnames=None)
-            # time,action,trade_size,token,exchange,exchange_price,slippage,cost
-            for row in reader:
-                # time = datetime.fromisoformat(row['time']).isoformat(' ', 'seconds')
-                trade_size = float(row['trade_size'])
-                tok_ts_ex_pscs[f_token][trade_size][f_exchange].append( (float(row['exchange_price']), float(row['slippage']), float(row['cost'])) )
+        for trade_size, pscs in summary_index.file_partial(kind, file, read_slippage_csv).items():
+            tok_ts_ex_pscs[f_token][trade_size][f_exchange] += pscs
 
     return tok_ts_ex_pscs # TODO: don't return defaultdicts, users should get key errors
 
@@ -125,7 +178,7 @@ def get_all_splits_by_agg(files=None):
     tok_ts_splits_by_agg = defaultdict(lambda: defaultdict(lambda: defaultdict(list)))
 
     for f in files:
-        for token, ts_splits_by_agg in json.load(open(f)).items():
+        for token, ts_splits_by_agg in json_utils.load(open(f)).items():
             for ts, agg_splits in ts_splits_by_agg.items():
                 for agg, split in agg_splits.items():
                     tok_ts_splits_by_agg[token][ts][agg].append(split)
@@ -140,7 +193,7 @@ def get_all_dexs_with_pair(files=None):
     tok_ts_dexs_with_pair = defaultdict(lambda: defaultdict(list))
 
     for f in files:
-        for token, ts_dexs_with_pair in json.load(open(f)).items():
+        for token, ts_dexs_with_pair in json_utils.load(open(f)).items():
             for ts, dexs in ts_dexs_with_pair.items():
                 tok_ts_dexs_with_pair[token][ts] = list(set(tok_ts_dexs_with_pair[token][ts] + dexs))
 
@@ -153,7 +206,7 @@ def get_all_agg_prices(files=None):
     tok_ts_agg_prices = defaultdict(lambda: defaultdict(lambda: defaultdict(list)))
 
     for f in files:
-        for token, ts_agg_prices in json.load(open(f)).items():
+        for token, ts_agg_prices in json_utils.load(open(f)).items():
             for ts, agg_prices in ts_agg_prices.items():
                 for agg, price in agg_prices.items():
                     tok_ts_agg_prices[token][ts][agg].append(price)
@@ -167,7 +220,7 @@ def get_all_dex_prices(files=None):
     tok_ts_dex_prices = defaultdict(lambda: defaultdict(lambda: defaultdict(list)))
 
     for f in files:
-        for token, ts_agg_prices in json.load(open(f)).items():
+        for token, ts_agg_prices in json_utils.load(open(f)).items():
             for ts, agg_prices in ts_agg_prices.items():
                 # test for agg_name keys because Totle's JSON structure is different from aggs
                 if any(map(lambda k: k in AGG_NAMES, agg_prices.keys())):
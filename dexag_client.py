@@ -2,6 +2,9 @@ import functools
 import threading
 
 import requests
+import http_utils
+import json_utils
+import quote_cache
 import json
 import token_utils
 
@@ -50,7 +53,7 @@ def exchanges():
 @functools.lru_cache()
 def get_pairs(quote='ETH'):
     # DEX.AG doesn't have a pairs endpoint, so we just use its tokens endpoint to get tokens, which are assumed to pair with quote
-    tokens_json = requests.get(TOKENS_ENDPOINT).json()
+    tokens_json = json_utils.loads(http_utils.get(TOKENS_ENDPOINT).content)
 
     # use only the tokens that are listed in token_utils.tokens() and use the canonical name
     canonical_symbols = [token_utils.canonical_symbol(t) for t in tokens_json]  # may contain None values
@@ -69,16 +72,16 @@ JSON_FILENAME = 'data/cached_dexag_tokens.json'
 
 @functools.lru_cache(1)
 def supported_tokens_critical():
-    r = requests.get(TOKENS_NAMES_ENDPOINT)
+    r = http_utils.get(TOKENS_NAMES_ENDPOINT)
     try: # this often fails to return a good response, so we used cached data when it does
-        supp_tokens_json = r.json()
+        supp_tokens_json = json_utils.loads(r.content)
         with open(JSON_FILENAME, 'w') as f:
-            json.dump(supp_tokens_json, f)
+            json_utils.dump(supp_tokens_json, f)
 
-    except json.decoder.JSONDecodeError as e:
+    except json_utils.JSONDecodeError as e:
         print(f"dexag_client.supported_tokens() using {JSON_FILENAME}")
         with open(JSON_FILENAME) as f:
-            supp_tokens_json = json.load(f)
+            supp_tokens_json = json_utils.load(f)
 
     return [t['symbol'] for t in (supp_tokens_json)]
 
@@ -107,6 +110,7 @@ def calc_amounts_and_price(from_amount, to_amount, dexag_price):
 
 # get quote
 AG_DEX = 'ag'
+@quote_cache.cached
 def get_quote(from_token, to_token, from_amount=None, to_amount=None, dex='all', verbose=False, debug=False):
     """Returns the price in terms of the from_token - i.e. how many from_tokens to purchase 1 to_token"""
 
@@ -132,8 +136,8 @@ def get_quote(from_token, to_token, from_amount=None, to_amount=None, dex='all',
     if debug: print(f"REQUEST to {PRICE_ENDPOINT}:\n{json.dumps(query, indent=3)}\n\n")
     r = None
     try:
-        r = requests.get(PRICE_ENDPOINT, params=query)
-        j = r.json()
+        r = http_utils.get(PRICE_ENDPOINT, params=query)
+        j = json_utils.loads(r.content)
         if debug: print(f"RESPONSE from {PRICE_ENDPOINT}:\n{json.dumps(j, indent=3)}\n\n")
 
         if 'error' in j: raise ValueError(j['error'])
@@ -201,8 +205,8 @@ def get_swap(from_token, to_token, from_amount=None, to_amount=None, dex='ag', f
     if debug: print(f"REQUEST to {TRADE_ENDPOINT}:\n{json.dumps(query, indent=3)}\n\n")
     r = None
     try:
-        r = requests.get(TRADE_ENDPOINT, params=query)
-        j = r.json()
+        r = http_utils.get(TRADE_ENDPOINT, params=query)
+        j = json_utils.loads(r.content)
         if debug: print(f"RESPONSE from {TRADE_ENDPOINT}:\n{json.dumps(j, indent=3)}\n\n")
 
         if 'error' in j: raise ValueError(j['error'])
@@ -1,7 +1,8 @@
 import json
 import sys
 import functools
-import requests
+import http_utils
+import json_utils
 import token_utils
 
 API_BASE = 'https://dex.watch/api'
@@ -28,7 +29,7 @@ def exchanges():
 
 @functools.lru_cache(1)
 def exchanges_json():
-    r = requests.get(EXCHANGES_ENDPOINT).json()
+    r = json_utils.loads(http_utils.get(EXCHANGES_ENDPOINT).content)
     return r['exchanges']
 
 
@@ -39,7 +40,7 @@ def pairs():
 
 @functools.lru_cache(1)
 def pairs_json():
-    r = requests.get(PAIRS_ENDPOINT).json()
+    r = json_utils.loads(http_utils.get(PAIRS_ENDPOINT).content)
     return r['pairs']
 
 
@@ -49,6 +50,6 @@ def eth_pair_json(token, interval='1d'):
     token_addr_without_0x = token_utils.addr(token)[2:]
 
     url = f"{PAIR_ETH_ENDPOINT}/{token_addr_without_0x}"
-    r = requests.get(url, params=query).json()
+    r = json_utils.loads(http_utils.get(url, params=query).content)
     return r['per_dexes']
 
@@ -58,13 +58,14 @@ OVER_TIME_CSVS = [
 ]
 
 
-ex_label_ts_price, ex_label_ts_slippage = get_prices_and_slippage(OVER_TIME_CSVS, DEX_STUDIED)
-
-ts_dicts = sum([list(map(dict, label_ts_prices.values())) for ex, label_ts_prices in ex_label_ts_price.items()], [])
-trade_sizes = summarize_csvs.sorted_trade_sizes(*ts_dicts)
-
-print_over_time_csv(ex_label_ts_price, trade_sizes, label="Absolute Price")
-print_over_time_csv(ex_label_ts_slippage, trade_sizes, label="Price Slippage")
+def main():
+    ex_label_ts_price, ex_label_ts_slippage = get_prices_and_slippage(OVER_TIME_CSVS, DEX_STUDIED)
 
+    ts_dicts = sum([list(map(dict, label_ts_prices.values())) for ex, label_ts_prices in ex_label_ts_price.items()], [])
+    trade_sizes = summarize_csvs.sorted_trade_sizes(*ts_dicts)
 
+    print_over_time_csv(ex_label_ts_price, trade_sizes, label="Absolute Price")
+    print_over_time_csv(ex_label_ts_slippage, trade_sizes, label="Price Slippage")
 
+if __name__ == "__main__":
+    main()
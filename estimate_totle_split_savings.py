@@ -1,14 +1,18 @@
 import sys
 import glob
 import functools
+import concurrent.futures
 import csv
+import heapq
 from collections import defaultdict
 
 import dexag_client
 import data_import
+import estimator_cache
 import exchange_utils
 import slippage_curves
-from v2_compare_prices import get_pct_savings, get_filename_base, SavingsCSV
+from split_utils import parse_literal
+from v2_compare_prices import get_pct_savings, get_filename_base, savings_writer
 
 #######################################################################################################################
 # totle_vs_agg CSV parsing (summary creation)
@@ -23,56 +27,108 @@ def get_cost_comparisons(csv_files):
             continue
 
         # Get price and split data, estimate Totle savings from splitting, and record estimates along with metrics for accuracy of price curves
-        for time, action, trade_size, token, agg, agg_price, no_split_totle_used, no_split_totle_price, no_split_pct_savings, agg_split, ex_prices in data_import.csv_row_gen(csv_file):
-            estimator = price_estimators.get(token)
-            if not estimator:
-                print(f"\n\nskipping {agg} {action} {token} for {trade_size} ETH because no price estimator exists for {token}")
-                continue
-            dexs_with_one_price_point = [e for e, pp in estimator.num_price_points.items() if pp < 2]
-            if any(dexs_with_one_price_point):
-                print(f"\n\nskipping {agg} {action} {token} for {trade_size} ETH because price estimator for {token} has insufficient price data for {dexs_with_one_price_point}")
-                continue
-
-            actual_agg_dest_amount = trade_size / agg_price
-
-            exclude_dexs = ['Radar Relay'] # always exclude Radar Relay, Totle uses 0xMesh
+        for row in csv_rows(csv_file):
+            cost_comparison = get_cost_comparison(row, price_estimators.get(row[3]))
+            if cost_comparison: yield cost_comparison
+
+def get_cost_comparison(row, estimator):
+    """Returns cost comparison data for a row from data_import.csv_row_gen or None if the row can't be estimated"""
+    time, action, trade_size, token, agg, agg_price, no_split_totle_used, no_split_totle_price, no_split_pct_savings, agg_split, ex_prices = row
+    if not estimator:
+        print(f"\n\nskipping {agg} {action} {token} for {trade_size} ETH because no price estimator exists for {token}")
+        return None
+    dexs_with_one_price_point = [e for e, pp in estimator.num_price_points.items() if pp < 2]
+    if any(dexs_with_one_price_point):
+        print(f"\n\nskipping {agg} {action} {token} for {trade_size} ETH because price estimator for {token} has insufficient price data for {dexs_with_one_price_point}")
+        return None
+
+    actual_agg_dest_amount = trade_size / agg_price
+
+    exclude_dexs = ['Radar Relay'] # always exclude Radar Relay, Totle uses 0xMesh
+    totle_solution = slippage_curves.splitting_algorithm(trade_size, estimator, exclude_dexs=exclude_dexs)
+    est_totle_dest_amount, est_totle_split_pct_savings = estimate_savings(totle_solution, estimator, actual_agg_dest_amount, agg_split)
+
+    # TODO Account for situations where agg knows Kyber is using Uniswap (or is excluding Uniswap reserve) and using Uniswap
+    if {'Uniswap', 'Kyber'}.issubset(totle_solution):
+        if ('Uniswap' in agg_split or 'Kyber' in agg_split) and not {'Uniswap', 'Kyber'}.issubset(agg_split):
+            # print(f"RECALCULATE: {time} {token} {trade_size} {est_totle_split_pct_savings} \nTotle: amt={est_totle_dest_amount} {totle_solution}\n{agg} amt={actual_agg_dest_amount} {agg_split}")
+            exclude_dexs += ['Kyber'] if 'Uniswap' in agg_split else ['Uniswap']
             totle_solution = slippage_curves.splitting_algorithm(trade_size, estimator, exclude_dexs=exclude_dexs)
             est_totle_dest_amount, est_totle_split_pct_savings = estimate_savings(totle_solution, estimator, actual_agg_dest_amount, agg_split)
 
-            # TODO Account for situations where agg knows Kyber is using Uniswap (or is excluding Uniswap reserve) and using Uniswap
-            if {'Uniswap', 'Kyber'}.issubset(totle_solution):
-                if ('Uniswap' in agg_split or 'Kyber' in agg_split) and not {'Uniswap', 'Kyber'}.issubset(agg_split):
-                    # print(f"RECALCULATE: {time} {token} {trade_size} {est_totle_split_pct_savings} \nTotle: amt={est_totle_dest_amount} {totle_solution}\n{agg} amt={actual_agg_dest_amount} {agg_split}")
-                    exclude_dexs += ['Kyber'] if 'Uniswap' in agg_split else ['Uniswap']
-                    totle_solution = slippage_curves.splitting_algorithm(trade_size, estimator, exclude_dexs=exclude_dexs)
-                    est_totle_dest_amount, est_totle_split_pct_savings = estimate_savings(totle_solution, estimator, actual_agg_dest_amount, agg_split)
-
-            totle_split = slippage_curves.to_percentages(totle_solution)
-            est_totle_split_price = trade_size / est_totle_dest_amount
-            cost_error_pct, tokens_error_pct = get_error_pcts(actual_agg_dest_amount, estimator, trade_size, agg_price, agg_split)
-
-            print(f"\n\n{agg} {action} {token} for {trade_size} ETH agg_price={agg_price:.6f} totle_price={no_split_totle_price:.6f} pct_savings={no_split_pct_savings:.2f}")
-            print(f"Totle  split={totle_split} est. price={est_totle_split_price} est. amount={est_totle_dest_amount}")
-            print(f"{agg[:6]:6} split={agg_split} actual price={agg_price:.6f} actual amount={actual_agg_dest_amount}")
-            print(f"Totle non-split pct_savings={no_split_pct_savings:.2f} Totle split pct_savings={est_totle_split_pct_savings :.2f}")
-
-            yield {
-                'time': time,
-                'action': action,
-                'trade_size': trade_size,
-                'token': token,
-                'agg': agg,
-                'agg_price': agg_price,
-                'agg_split': agg_split,
-                'no_split_totle_used': no_split_totle_used,
-                'no_split_totle_price': no_split_totle_price,
-                'no_split_pct_savings': no_split_pct_savings,
-                'totle_split': totle_split,
-                'totle_split_price': est_totle_split_price,
-                'totle_split_pct_savings': est_totle_split_pct_savings,
-                'cost_error_pct': cost_error_pct,
-                'tokens_error_pct': tokens_error_pct,
-            }
+    totle_split = slippage_curves.to_percentages(totle_solution)
+    est_totle_split_price = trade_size / est_totle_dest_amount
+    cost_error_pct, tokens_error_pct = get_error_pcts(actual_agg_dest_amount, estimator, trade_size, agg_price, agg_split)
+
+    print(f"\n\n{agg} {action} {token} for {trade_size} ETH agg_price={agg_price:.6f} totle_price={no_split_totle_price:.6f} pct_savings={no_split_pct_savings:.2f}")
+    print(f"Totle  split={totle_split} est. price={est_totle_split_price} est. amount={est_totle_dest_amount}")
+    print(f"{agg[:6]:6} split={agg_split} actual price={agg_price:.6f} actual amount={actual_agg_dest_amount}")
+    print(f"Totle non-split pct_savings={no_split_pct_savings:.2f} Totle split pct_savings={est_totle_split_pct_savings :.2f}")
+
+    return {
+        'time': time,
+        'action': action,
+        'trade_size': trade_size,
+        'token': token,
+        'agg': agg,
+        'agg_price': agg_price,
+        'agg_split': agg_split,
+        'no_split_totle_used': no_split_totle_used,
+        'no_split_totle_price': no_split_totle_price,
+        'no_split_pct_savings': no_split_pct_savings,
+        'totle_split': totle_split,
+        'totle_split_price': est_totle_split_price,
+        'totle_split_pct_savings': est_totle_split_pct_savings,
+        'cost_error_pct': cost_error_pct,
+        'tokens_error_pct': tokens_error_pct,
+    }
+
+
+#######################################################################################################################
+# Process-parallel cost comparisons, sharded by (csv_file, token)
+
+def get_cost_comparisons_parallel(csv_files, max_workers=None):
+    """Yields the same cost comparison data, in the same order, as get_cost_comparisons, but computes it in a process
+    pool with one task per (csv_file, token). Each file is parsed once, here, and each task is sent its token's rows and
+    price data, so the workers never read the file. Each file's comparisons are yielded as soon as all of its shards are done"""
+    with concurrent.futures.ProcessPoolExecutor(max_workers=max_workers) as executor:
+        # submit every shard up front so the pool stays busy while earlier files are being yielded
+        file_futures = [ (csv_file, submit_shards(executor, csv_file)) for csv_file in csv_files ]
+
+        for csv_file, futures in file_futures:
+            if not futures:
+                print(f"Skipping {csv_file} because it had no price data from which to create slippage curves")
+                continue
+            # merge the shards back into row order
+            for _, cost_comparison in heapq.merge(*[ f.result() for f in futures ], key=lambda r: r[0]):
+                yield cost_comparison
+
+def submit_shards(executor, csv_file):
+    """Submits a get_shard_cost_comparisons task for each token in csv_file, in the order in which they first appear,
+    and returns their futures (none if csv_file has no price data for any token)"""
+    tok_ex_ts_prices, tok_ex_known_liquidity = get_all_prices_and_known_liquidities(csv_file)
+    if not tok_ex_ts_prices: return []
+
+    token_rows = defaultdict(list)
+    for i, row in enumerate(csv_rows(csv_file)):
+        token_rows[row[3]].append((i, row))
+
+    futures = []
+    for token, rows in token_rows.items():
+        token_prices = (tok_ex_ts_prices[token], tok_ex_known_liquidity[token]) if token in tok_ex_ts_prices else None
+        futures.append(executor.submit(get_shard_cost_comparisons, csv_file, token, token_prices, rows))
+    return futures
+
+def get_shard_cost_comparisons(csv_file, token, token_prices, rows):
+    """Returns [(row_index, cost_comparison), ...] for the given (row_index, row) pairs of token's rows in csv_file.
+    This runs in a worker process, which builds the token's PriceEstimator once for all of its rows from token_prices,
+    the (ex_ts_prices, ex_known_liquidity) of token in csv_file, or None if it has none"""
+    estimator = get_price_estimator_from(csv_file, token, *token_prices) if token_prices else None
+    cost_comparisons = []
+    for i, row in rows:
+        cost_comparison = get_cost_comparison(row, estimator)
+        if cost_comparison: cost_comparisons.append((i, cost_comparison))
+    return cost_comparisons
 
 TOTLE_PRESUMED_FEE = 0.0025
 TOTLE_MEASURED_FEE = 0.00251256281407
@@ -92,31 +148,50 @@ def estimate_savings(totle_solution, estimator, actual_agg_dest_amount, agg_spli
 
 
 def get_price_estimators(csv_file):
-    tok_ex_ts_prices, tok_ex_known_liquidity = get_all_prices_and_known_liquidities(csv_file)
-    price_estimators = {token: slippage_curves.PriceEstimator(token, prices, tok_ex_known_liquidity[token]) for token, prices in tok_ex_ts_prices.items()}
-
-    # These are just sanity checks
-    for token, ex_ts_prices in tok_ex_ts_prices.items():
-        estimator = price_estimators[token]
-        for ex, ts_prices in ex_ts_prices.items():
-            # check that the prices are close to the sample
-            for ts, price in ts_prices.items():
-                ls_price = estimator.get_ls_price(ex, ts)
-                if abs(ls_price - price) > 0.001:
-                    print(f"ESTIMATOR LEAST SQUARES PRICE DIFF: {token} {ts} {ex}: {price} ls_price={ls_price} (diff={ls_price - price:.8f})")
-                mx_price = estimator.get_absolute_price(ex, ts)
-                if abs(mx_price - price) > 0.001:
-                    print(f"ESTIMATOR ABSOLUTE PRICE DIFF: {token} {ts} {ex}: {price} mx_price={mx_price} (diff={mx_price - price:.8f})")
-
-    return price_estimators
+    tok_ex_ts_prices, _ = get_all_prices_and_known_liquidities(csv_file)
+    return { token: get_price_estimator(csv_file, token) for token in tok_ex_ts_prices }
 
+def get_price_estimator(csv_file, token):
+    """Returns a PriceEstimator for token based on the price data in csv_file, or None if there is no price data"""
+    tok_ex_ts_prices, tok_ex_known_liquidity = get_all_prices_and_known_liquidities(csv_file)
+    if token not in tok_ex_ts_prices: return None
+    return get_price_estimator_from(csv_file, token, tok_ex_ts_prices[token], tok_ex_known_liquidity[token])
+
+def get_price_estimator_from(csv_file, token, ex_ts_prices, ex_known_liquidity):
+    """Returns a PriceEstimator for token's ex_ts_prices and ex_known_liquidity from csv_file. Estimators are cached
+    on disk by estimator_cache (when it is enabled), so they are only built once per version of csv_file, but they are
+    checked against ex_ts_prices whether they were built or loaded"""
+    # PriceEstimator adds 0xMesh to the dicts it is given, so it gets copies, which keeps the checks the same either way
+    estimator = estimator_cache.get(token, csv_file, lambda: slippage_curves.PriceEstimator(token, ex_ts_prices.copy(), ex_known_liquidity.copy()))
+    check_price_estimator(estimator, ex_ts_prices)
+    return estimator
+
+def check_price_estimator(estimator, ex_ts_prices):
+    """These are just sanity checks that the estimator's prices are close to the sampled ex_ts_prices"""
+    token = estimator.token
+    for ex, ts_prices in ex_ts_prices.items():
+        # check that the prices are close to the sample
+        for ts, price in ts_prices.items():
+            ls_price = estimator.get_ls_price(ex, ts)
+            if abs(ls_price - price) > 0.001:
+                print(f"ESTIMATOR LEAST SQUARES PRICE DIFF: {token} {ts} {ex}: {price} ls_price={ls_price} (diff={ls_price - price:.8f})")
+            mx_price = estimator.get_absolute_price(ex, ts)
+            if abs(mx_price - price) > 0.001:
+                print(f"ESTIMATOR ABSOLUTE PRICE DIFF: {token} {ts} {ex}: {price} mx_price={mx_price} (diff={mx_price - price:.8f})")
+
+
+@functools.lru_cache(maxsize=1)
+def csv_rows(csv_file):
+    """Returns the rows of data_import.csv_row_gen(csv_file) as a list, so a file that is read several times in a row
+    (for its prices, then its cost comparisons) is only parsed, and its warnings printed, once"""
+    return list(data_import.csv_row_gen(csv_file))
 
 @functools.lru_cache()
 def get_all_prices_and_known_liquidities(csv_file):
     tok_ex_ts_prices = defaultdict(lambda: defaultdict(dict))
     tok_ex_known_liquidity = defaultdict(lambda: defaultdict(float))
     # Use splits and non-splits to get price data
-    for time, action, trade_size, token, agg, agg_price, totle_used, totle_price, pct_savings, agg_split, ex_prices in data_import.csv_row_gen(csv_file):
+    for time, action, trade_size, token, agg, agg_price, totle_used, totle_price, pct_savings, agg_split, ex_prices in csv_rows(csv_file):
         if ex_prices and agg == dexag_client.name():  # only use DEX.AG ex_prices data
             for ex, price in ex_prices.items():
                 tok_ex_ts_prices[token][ex][trade_size] = price
@@ -169,7 +244,7 @@ def summary_csv_row_gen(summary_csv_file, only_splits=False, only_non_splits=Fal
         reader = csv.DictReader(csvfile, fieldnames=None)
         for row in reader:
             if not row.get('agg_split'): print(f"WARNING no agg_split value for row in {summary_csv_file}")
-            agg_split = exchange_utils.canonical_keys(eval(row.get('agg_split') or '{}'))
+            agg_split = exchange_utils.canonical_keys(parse_literal(row.get('agg_split')))
             if only_splits and len(agg_split) < 2: continue
             if only_non_splits and len(agg_split) > 1: continue
 
@@ -178,7 +253,7 @@ def summary_csv_row_gen(summary_csv_file, only_splits=False, only_non_splits=Fal
             trade_size, token = float(row['trade_size']), row['token']
             agg, agg_price =  row['agg'], row['agg_price'] # agg_split was done at the top
             no_split_totle_used, no_split_totle_price, no_split_pct_savings = row['no_split_totle_used'], float(row['no_split_totle_price']), float(row['no_split_pct_savings']),
-            totle_split = exchange_utils.canonical_keys(eval(row.get('totle_split') or '{}'))
+            totle_split = exchange_utils.canonical_keys(parse_literal(row.get('totle_split')))
             totle_split_price, totle_split_pct_savings = float(row['totle_split_price']), float(row['totle_split_pct_savings'])
             cost_error_pct, tokens_error_pct = float(row['cost_error_pct']), float(row['tokens_error_pct'])
 
@@ -313,8 +388,8 @@ def main():
         print(f"processing {len(csv_files)} CSV files ...")
 
         filename = get_filename_base(prefix='summarized_totle_split_savings')
-        with SavingsCSV(filename, fieldnames=CSV_FIELDS) as csv_writer:
-            for csv_data in get_cost_comparisons(csv_files):
+        with savings_writer(filename, fieldnames=CSV_FIELDS) as csv_writer:
+            for csv_data in get_cost_comparisons_parallel(csv_files):
                 csv_writer.append(csv_data)
 
 if __name__ == "__main__":
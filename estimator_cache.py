@@ -0,0 +1,71 @@
+import functools
+import hashlib
+import os
+
+import slippage_curves
+
+##############################################################################################
+#
+# On-disk cache of PriceEstimators
+#
+# Building a PriceEstimator means re-reading its data file, refitting the least squares price
+# funcs and recomputing the hi-res price matrix, which every analysis run (and every worker
+# process of get_cost_comparisons_parallel) would otherwise repeat. This cache saves each
+# estimator with PriceEstimator.save(), keyed by token and the sha256 of its source data file,
+# so it is rebuilt only when the data changes and is loaded by memory-mapping the saved file.
+#
+# The cache is off unless ESTIMATOR_CACHE=on or configure(enabled=True) turns it on. It is kept
+# in data/estimator_cache (which git ignores) unless ESTIMATOR_CACHE_DIR or configure() moves it.
+
+VERSION = 1 # bump when PriceEstimator's fitted state changes shape or meaning
+
+ENABLED = os.environ.get('ESTIMATOR_CACHE') == 'on'
+CACHE_DIR = os.environ.get('ESTIMATOR_CACHE_DIR', f"{os.path.dirname(os.path.abspath(__file__))}/data/estimator_cache")
+
+_stats = {'hits': 0, 'misses': 0}
+
+
+def configure(enabled=None, cache_dir=None):
+    global ENABLED, CACHE_DIR
+    if enabled is not None: ENABLED = enabled
+    if cache_dir is not None: CACHE_DIR = cache_dir
+
+def source_hash(file):
+    st = os.stat(file)
+    return _source_hash(os.path.abspath(file), st.st_mtime_ns, st.st_size)
+
+@functools.lru_cache(maxsize=1024)
+def _source_hash(file, mtime_ns, size):
+    h = hashlib.sha256()
+    with open(file, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+def cache_filename(token, source_file):
+    return f"{CACHE_DIR}/{token}_{source_hash(source_file)[:32]}_v{VERSION}.pest"
+
+def get(token, source_file, build, hi_res_max_trade_size=100):
+    """Returns the cached PriceEstimator for token and source_file, or calls build() and caches its result (unless it
+    is None). The hi-res price matrix up to hi_res_max_trade_size is computed before saving so loads skip that too"""
+    if not ENABLED: return build()
+
+    filename = cache_filename(token, source_file)
+    if os.path.exists(filename):
+        try:
+            estimator = slippage_curves.PriceEstimator.load(filename)
+            _stats['hits'] += 1
+            return estimator
+        except (OSError, ValueError, KeyError) as e:
+            print(f"WARNING: rebuilding {token} estimator, could not load {filename}: {e}")
+
+    _stats['misses'] += 1
+    estimator = build()
+    if estimator is not None:
+        if hi_res_max_trade_size: slippage_curves.get_hi_res_price_matrix(estimator, hi_res_max_trade_size)
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        estimator.save(filename)
+    return estimator
+
+def stats():
+    return dict(_stats)
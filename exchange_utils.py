@@ -1,4 +1,5 @@
 import functools
+import sys
 
 # Every API has different names and ids for exchanges. So this map can be used to correlate data across APIs.
 # It must be maintained manually based on the strings returned by the various APIs
@@ -234,31 +235,49 @@ SYM_TO_NAME = {
 def exchanges():
     return list(set(SYM_TO_NAME.values()))
 
+# Resolution index: every canonical name resolves to itself, and every (lowercase) symbol to its canonical name. Names
+# are interned so that the keys of canonicalized dicts share the same string objects
+CANONICAL_NAMES = frozenset(sys.intern(name) for name in SYM_TO_NAME.values())
+_RESOLVE = { sys.intern(sym): sys.intern(name) for sym, name in SYM_TO_NAME.items() }
+_RESOLVE_EXACT = { **_RESOLVE, **{ name: name for name in CANONICAL_NAMES } } # canonical names take precedence
+
+# these DEXs are never going to be used in splits
+EXCLUDE_DEXS = frozenset(['ag', 'IDEX', 'DDEX', 'Ethfinex', 'Paradex'])
+
 def canonical_name(dex_name):
     """Returns the canonical name for the given dex_name if it is one of the known exchanges, else raises ValueError"""
-    if dex_name in SYM_TO_NAME.values(): return dex_name
+    name = _RESOLVE_EXACT.get(dex_name)
+    if name: return name
 
     sym = dex_name.lower()
-    if sym in SYM_TO_NAME:
-        return SYM_TO_NAME[sym]
+    if sym in _RESOLVE:
+        return _RESOLVE[sym]
     else:
         raise ValueError(f"'{dex_name}' is an unknown exchange (using '{sym}')")
 
+def canonicalize_many(dex_names):
+    """Returns a list of canonical names for the given dex_names (e.g. a whole column of them), resolving each distinct
+    name once. Raises ValueError for unknown names like canonical_name"""
+    resolved = {}
+    def resolve(dex_name):
+        name = _RESOLVE_EXACT.get(dex_name) or resolved.get(dex_name)
+        if not name: name = resolved[dex_name] = canonical_name(dex_name)
+        return name
+    return list(map(resolve, dex_names))
+
 def canonical_names(dex_names):
     """Returns a list of canonical names for the given dex_names"""
-    return [ canonical_name(d) for d in dex_names ]
+    return canonicalize_many(dex_names)
 
 def canonical_keys(dex_dict):
     """Returns a dict with canonical dex names as keys by translating the given keys"""
-    r = { canonical_name(d): v for d, v in dex_dict.items() }
+    r = dict(zip(canonicalize_many(dex_dict), dex_dict.values()))
     # if the keys include e.g. 'Eth2dai' and 'Oasis' the result will be shorter so we catch that here
     if len(r) != len(dex_dict):
         raise ValueError(f"dict contains conflicting keys: {dex_dict.keys()}")
     return r
 
 def canonical_and_splittable(dex_dict):
-    # these DEXs are never going to be used in splits
-    EXCLUDE_DEXS = ['ag', 'IDEX', 'DDEX', 'Ethfinex', 'Paradex']
     return {k:v for k,v in canonical_keys(dex_dict).items() if k not in EXCLUDE_DEXS}
 
 ########################################################################################################################
@@ -1,4 +1,3 @@
-import json
 import sys
 from collections import defaultdict
 import concurrent.futures
@@ -9,6 +8,7 @@ import oneinch_client
 import paraswap_client
 
 import exchange_utils
+import json_utils
 from v2_compare_prices import get_filename_base
 
 TOTLE_EX = totle_client.name()
@@ -76,20 +76,23 @@ def get_agg_data(*agg_clients, tokens=ALL_AGGS_TOKENS, trade_sizes=TRADE_SIZES,
             tok_ts_dex_prices[base][trade_size] = dex_prices
 
     with open(f'{filename_base}_tok_ts_dexs_with_pair.json', 'w') as outfile:
-        json.dump(tok_ts_dexs_with_pair, outfile, indent=3)
+        json_utils.dump(tok_ts_dexs_with_pair, outfile)
     with open(f'{filename_base}_tok_ts_splits_by_agg.json', 'w') as outfile:
-        json.dump(tok_ts_splits_by_agg, outfile, indent=3)
+        json_utils.dump(tok_ts_splits_by_agg, outfile)
     with open(f'{filename_base}_tok_ts_agg_prices.json', 'w') as outfile:
-        json.dump(tok_ts_agg_prices, outfile, indent=3)
+        json_utils.dump(tok_ts_agg_prices, outfile)
     with open(f'{filename_base}_tok_ts_dex_prices.json', 'w') as outfile:
-        json.dump(tok_ts_dex_prices, outfile, indent=3)
+        json_utils.dump(tok_ts_dex_prices, outfile)
 
 
 COMPOUND_TOKENS = ['CBAT','CDAI','CETH','CREP','CUSDC','CWBTC','CZRX']
-TOTLE_EXCHANGES = integrated_exchanges = list(totle_client.exchanges().keys())
+def totle_exchanges():
+    """Returns the names of Totle's integrated exchanges (fetched on first use rather than when this module is imported)"""
+    return list(totle_client.exchanges().keys())
 
 
-def get_totle_data(tokens=ALL_AGGS_TOKENS, trade_sizes=TRADE_SIZES, quote=QUOTE, exchanges=TOTLE_EXCHANGES):
+def get_totle_data(tokens=ALL_AGGS_TOKENS, trade_sizes=TRADE_SIZES, quote=QUOTE, exchanges=None):
+    exchanges = exchanges or totle_exchanges()
     filename_base = get_filename_base(dir=DATA_DIR, prefix='totle')
 
     # get list of tokens on dexag and 1-inch that are tradable/splittable
@@ -99,52 +102,59 @@ def get_totle_data(tokens=ALL_AGGS_TOKENS, trade_sizes=TRADE_SIZES, quote=QUOTE,
 
     # TODO: sells and compare with buys
     for base in tokens:
-        for trade_size in trade_sizes:
-            print(f"Doing {base} at {trade_size} {quote} ...")
-            dexs_with_pair, splits_by_agg, dex_prices = set(), {}, {}
-            splits_by_agg[TOTLE_EX] = {} # there will just be this one entry, which will list individual DEXs that returned prices
+        print(f"Doing {base} at {trade_sizes} {quote} ...")
+        ts_dexs_with_pair, ts_splits_by_agg, ts_dex_prices = defaultdict(set), defaultdict(lambda: {TOTLE_EX: {}}), defaultdict(dict)
 
-            for dex in exchanges:
-                can_dex = exchange_utils.canonical_name(dex)
-                if dex == 'Compound' and not base in COMPOUND_TOKENS: continue  # don't waste queries for non-C tokens
+        for dex in exchanges:
+            can_dex = exchange_utils.canonical_name(dex)
+            if dex == 'Compound' and not base in COMPOUND_TOKENS: continue  # don't waste queries for non-C tokens
 
-                pq = totle_client.get_quote(quote, base, from_amount=trade_size, dex=dex)
+            # one request quotes all the trade sizes
+            pqs = totle_client.get_quotes([ (quote, base, trade_size, None) for trade_size in trade_sizes ], dex=dex)
+            for trade_size, pq in zip(trade_sizes, pqs):
                 if not pq:
                     print(f"{can_dex} did not have {quote} to {base} at trade size={trade_size}")
                 else:
-                    splits_by_agg[TOTLE_EX][can_dex] = -1  # -1 indicates this is not a split, just a list of dexs that could be used
-                    dexs_with_pair.add(can_dex)
-                    dex_prices[can_dex] = pq['price']
+                    ts_splits_by_agg[trade_size][TOTLE_EX][can_dex] = -1  # -1 indicates this is not a split, just a list of dexs that could be used
+                    ts_dexs_with_pair[trade_size].add(can_dex)
+                    ts_dex_prices[trade_size][can_dex] = pq['price']
 
+        for trade_size in trade_sizes:
+            # there will just be the one TOTLE_EX entry in splits_by_agg, which will list individual DEXs that returned prices
+            dexs_with_pair, splits_by_agg, dex_prices = ts_dexs_with_pair[trade_size], ts_splits_by_agg[trade_size], ts_dex_prices[trade_size]
             tok_ts_dexs_with_pair[base][trade_size] = list(dexs_with_pair)
             tok_ts_splits_by_agg[base][trade_size] = splits_by_agg
             tok_ts_dex_prices[base][trade_size] = dex_prices
 
     with open(f'{filename_base}_tok_ts_dexs_with_pair.json', 'w') as outfile:
-        json.dump(tok_ts_dexs_with_pair, outfile, indent=3)
+        json_utils.dump(tok_ts_dexs_with_pair, outfile)
     with open(f'{filename_base}_tok_ts_splits_by_agg.json', 'w') as outfile:
-        json.dump(tok_ts_splits_by_agg, outfile, indent=3)
+        json_utils.dump(tok_ts_splits_by_agg, outfile)
     # there is no tok_ts_agg_prices.json file yet
     # TODO: we could create one by calling get_quote() with dex=None and seeing what Totle's price is
     with open(f'{filename_base}_tok_ts_dex_prices.json', 'w') as outfile:
-        json.dump(tok_ts_dex_prices, outfile, indent=3)
+        json_utils.dump(tok_ts_dex_prices, outfile)
 
 DATA_DIR='order_splitting_data'
 
 ########################################################################################################################
 # main
 
-if len(sys.argv) < 2:
-    print(f"usage: {sys.argv[0]} totle|aggs")
-    exit(0)
+def main():
+    if len(sys.argv) < 2:
+        print(f"usage: {sys.argv[0]} totle|aggs")
+        exit(0)
+
+    tokens_to_try = sorted(set(TOTLE_ONEINCH_DEXAG_TOKENS + TOTLE_UNPRICED_TOKENS_TO_TRY))
 
-tokens_to_try = sorted(set(TOTLE_ONEINCH_DEXAG_TOKENS + TOTLE_UNPRICED_TOKENS_TO_TRY))
+    if sys.argv[1] == 'totle':
+        # get_totle_data(tokens=['BAT', 'DAI'], trade_sizes=[0.2])
+        get_totle_data(tokens=tokens_to_try)
+    elif sys.argv[1] == 'aggs':
+        # get_agg_data(dexag_client, oneinch_client, paraswap_client, tokens=['BAT', 'DAI'], trade_sizes=[0.2])
+        get_agg_data(dexag_client, oneinch_client, paraswap_client, tokens=tokens_to_try)
+    else:
+        print(f"Unrecognized data set '{sys.argv[1]}'")
 
-if sys.argv[1] == 'totle':
-    # get_totle_data(tokens=['BAT', 'DAI'], trade_sizes=[0.2])
-    get_totle_data(tokens=tokens_to_try)
-elif sys.argv[1] == 'aggs':
-    # get_agg_data(dexag_client, oneinch_client, paraswap_client, tokens=['BAT', 'DAI'], trade_sizes=[0.2])
-    get_agg_data(dexag_client, oneinch_client, paraswap_client, tokens=tokens_to_try)
-else:
-    print(f"Unrecognized data set '{sys.argv[1]}'")
+if __name__ == "__main__":
+    main()
@@ -202,8 +202,7 @@ def get_max_trade_sizes_and_dexs(tokens, from_token='ETH'):
 
     print(json.dumps(max_trade_sizes, indent=3))
 
-get_max_trade_sizes_and_dexs(WORST_TOKENS)
-exit(0)
+DO_MAX_TRADE_SIZES = True # main() only prints the max trade sizes and DEXs of WORST_TOKENS
 
 CSV_FIELD_NAMES = "time action trade_size token exchange exchange_price slippage cost".split()
 
@@ -240,6 +239,10 @@ def do_dex_token_on_agg(client, dex, to_token, trade_sizes, from_token='ETH', or
 
 ########################################################################################################################
 def main():
+    if DO_MAX_TRADE_SIZES:
+        get_max_trade_sizes_and_dexs(WORST_TOKENS)
+        return
+
     working_dir = os.path.dirname(__file__)
     if working_dir: os.chdir(working_dir)
 
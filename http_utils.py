@@ -0,0 +1,85 @@
+import threading
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import rate_limiter
+import response_store
+
+##############################################################################################
+#
+# Shared HTTP transport used by all API clients
+#
+# Each API host gets its own keep-alive requests.Session whose adapter keeps a pool of open
+# connections, so repeated calls (and calls from worker threads) reuse TCP/TLS connections
+# instead of doing a fresh handshake for every quote.
+
+POOL_MAXSIZE = 32     # connections kept alive per host; should be >= the number of concurrent callers
+POOL_BLOCK = False    # if True, callers wait for a free pooled connection instead of opening a throwaway one
+TIMEOUT = (10, 120)   # default (connect, read) timeout in seconds, used when the caller does not pass timeout=
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+
+def configure(pool_maxsize=None, pool_block=None, timeout=None):
+    """Change pool size/blocking/default timeout. Open sessions are closed and rebuilt lazily"""
+    global POOL_MAXSIZE, POOL_BLOCK, TIMEOUT
+    if pool_maxsize is not None: POOL_MAXSIZE = pool_maxsize
+    if pool_block is not None: POOL_BLOCK = pool_block
+    if timeout is not None: TIMEOUT = timeout
+    close()
+
+def close():
+    """Close all pooled sessions"""
+    with _sessions_lock:
+        sessions = list(_sessions.values())
+        _sessions.clear()
+    for s in sessions: s.close()
+
+def host(url):
+    return urlsplit(url).netloc.lower()
+
+def session(url):
+    """Returns the shared keep-alive session for url's host, creating it on first use"""
+    h = host(url)
+    s = _sessions.get(h)
+    if s: return s
+
+    with _sessions_lock:
+        s = _sessions.get(h)
+        if not s:
+            s = _sessions[h] = new_session()
+    return s
+
+def new_session():
+    s = requests.Session()
+    # each session only ever talks to one host, so one pool with POOL_MAXSIZE connections is enough
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=POOL_MAXSIZE, pool_block=POOL_BLOCK)
+    s.mount('https://', adapter)
+    s.mount('http://', adapter)
+    return s
+
+
+##############################################################################################
+#
+# Request functions (drop-in replacements for requests.get/requests.post)
+#
+
+def request(method, url, max_retries=None, **kwargs):
+    """Sends the request on url's pooled session, subject to the host's rate limits, retries and circuit breaker
+    (see rate_limiter.RATE_LIMITS). The response is recorded or replayed if response_store is enabled"""
+    kwargs.setdefault('timeout', TIMEOUT)
+
+    def send():
+        s = session(url)
+        return rate_limiter.limiter(host(url)).call(lambda: s.request(method, url, **kwargs), max_retries=max_retries)
+
+    return response_store.send(method, url, send, params=kwargs.get('params'), data=kwargs.get('data'), json_data=kwargs.get('json'))
+
+def get(url, params=None, **kwargs):
+    return request('GET', url, params=params, **kwargs)
+
+def post(url, data=None, json=None, **kwargs):
+    return request('POST', url, data=data, json=json, **kwargs)
@@ -1,4 +1,5 @@
-import requests
+import http_utils
+import json_utils
 import json
 
 API_BASE = 'https://api.huobi.pro'
@@ -28,7 +29,7 @@ BAD_PAIRS = [('ven', 'eth')]
 def get_pairs(quote='ETH'):
     """Returns pairs for the given quote asset"""
     h_quote = quote.lower()
-    j = requests.get(SYMBOLS_ENDPOINT).json()
+    j = json_utils.loads(http_utils.get(SYMBOLS_ENDPOINT).content)
     if j['status'] == 'ok':
         lower_pairs = [ (t['base-currency'], t['quote-currency']) for t in j['data'] if t['quote-currency'] == h_quote ]
         # remove pairs that raise errors
@@ -45,7 +46,7 @@ def get_depth(base, quote, level=0):
     """returns a dict of price to quantity available at that price"""
     # e.g. symbol=btcusdt&type=step1
     query = { 'symbol': base.lower() + quote.lower(), 'type': f"step{level}" }
-    j = requests.get(DEPTH_ENDPOINT, params=query).json()
+    j = json_utils.loads(http_utils.get(DEPTH_ENDPOINT, params=query).content)
 
     if j['status'] == 'ok':
         return j['tick']['bids'], j['tick']['asks']
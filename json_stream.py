@@ -0,0 +1,140 @@
+import json
+import re
+
+##############################################################################################
+#
+# Incremental JSON reader
+#
+# json.load materializes the whole document, which for multi-megabyte Totle snapshots means
+# building dicts for every route and trade even when only a few are looked at. JSONStream reads
+# a file in chunks and lets the caller walk objects and arrays key by key. Values the caller
+# reads with value() are decoded by the C decoder. Objects, arrays and strings that are skipped
+# or kept as raw JSON text (e.g. to decode only the routes that turn out to be interesting) are
+# only scanned for their closing bracket or quote, so no Python objects are built for them, and
+# raw text is decoded once, by whoever ends up using it. The scanner checks that brackets match
+# but doesn't otherwise validate what it skips.
+
+CHUNK_SIZE = 1 << 16
+
+_WHITESPACE = re.compile(r'\s*')
+_DECODER = json.JSONDecoder()
+_DELIMITERS = ' \t\n\r,:]}'
+_STRING = re.compile(r'"[^"\\]*(?:\\.[^"\\]*)*"', re.DOTALL)
+_STRUCTURAL = re.compile(r'[\[\]{}"]')
+_CLOSERS = {'[': ']', '{': '}'}
+
+
+def scan_end(buf, pos):
+    """Returns the end of the object, array or string starting at buf[pos] without decoding it, or None if buf ends first"""
+    if buf[pos] == '"':
+        m = _STRING.match(buf, pos)
+        return m and m.end()
+    closers = []
+    while True:
+        m = _STRUCTURAL.search(buf, pos)
+        if not m: return None
+        c, pos = m.group(), m.end()
+        if c == '"':
+            m = _STRING.match(buf, m.start())
+            if not m: return None
+            pos = m.end()
+        elif c in _CLOSERS:
+            closers.append(_CLOSERS[c])
+        elif not closers or closers.pop() != c:
+            raise ValueError(f"unexpected '{c}' in JSON stream")
+        elif not closers:
+            return pos
+
+
+class JSONStream:
+    def __init__(self, f, chunk_size=CHUNK_SIZE):
+        self.f, self.chunk_size = f, chunk_size
+        self.buf, self.pos = '', 0
+
+    def _fill(self, keep_from, min_size=0):
+        """Reads another chunk, dropping the buffer before keep_from. Returns how far positions shifted, or None at EOF"""
+        chunk = self.f.read(max(self.chunk_size, min_size))
+        if not chunk: return None
+        self.buf = self.buf[keep_from:] + chunk
+        self.pos -= keep_from
+        return keep_from
+
+    def peek(self):
+        """Returns the next non-whitespace char without consuming it ('' at the end of the document)"""
+        while True:
+            self.pos = _WHITESPACE.match(self.buf, self.pos).end()
+            if self.pos < len(self.buf): return self.buf[self.pos]
+            if self._fill(self.pos) is None: return ''
+
+    def expect(self, chars):
+        c = self.peek()
+        if c == '' or c not in chars: raise ValueError(f"expected one of '{chars}' but got '{c}' in JSON stream")
+        self.pos += 1
+        return c
+
+    def raw(self):
+        """Consumes the next value and returns its JSON text"""
+        start = self._scan()
+        return self.buf[start:self.pos]
+
+    def _scan(self):
+        """Consumes the next value, decoding only scalars (which are small), and returns its start position in self.buf"""
+        c = self.peek()
+        if c == '': raise ValueError("unexpected end of JSON stream")
+        if c not in '{["': return self._decode()[1]
+        while True:
+            end = scan_end(self.buf, self.pos)
+            if end is not None: break
+            # read at least as much again as the value so far, so large values aren't rescanned many times
+            if self._fill(self.pos, len(self.buf) - self.pos) is None: raise ValueError("unexpected end of JSON stream")
+        start, self.pos = self.pos, end
+        return start
+
+    def _decode(self):
+        """Consumes and decodes the next value with the C decoder, returning (value, start position in self.buf)"""
+        if self.peek() == '': raise ValueError("unexpected end of JSON stream")
+        while True:
+            try:
+                value, end = _DECODER.raw_decode(self.buf, self.pos)
+                # a scalar that runs to the end of the buffer (e.g. '1.' of 1.5) might continue in the next chunk
+                if end < len(self.buf) and (self.buf[self.pos] in '{["' or self.buf[end] in _DELIMITERS): break
+            except json.JSONDecodeError:
+                pass
+            # read at least as much again as the value so far, so large values aren't re-decoded many times
+            if self._fill(self.pos, len(self.buf) - self.pos) is None:
+                value, end = _DECODER.raw_decode(self.buf, self.pos) # the value is all there is, or is malformed
+                break
+        start, self.pos = self.pos, end
+        return value, start
+
+    def value(self):
+        """Consumes and decodes the next value"""
+        return self._decode()[0]
+
+    def skip(self):
+        self._scan()
+
+    def keys(self):
+        """Iterates over the keys of the next object. The caller must consume each key's value (with value(), raw(),
+        skip(), keys() or elements()) before asking for the next key"""
+        self.expect('{')
+        if self.peek() == '}':
+            self.pos += 1
+            return
+        while True:
+            key = self.value()
+            self.expect(':')
+            yield key
+            if self.expect(',}') == '}': return
+
+    def elements(self):
+        """Iterates over the next array, yielding the index of each element, which the caller must consume"""
+        self.expect('[')
+        if self.peek() == ']':
+            self.pos += 1
+            return
+        i = 0
+        while True:
+            yield i
+            i += 1
+            if self.expect(',]') == ']': return
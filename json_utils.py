@@ -0,0 +1,88 @@
+import json
+import os
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import ujson
+except ImportError:
+    ujson = None
+
+##############################################################################################
+#
+# JSON codec used by the API clients and the files we write
+#
+# Decoding quote responses and snapshots is most of the CPU time of a sweep, so this uses the
+# fastest JSON library that is installed (orjson, then ujson) and falls back to the standard
+# library. Whatever the backend, malformed JSON raises JSONDecodeError (json.JSONDecodeError,
+# a ValueError), and text the backend rejects (e.g. NaN literals or non UTF-8 text) is decoded
+# by the standard library, so results don't depend on which backend is installed. orjson would
+# silently decode integers beyond 64 bits as floats, so text that may hold one (see
+# may_have_big_ints) is decoded by the standard library too. When encoding, objects the backend can't handle (e.g. integers beyond
+# 64 bits) are also passed on to the standard library, except that orjson writes NaN as null
+# (NaN isn't valid JSON anyway).
+#
+# Output is compact unless an indent is asked for (indented output is always written by the
+# standard library). Set JSON_BACKEND or call configure() to choose a backend.
+
+JSONDecodeError = json.JSONDecodeError
+
+BACKENDS = { 'orjson': orjson, 'ujson': ujson, 'json': json }
+BACKEND = os.environ.get('JSON_BACKEND') or next(name for name, module in BACKENDS.items() if module)
+
+ORJSON_OPTIONS = (orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY) if orjson else 0
+
+# An integer literal that doesn't fit in 64 bits has at least 19 digits (-2**63 - 1 has 19) and follows one of :,[-
+# (ignoring whitespace), while the long digit strings in API responses (token amounts) follow a quote. Mapping digits to
+# 0 and those chars to \x01 turns the check into one bytes.translate and a substring search, which cost a fraction of
+# what orjson takes to decode the same text (a regex search costs more than the decoding)
+_BIG_INT_TABLE = bytes.maketrans(b'0123456789:,[-', b'0' * 10 + b'\x01' * 4)
+_BIG_INT = b'\x01' + b'0' * 19
+
+
+def configure(backend=None):
+    global BACKEND
+    if backend is not None:
+        if not BACKENDS.get(backend): raise ValueError(f"JSON backend '{backend}' is not available (installed: {available_backends()})")
+        BACKEND = backend
+
+def available_backends():
+    return [ name for name, module in BACKENDS.items() if module ]
+
+def may_have_big_ints(s):
+    """Returns False if JSON text s (str or bytes) has no integers beyond 64 bits. May return True for text that has
+    none, e.g. if a string holds 19 digits after a space, which only costs decoding it with the standard library"""
+    b = (s.encode(errors='surrogatepass') if isinstance(s, str) else s).translate(_BIG_INT_TABLE, b' \t\n\r')
+    return b.startswith(_BIG_INT[1:]) or _BIG_INT in b
+
+def loads(s):
+    """Decodes JSON text (str or bytes)"""
+    try:
+        if BACKEND == 'orjson' and not may_have_big_ints(s): return orjson.loads(s)
+        if BACKEND == 'ujson': return ujson.loads(s)
+    except (ValueError, OverflowError):
+        pass # let the standard library decode it or raise JSONDecodeError
+    try:
+        return json.loads(s)
+    except UnicodeDecodeError as e:
+        raise JSONDecodeError(f"JSON is not UTF-8, UTF-16 or UTF-32 text ({e.reason})", '', 0) from e
+
+def dumps(obj, indent=None, sort_keys=False):
+    """Returns obj as JSON text, compact unless indent is given"""
+    if indent is None:
+        try:
+            if BACKEND == 'orjson': return orjson.dumps(obj, option=ORJSON_OPTIONS | (orjson.OPT_SORT_KEYS if sort_keys else 0)).decode()
+            if BACKEND == 'ujson': return ujson.dumps(obj, ensure_ascii=False, sort_keys=sort_keys)
+        except (TypeError, ValueError, OverflowError):
+            pass
+        return json.dumps(obj, sort_keys=sort_keys, separators=(',', ':'))
+    return json.dumps(obj, indent=indent, sort_keys=sort_keys)
+
+def load(f):
+    return loads(f.read())
+
+def dump(obj, f, indent=None, sort_keys=False):
+    f.write(dumps(obj, indent=indent, sort_keys=sort_keys))
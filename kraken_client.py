@@ -1,4 +1,5 @@
-import requests
+import http_utils
+import json_utils
 
 
 API_BASE = 'https://api.kraken.com/0/public'
@@ -42,7 +43,7 @@ def get_pairs(quote='ETH'):
     """Returns pairs for the given quote asset"""
     k_quote_sym = translate_to_kraken(quote)
 
-    j = requests.get(PAIRS_ENDPOINT).json()
+    j = json_utils.loads(http_utils.get(PAIRS_ENDPOINT).content)
 
     # {"error":[],"result":{"BATETH":{"altname":"BATETH","wsname":"BAT\/ETH","aclass_base":"currency","base":"BAT","aclass_quote":"currency","quote":"XETH",...
     if j.get('error'):
@@ -65,7 +66,7 @@ def get_depth(base, quote, level=4):
     # https://api.kraken.com/0/public/Depth?pair=REPETH&count=100
     # No need to translate_to_kraken, non-[X,Z] names are ok for pair parameter
     query = { 'pair': base + quote, 'count': DEPTH_LEVELS[level] }
-    j = requests.get(DEPTH_ENDPOINT, params=query).json()
+    j = json_utils.loads(http_utils.get(DEPTH_ENDPOINT, params=query).content)
 
     # {"error":[],"result":{"XREPXETH":{"asks":[["0.047650","61.300",1571684656],["0.047720","32.091",1571684657],
     if j.get('error'):
@@ -1,10 +1,11 @@
-import random
 import sys
 import functools
 import threading
-import time
 
 import requests
+import http_utils
+import json_utils
+import quote_cache
 import json
 import token_utils
 
@@ -56,15 +57,15 @@ def fee_pct():
 
 @functools.lru_cache(1)
 def exchanges():
-    r = requests.get(EXCHANGES_ENDPOINT)
+    r = http_utils.get(EXCHANGES_ENDPOINT)
     # 1-Inch does not have exchange ids, but to keep the same interface we put in 0's for id
     id = 0
-    return { j['name']: id for j in r.json() }
+    return { j['name']: id for j in json_utils.loads(r.content) }
 
 @functools.lru_cache()
 def get_pairs(quote='ETH'):
     # 1-Inch doesn't have a pairs endpoint, so we just use its tokens endpoint to get tokens, which are assumed to pair with quote
-    tokens_json = requests.get(TOKENS_ENDPOINT).json()
+    tokens_json = json_utils.loads(http_utils.get(TOKENS_ENDPOINT).content)
     # Returns:
     # {"ABT":{"symbol":"ABT","name":"ArcBlock","address":"0xb98d4c97425d9908e66e53a6fdf673acca0be986","decimals":18},
     # "ABX":{"symbol":"ABX","name":"Arbidex","address":"0x9a794dc1939f1d78fa48613b89b8f9d0a20da00e","decimals":18}, ...}
@@ -85,16 +86,16 @@ JSON_FILENAME = 'data/cached_oneinch_tokens.json'
 
 @functools.lru_cache(1)
 def supported_tokens_critical():
-    r = requests.get(TOKENS_ENDPOINT)
+    r = http_utils.get(TOKENS_ENDPOINT)
     try: # this often fails to return a good response, so we used cached data when it does
-        supp_tokens_json = r.json()
+        supp_tokens_json = json_utils.loads(r.content)
         with open(JSON_FILENAME, 'w') as f:
-            json.dump(supp_tokens_json, f)
+            json_utils.dump(supp_tokens_json, f)
 
-    except json.decoder.JSONDecodeError as e:
+    except json_utils.JSONDecodeError as e:
         print(f"oneinch_client.supported_tokens() using {JSON_FILENAME}")
         with open(JSON_FILENAME) as f:
-            supp_tokens_json = json.load(f)
+            supp_tokens_json = json_utils.load(f)
 
     return { t['symbol']: t['address'] for t in supp_tokens_json.values() }
 
@@ -103,6 +104,7 @@ def tokens_by_addr():
     return { addr: sym for sym, addr in supported_tokens().items() }
 
 # get quote
+@quote_cache.cached
 def get_quote(from_token, to_token, from_amount=None, to_amount=None, dex=None, verbose=False, debug=False):
     """Returns the price in terms of the from_token - i.e. how many from_tokens to purchase 1 to_token"""
     if to_amount or not from_amount: raise ValueError(f"{name()} only works with from_amount")
@@ -113,10 +115,10 @@ def get_quote(from_token, to_token, from_amount=None, to_amount=None, dex=None,
     query = {'fromTokenSymbol': from_token, 'toTokenSymbol': to_token, 'amount': token_utils.int_amount(from_amount, from_token)}
     r = None
     try:
-        r = requests.get(QUOTE_ENDPOINT, params=query)
+        r = http_utils.get(QUOTE_ENDPOINT, params=query)
         if debug:
             print(f"r.status_code={r.status_code}")
-        j = r.json()
+        j = json_utils.loads(r.content)
         if debug:
             print(f"REQUEST to {QUOTE_ENDPOINT}:\n{json.dumps(query, indent=3)}\n\n")
             print(f"RESPONSE from {QUOTE_ENDPOINT}:\n{json.dumps(j, indent=3)}\n\n")
@@ -124,7 +126,6 @@ def get_quote(from_token, to_token, from_amount=None, to_amount=None, dex=None,
         if j.get('message'):
             print(f"{name()}.{sys._getframe(  ).f_code.co_name} returned {j['message']} request was {query} response was {j}")
 
-            time.sleep(1.0 + random.random())  # block each thread for 1-2 seconds to keep from getting rate limited
             return {}
         else:
             # Response:
@@ -140,7 +141,6 @@ def get_quote(from_token, to_token, from_amount=None, to_amount=None, dex=None,
             price = source_amount / destination_amount if destination_amount else 0.0
             exchanges_parts = {ex['name']: ex['part'] for ex in j['exchanges'] if ex['part']}
 
-            time.sleep(1.0 + random.random())  # block each thread for 1-2 seconds to keep from getting rate limited
             return {
                 'source_token': source_token,
                 'source_amount': source_amount,
@@ -155,7 +155,6 @@ def get_quote(from_token, to_token, from_amount=None, to_amount=None, dex=None,
             print(f"Failed to connect: #{e}")
         elif r.status_code == 429:
             print(f"RATE LIMITED {name()} {query}")
-            time.sleep(300)
         else:
             print(f"{name()} {query} raised {e}: {r.text[:128] if r else 'no JSON returned'} status_code={r.status_code}")
             if debug: print(f"FAILED REQUEST to {QUOTE_ENDPOINT}:\n{json.dumps(query, indent=3)}\n\n")
@@ -168,8 +167,8 @@ def get_swap(from_token, to_token, from_amount=None, to_amount=None, dex=None, f
     if debug: print(f"REQUEST to {QUOTE_ENDPOINT}:\n{json.dumps(query, indent=3)}\n\n")
     r = None
     try:
-        r = requests.get(QUOTE_ENDPOINT, params=query)
-        j = r.json()
+        r = http_utils.get(QUOTE_ENDPOINT, params=query)
+        j = json_utils.loads(r.content)
         if debug: print(f"RESPONSE from {QUOTE_ENDPOINT}:\n{json.dumps(j, indent=3)}\n\n")
 
         if j.get('message'):
@@ -1,10 +1,11 @@
-import random
 import sys
 import functools
 import threading
-import time
 
 import requests
+import http_utils
+import json_utils
+import quote_cache
 import json
 import token_utils
 
@@ -59,16 +60,16 @@ def fee_pct():
 
 @functools.lru_cache(1)
 def exchanges():
-    r = requests.get(EXCHANGES_ENDPOINT)
+    r = http_utils.get(EXCHANGES_ENDPOINT)
 
     # 1-Inch does not have exchange ids, but to keep the same interface we put in 0's for id
     id = 0
-    return { j: id for j in sorted(r.json()['protocols']) }
+    return { j: id for j in sorted(json_utils.loads(r.content)['protocols']) }
 
 @functools.lru_cache()
 def get_pairs(quote='ETH'):
     # 1-Inch doesn't have a pairs endpoint, so we just use its tokens endpoint to get tokens, which are assumed to pair with quote
-    tokens_json = requests.get(TOKENS_ENDPOINT).json()
+    tokens_json = json_utils.loads(http_utils.get(TOKENS_ENDPOINT).content)
     # Returns:
     # {"ABT":{"symbol":"ABT","name":"ArcBlock","address":"0xb98d4c97425d9908e66e53a6fdf673acca0be986","decimals":18},
     # "ABX":{"symbol":"ABX","name":"Arbidex","address":"0x9a794dc1939f1d78fa48613b89b8f9d0a20da00e","decimals":18}, ...}
@@ -89,16 +90,16 @@ JSON_FILENAME = 'data/cached_oneinch_v3_tokens.json'
 
 @functools.lru_cache(1)
 def supported_tokens_critical():
-    r = requests.get(TOKENS_ENDPOINT)
+    r = http_utils.get(TOKENS_ENDPOINT)
     try:  # this often fails to return a good response, so we used cached data when it does
-        supp_tokens_json = r.json()['tokens']
+        supp_tokens_json = json_utils.loads(r.content)['tokens']
         with open(JSON_FILENAME, 'w') as f:
-            json.dump(supp_tokens_json, f)
+            json_utils.dump(supp_tokens_json, f)
 
-    except json.decoder.JSONDecodeError as e:
+    except json_utils.JSONDecodeError as e:
         print(f"oneinch_client.supported_tokens() using {JSON_FILENAME}")
         with open(JSON_FILENAME) as f:
-            supp_tokens_json = json.load(f)
+            supp_tokens_json = json_utils.load(f)
 
     return { t['symbol']: t['address'] for t in supp_tokens_json.values() }
 
@@ -121,6 +122,7 @@ def oneinch_v3_addr(token_symbol):
     #     token_utils.addr(token_symbol)
 
 # get quote
+@quote_cache.cached
 def get_quote(from_token, to_token, from_amount=None, to_amount=None, dex=None, verbose=False, debug=False):
     """Returns the price in terms of the from_token - i.e. how many from_tokens to purchase 1 to_token"""
     endpoint = QUOTE_ENDPOINT
@@ -134,23 +136,21 @@ def get_quote(from_token, to_token, from_amount=None, to_amount=None, dex=None,
     query = {'fromTokenAddress': from_token_addr, 'toTokenAddress': to_token_addr, 'amount': token_utils.int_amount(from_amount, from_token)}
     r = None
     try:
-        r = requests.get(endpoint, params=query)
+        r = http_utils.get(endpoint, params=query)
         if debug:
             print(f"r.status_code={r.status_code}")
-        j = r.json()
+        j = json_utils.loads(r.content)
         if debug:
             print(f"REQUEST to {endpoint}:\n{json.dumps(query, indent=3)}\n\n")
             print(f"RESPONSE from {endpoint}:\n{json.dumps(j, indent=3)}\n\n")
 
         if j.get('message'):
             print(f"{name()}.{sys._getframe(  ).f_code.co_name} returned {j['message']}. Request was {query} response was {j}")
-            time.sleep(1.0 + random.random())  # block each thread for 1-2 seconds to keep from getting rate limited
             return {}
 
         if j.get('errors'):
             # j = {'errors': [{'msg': 'error'}]}
             print(f"{name()}.{sys._getframe(  ).f_code.co_name} returned {j['errors'][0]['msg']}. Request was {query} response was {j}")
-            time.sleep(1.0 + random.random())  # block each thread for 1-2 seconds to keep from getting rate limited
             return {}
 
         else:
@@ -219,7 +219,6 @@ def get_quote(from_token, to_token, from_amount=None, to_amount=None, dex=None,
             else: # multiple routes
                 exchanges_parts = [ parse_split_route(route) for route in routes ]
 
-            time.sleep(1.0 + random.random())  # block each thread for 1-2 seconds to keep from getting rate limited
             return {
                 'source_token': source_token,
                 'source_amount': source_amount,
@@ -234,7 +233,6 @@ def get_quote(from_token, to_token, from_amount=None, to_amount=None, dex=None,
             print(f"Failed to connect: #{e}")
         elif r.status_code == 429:
             print(f"RATE LIMITED {name()} {query}")
-            time.sleep(300)
         else:
             print(f"{name()} {query} raised {e}: {r.text[:128] if r else 'no JSON returned'} status_code={r.status_code}")
             if debug: print(f"FAILED REQUEST to {endpoint}:\n{json.dumps(query, indent=3)}\n\n")
@@ -275,8 +273,8 @@ def get_swap(from_token, to_token, from_amount=None, to_amount=None, dex=None, f
     if debug: print(f"REQUEST to {endpoint}:\n{json.dumps(query, indent=3)}\n\n")
     r = None
     try:
-        r = requests.get(endpoint, params=query)
-        j = r.json()
+        r = http_utils.get(endpoint, params=query)
+        j = json_utils.loads(r.content)
         if debug: print(f"RESPONSE from {endpoint}:\n{json.dumps(j, indent=3)}\n\n")
 
         if j.get('message'):
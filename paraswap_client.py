@@ -2,6 +2,9 @@ import json
 import sys
 import functools
 import requests
+import http_utils
+import json_utils
+import quote_cache
 import token_utils
 
 # https://paraswapv2.docs.apiary.io/#
@@ -52,7 +55,7 @@ def exchanges():
 @functools.lru_cache()
 def get_pairs(quote='ETH'):
     # Paraswap doesn't have a pairs endpoint, so we just use its tokens endpoint to get tokens, which are assumed to pair with quote
-    tokens_json = requests.get(TOKENS_ENDPOINT).json()
+    tokens_json = json_utils.loads(http_utils.get(TOKENS_ENDPOINT).content)
 
     # use only the tokens that are listed in token_utils.tokens() and use the canonical name
     canonical_symbols = [token_utils.canonical_symbol(t) for t in tokens_json]  # may contain None values
@@ -74,11 +77,12 @@ def paraswap_addr(token_symbol):
 @functools.lru_cache(1)
 def tokens_json():
     # "symbol":"DEV","address":"0x5cAf454Ba92e6F2c929DF14667Ee360eD9fD5b26",
-    raw_tokens_json = requests.get(TOKENS_ENDPOINT).json()['tokens']
+    raw_tokens_json = json_utils.loads(http_utils.get(TOKENS_ENDPOINT).content)['tokens']
     return [ t for t in raw_tokens_json if t['address'] not in token_utils.ADDRESSES_TO_FILTER_OUT ]
 
 
 # get quote
+@quote_cache.cached
 def get_quote(from_token, to_token, from_amount=None, to_amount=None, dex=None, verbose=False, debug=False):
     """Returns the price in terms of the from_token - i.e. how many from_tokens to purchase 1 to_token"""
     if to_amount or not from_amount: raise ValueError(f"{name()} only works with from_amount")
@@ -97,8 +101,8 @@ def get_quote(from_token, to_token, from_amount=None, to_amount=None, dex=None,
 
     r = None
     try:
-        r = requests.get(req_url)
-        j = r.json()
+        r = http_utils.get(req_url)
+        j = json_utils.loads(r.content)
         if debug: print(f"RESPONSE from {PRICES_ENDPOINT}:\n{json.dumps(j, indent=3)}\n\n")
 
         # Response:
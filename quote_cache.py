@@ -0,0 +1,104 @@
+import concurrent.futures
+import copy
+import functools
+import inspect
+import threading
+import time
+from collections import OrderedDict, defaultdict
+
+##############################################################################################
+#
+# Short-lived cache of quotes, shared by all clients
+#
+# Scripts like totle_vs_cexs and get_order_splitting_data ask the same client for the same quote
+# several times within seconds. Wrapping a client's get_quote with @cached makes repeated calls
+# within TTL seconds free, and concurrent identical calls share a single in-flight request.
+#
+
+TTL = 30.0        # seconds a quote stays fresh; 0 disables caching (but not coalescing)
+MAXSIZE = 4096    # max number of cached quotes, least recently used are evicted first
+
+UNKEYED_ARGS = ['verbose', 'debug'] # these don't change the quote
+
+_cache = OrderedDict() # key => (expires_at, result)
+_in_flight = {}        # key => Future shared by all callers waiting on the same quote
+_stats = defaultdict(lambda: {'hits': 0, 'misses': 0, 'coalesced': 0})
+_lock = threading.Lock()
+
+
+def configure(ttl=None, maxsize=None):
+    global TTL, MAXSIZE
+    with _lock:
+        if ttl is not None: TTL = ttl
+        if maxsize is not None: MAXSIZE = maxsize
+        while len(_cache) > MAXSIZE: _cache.popitem(last=False)
+
+def clear():
+    with _lock:
+        _cache.clear()
+        _stats.clear()
+
+def stats():
+    """Returns a dict of client => {'hits', 'misses', 'coalesced'} counters"""
+    with _lock:
+        return { client: dict(counts) for client, counts in _stats.items() }
+
+def print_stats():
+    for client, s in sorted(stats().items()):
+        total = sum(s.values())
+        print(f"{client:<30} hits={s['hits']} coalesced={s['coalesced']} misses={s['misses']} hit rate={100 * (s['hits'] + s['coalesced']) / total if total else 0:.1f}%")
+
+def freeze(value):
+    """Returns a hashable version of value (dicts and lists, e.g. params, become sorted tuples)"""
+    if isinstance(value, dict): return tuple(sorted((k, freeze(v)) for k, v in value.items()))
+    if isinstance(value, (list, tuple, set)): return tuple(freeze(v) for v in value)
+    return value
+
+
+def cached(func):
+    """Decorator for a client's get_quote (or any function returning a quote dict). Calls are keyed on the client module
+    and all arguments except verbose/debug, i.e. on (client, from_token, to_token, amount, dex, ...). Only non-empty
+    results are cached, so failed quotes are retried on the next call."""
+    client = func.__module__
+    signature = inspect.signature(func)
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        bound = signature.bind(*args, **kwargs)
+        bound.apply_defaults()
+        key = (client, func.__name__, freeze({ k: v for k, v in bound.arguments.items() if k not in UNKEYED_ARGS }))
+
+        with _lock:
+            entry = _cache.get(key)
+            if entry and entry[0] > time.monotonic():
+                _cache.move_to_end(key)
+                _stats[client]['hits'] += 1
+                return copy.deepcopy(entry[1])
+
+            future, is_owner = _in_flight.get(key), False
+            if future:
+                _stats[client]['coalesced'] += 1
+            else:
+                _stats[client]['misses'] += 1
+                future, is_owner = concurrent.futures.Future(), True
+                _in_flight[key] = future
+
+        if is_owner:
+            try:
+                result = func(*args, **kwargs)
+            except BaseException as e:
+                with _lock: del _in_flight[key]
+                future.set_exception(e)
+                raise
+
+            with _lock: # store and un-flight atomically so no caller can slip in between and make the same request
+                del _in_flight[key]
+                if result and TTL > 0:
+                    _cache[key] = (time.monotonic() + TTL, result)
+                    _cache.move_to_end(key)
+                    while len(_cache) > MAXSIZE: _cache.popitem(last=False)
+            future.set_result(result)
+
+        return copy.deepcopy(future.result())
+
+    return wrapper
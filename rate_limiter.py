@@ -0,0 +1,190 @@
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+
+import requests
+
+##############################################################################################
+#
+# Per-host rate limiting, retries and circuit breaking for http_utils
+#
+# Every API host gets a token bucket (so calls from all threads together stay under the host's
+# limit), exponential backoff with full jitter on throttling/server errors, Retry-After handling,
+# and a circuit breaker that fails fast after repeated failures instead of hammering a host
+# that is down or has banned us.
+#
+
+DEFAULTS = {
+    'rate': 10.0,               # sustained requests per second
+    'burst': 10,                # bucket size, i.e. how many requests may go out back to back
+    'max_retries': 3,           # retries after the first attempt on throttling, 5xx, or connection errors
+    'backoff_base': 1.0,        # seconds; the nth retry waits up to backoff_base * 2**n (full jitter)
+    'backoff_max': 60.0,        # cap on a single backoff wait
+    'retry_statuses': (429, 500, 502, 503, 504),
+    'failure_threshold': 5,     # consecutive failures that open the circuit
+    'reset_timeout': 60.0,      # seconds the circuit stays open before a trial request is let through
+}
+
+# 1-Inch shares one host across API versions, and throttles by answering 'Forbidden'
+ONEINCH = {'hosts': ['api.1inch.exchange'], 'rate': 0.5, 'burst': 2, 'retry_statuses': (403, 429, 500, 502, 503, 504), 'backoff_base': 2.0, 'backoff_max': 300.0}
+
+# client module => settings (any setting not given comes from DEFAULTS)
+RATE_LIMITS = {
+    'totle_client': {'hosts': ['api.totle.com', 'totle-api-snapshot.s3.amazonaws.com'], 'rate': 5.0, 'burst': 5},
+    'dexag_client': {'hosts': ['api.dex.ag'], 'rate': 2.0, 'burst': 4},
+    'oneinch_client': ONEINCH,
+    'oneinch_v2_client': ONEINCH,
+    'oneinch_v3_client': ONEINCH,
+    'paraswap_client': {'hosts': ['api.paraswap.io'], 'rate': 2.0, 'burst': 4},
+    'zrx_client': {'hosts': ['api.0x.org'], 'rate': 3.0, 'burst': 3},
+    'binance_client': {'hosts': ['api.binance.com'], 'rate': 10.0, 'burst': 20},
+    'huobi_client': {'hosts': ['api.huobi.pro'], 'rate': 10.0, 'burst': 10},
+    'kraken_client': {'hosts': ['api.kraken.com'], 'rate': 1.0, 'burst': 15},
+    'dexwatch_client': {'hosts': ['dex.watch'], 'rate': 2.0, 'burst': 2},
+    'cryptowatch_client': {'hosts': ['api.cryptowat.ch', 'staging-api.service.cryptowat.ch'], 'rate': 5.0, 'burst': 5},
+}
+
+
+class CircuitOpenError(requests.exceptions.ConnectionError):
+    """Raised instead of sending a request to a host whose circuit is open"""
+    pass
+
+
+class TokenBucket:
+    def __init__(self, rate, burst):
+        self.rate, self.burst = rate, burst
+        self.tokens, self.updated = float(burst), time.monotonic()
+        self.not_before = 0.0 # set by pause(), e.g. from a Retry-After header
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """Blocks until a request may be sent"""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if now >= self.not_before and self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = max(self.not_before - now, (1 - self.tokens) / self.rate)
+            time.sleep(wait)
+
+    def pause(self, seconds):
+        """No requests will be let through for the next seconds"""
+        with self.lock:
+            self.not_before = max(self.not_before, time.monotonic() + seconds)
+            self.tokens, self.updated = 0.0, self.not_before # refilling starts when the pause ends
+
+
+class CircuitBreaker:
+    def __init__(self, failure_threshold, reset_timeout):
+        self.failure_threshold, self.reset_timeout = failure_threshold, reset_timeout
+        self.failures, self.opened_at = 0, None
+        self.lock = threading.Lock()
+
+    def check(self, host):
+        """Raises CircuitOpenError if the circuit is open. After reset_timeout one trial request is allowed (half-open)"""
+        with self.lock:
+            if self.opened_at is None: return
+            if time.monotonic() - self.opened_at < self.reset_timeout:
+                raise CircuitOpenError(f"circuit open for {host} after {self.failures} consecutive failures")
+            self.opened_at = time.monotonic() # half-open: let this request through, but hold back the others
+
+    def record_success(self):
+        with self.lock:
+            self.failures, self.opened_at = 0, None
+
+    def record_failure(self, host):
+        with self.lock:
+            self.failures += 1
+            if self.failures >= self.failure_threshold:
+                if self.opened_at is None: print(f"OPENING CIRCUIT for {host} after {self.failures} consecutive failures")
+                self.opened_at = time.monotonic()
+
+
+class HostLimiter:
+    def __init__(self, host, settings):
+        self.host = host
+        self.settings = { **DEFAULTS, **settings }
+        self.bucket = TokenBucket(self.settings['rate'], self.settings['burst'])
+        self.breaker = CircuitBreaker(self.settings['failure_threshold'], self.settings['reset_timeout'])
+
+    def backoff(self, attempt):
+        """Exponential backoff with full jitter for the given (0-based) retry attempt"""
+        return random.uniform(0, min(self.settings['backoff_max'], self.settings['backoff_base'] * 2 ** attempt))
+
+    def record_failure(self):
+        self.breaker.record_failure(self.host)
+
+    def call(self, send, max_retries=None):
+        """Calls send() (which returns a requests.Response) subject to this host's limits, retrying on throttling,
+        5xx errors, and connection errors. The last response is returned even if it is an error response"""
+        max_retries = self.settings['max_retries'] if max_retries is None else max_retries
+        for attempt in range(max_retries + 1):
+            self.breaker.check(self.host)
+            self.bucket.acquire()
+            try:
+                r = send()
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+                self.record_failure()
+                if attempt == max_retries: raise
+                time.sleep(self.backoff(attempt))
+                continue
+
+            if r.status_code not in self.settings['retry_statuses']:
+                self.breaker.record_success()
+                return r
+
+            self.record_failure()
+            if attempt == max_retries: return r
+            delay = retry_after(r) or self.backoff(attempt)
+            print(f"{self.host} returned {r.status_code}, retrying in {delay:.1f} seconds")
+            # throttling applies to everyone calling this host, not just this thread
+            if r.status_code in (403, 429): self.bucket.pause(delay)
+            time.sleep(delay)
+
+
+def retry_after(response):
+    """Returns the number of seconds in the response's Retry-After header (seconds or HTTP date), or None"""
+    value = response.headers.get('Retry-After')
+    if not value: return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        try:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return None
+
+
+##############################################################################################
+#
+# Limiter registry
+#
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+def settings_by_host():
+    return { host: settings for settings in RATE_LIMITS.values() for host in settings['hosts'] }
+
+def limiter(host):
+    """Returns the HostLimiter for host, configured from RATE_LIMITS (or DEFAULTS for unlisted hosts)"""
+    l = _limiters.get(host)
+    if l: return l
+
+    with _limiters_lock:
+        l = _limiters.get(host)
+        if not l:
+            settings = { k: v for k, v in settings_by_host().get(host, {}).items() if k != 'hosts' }
+            l = _limiters[host] = HostLimiter(host, settings)
+    return l
+
+def configure(client_module, **settings):
+    """Overrides settings for the given client module name, e.g. configure('oneinch_v2_client', rate=1.0). Modules that
+    share a host (e.g. the 1-Inch clients) share settings, since they share the host's limits"""
+    with _limiters_lock:
+        RATE_LIMITS.setdefault(client_module, {'hosts': []}).update(settings)
+        for host in RATE_LIMITS[client_module]['hosts']: _limiters.pop(host, None)
@@ -0,0 +1,132 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from urllib.parse import urlencode
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+import json_utils
+
+##############################################################################################
+#
+# Persistent record/replay store for HTTP exchanges made through http_utils
+#
+# In 'record' mode every response is saved to a SQLite file, keyed by a hash of the request
+# (method, URL with query, body). In 'replay' mode responses are served from that file (through
+# an in-memory cache) and nothing goes over the network, so a recorded sweep can be re-run
+# offline, deterministically, and without rate limits. Bodies are stored once per distinct
+# content (keyed by their own hash) and zlib compressed.
+#
+# The mode and file can be set with configure() or the RESPONSE_STORE_MODE/RESPONSE_STORE_PATH
+# environment variables, e.g. RESPONSE_STORE_MODE=replay python totle_vs_aggs.py
+
+OFF, RECORD, REPLAY = 'off', 'record', 'replay'
+
+MODE = os.environ.get('RESPONSE_STORE_MODE', OFF)
+PATH = os.environ.get('RESPONSE_STORE_PATH', f"{os.path.dirname(os.path.abspath(__file__))}/data/response_store.sqlite")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS exchanges (key TEXT PRIMARY KEY, method TEXT, url TEXT, status INTEGER, headers TEXT, body_hash TEXT, recorded_at REAL);
+CREATE TABLE IF NOT EXISTS bodies (hash TEXT PRIMARY KEY, content BLOB);
+"""
+
+class ResponseNotRecorded(requests.exceptions.ConnectionError):
+    """Raised in replay mode for a request that was never recorded. Clients handle it like a failed connection"""
+    pass
+
+
+_conn = None
+_memory = {} # key => (status, headers, content, url) for responses already read from disk
+_lock = threading.Lock()
+
+
+def configure(mode=None, path=None):
+    global MODE, PATH, _conn
+    if mode not in (None, OFF, RECORD, REPLAY): raise ValueError(f"mode must be one of {OFF}, {RECORD}, {REPLAY}")
+    with _lock:
+        if mode is not None: MODE = mode
+        if path is not None and path != PATH:
+            PATH = path
+            if _conn: _conn.close()
+            _conn = None
+            _memory.clear()
+
+def connection():
+    """Returns the shared SQLite connection (must be called with _lock held)"""
+    global _conn
+    if not _conn:
+        os.makedirs(os.path.dirname(PATH) or '.', exist_ok=True)
+        _conn = sqlite3.connect(PATH, check_same_thread=False)
+        _conn.executescript(SCHEMA)
+    return _conn
+
+def request_key(method, url, params=None, data=None, json_data=None):
+    """Returns the content address of a request. JSON bodies are normalized so that formatting doesn't change the key"""
+    if params: url += ('&' if '?' in url else '?') + urlencode(sorted(params.items()), doseq=True)
+    body = data if data is not None else json_data
+    if isinstance(body, bytes): body = body.decode('utf-8', errors='replace')
+    # bodies are normalized with the standard library rather than json_utils, so keys don't depend on the installed backend
+    if isinstance(body, str):
+        try:
+            body = json.loads(body)
+        except ValueError:
+            pass
+    body = body if isinstance(body, str) else json.dumps(body, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(f"{method.upper()} {url}\n{body}".encode()).hexdigest()
+
+
+##############################################################################################
+#
+# Record and replay
+#
+
+def record(key, method, response):
+    content = response.content
+    body_hash = hashlib.sha256(content).hexdigest()
+    headers = json_utils.dumps(dict(response.headers))
+    with _lock:
+        conn = connection()
+        with conn:
+            conn.execute("INSERT OR IGNORE INTO bodies (hash, content) VALUES (?, ?)", (body_hash, zlib.compress(content)))
+            conn.execute("INSERT OR REPLACE INTO exchanges (key, method, url, status, headers, body_hash, recorded_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                         (key, method.upper(), response.url, response.status_code, headers, body_hash, time.time()))
+        _memory[key] = (response.status_code, headers, content, response.url)
+
+def replay(key, method, url):
+    """Returns the recorded requests.Response for key, or raises ResponseNotRecorded"""
+    with _lock:
+        entry = _memory.get(key)
+        if not entry:
+            row = connection().execute("SELECT e.status, e.headers, b.content, e.url FROM exchanges e JOIN bodies b ON b.hash = e.body_hash WHERE e.key = ?", (key,)).fetchone()
+            if not row: raise ResponseNotRecorded(f"no recorded response for {method.upper()} {url}")
+            entry = _memory[key] = (row[0], row[1], zlib.decompress(row[2]), row[3])
+
+    status, headers, content, recorded_url = entry
+    r = requests.Response()
+    r.status_code, r._content, r.url = status, content, recorded_url
+    r.headers = CaseInsensitiveDict(json_utils.loads(headers))
+    r.encoding = requests.utils.get_encoding_from_headers(r.headers)
+    return r
+
+def send(method, url, send_request, params=None, data=None, json_data=None):
+    """Returns send_request() (a requests.Response), recording or replaying it according to MODE"""
+    if MODE == OFF: return send_request()
+
+    key = request_key(method, url, params, data, json_data)
+    if MODE == REPLAY: return replay(key, method, url)
+
+    r = send_request()
+    record(key, method, r)
+    return r
+
+def stats():
+    with _lock:
+        conn = connection()
+        n_exchanges, = conn.execute("SELECT COUNT(*) FROM exchanges").fetchone()
+        n_bodies, n_bytes = conn.execute("SELECT COUNT(*), COALESCE(SUM(LENGTH(content)), 0) FROM bodies").fetchone()
+    return {'exchanges': n_exchanges, 'bodies': n_bodies, 'compressed_bytes': n_bytes}
@@ -0,0 +1,106 @@
+from collections import defaultdict
+
+import data_import
+
+########################################################################################################################
+# Single-pass savings summary engine
+#
+# The summarize_* reports all slice the same per_pair_savings samples ({pair: {trade_size: {agg: [pct_savings, ...]}}})
+# in different ways. Rather than each report walking every sample, summarize() makes one pass that reduces each
+# (pair, trade_size, agg) sample list to a SavingsStats, and reports are computed by merging those per-group stats
+# (group_by/nested), which costs time proportional to the number of groups, not the number of samples.
+
+BEST_WORSE_THRESHOLD = 0.0001  # pct_savings within this of 0 count as the same price
+NEG_WITHOUT_FEE_PCT = -0.25    # savings below this are worse prices even before Totle's fee
+
+class SavingsStats:
+    """Mergeable counts and sums for a group of pct_savings samples"""
+    __slots__ = ['n', 'total', 'better', 'worse', 'same', 'pos', 'neg_without_fee']
+
+    def __init__(self, pct_savings_list=()):
+        self.n, self.total, self.better, self.worse, self.same, self.pos, self.neg_without_fee = 0, 0.0, 0, 0, 0, 0, 0
+        for pct in pct_savings_list: self.add(pct)
+
+    def add(self, pct):
+        self.n += 1
+        self.total += pct
+        if pct > BEST_WORSE_THRESHOLD: self.better += 1
+        elif pct < -BEST_WORSE_THRESHOLD: self.worse += 1
+        else: self.same += 1
+        if pct > 0.0: self.pos += 1
+        elif pct < NEG_WITHOUT_FEE_PCT: self.neg_without_fee += 1
+
+    def merge(self, other):
+        for attr in self.__slots__: setattr(self, attr, getattr(self, attr) + getattr(other, attr))
+        return self
+
+    @property
+    def neg(self):
+        return self.n - self.pos
+
+    @property
+    def mean(self):
+        return self.total / self.n if self.n else None
+
+    def better_worse_same_pcts(self):
+        return 100.0 * self.better / self.n, 100.0 * self.worse / self.n, 100.0 * self.same / self.n
+
+    def __len__(self):
+        return self.n
+
+    def __repr__(self):
+        return f"SavingsStats(n={self.n}, mean={self.mean}, better={self.better}, worse={self.worse}, same={self.same})"
+
+
+class SavingsSummary:
+    KEYS = ('pair', 'trade_size', 'agg')
+
+    def __init__(self):
+        self.stats = {} # (pair, trade_size, agg) => SavingsStats
+
+    def add(self, pair, trade_size, agg, pct_savings):
+        key = (pair, trade_size, agg)
+        if key not in self.stats: self.stats[key] = SavingsStats()
+        self.stats[key].add(pct_savings)
+
+    def merge(self, other):
+        for key, stats in other.stats.items():
+            if key in self.stats: self.stats[key].merge(stats)
+            else: self.stats[key] = SavingsStats().merge(stats)
+        return self
+
+    def group_by(self, *keys, where=None):
+        """Returns {group: SavingsStats} where group is the value (or tuple of values if several keys) of the given keys,
+        e.g. group_by('agg', 'trade_size'). where(pair, trade_size, agg) can be given to filter groups"""
+        idx = [ self.KEYS.index(k) for k in keys ]
+        groups = {}
+        for key, stats in self.stats.items():
+            if where and not where(*key): continue
+            group = key[idx[0]] if len(idx) == 1 else tuple(key[i] for i in idx)
+            if group not in groups: groups[group] = SavingsStats()
+            groups[group].merge(stats)
+        return groups
+
+    def nested(self, outer_key, inner_key, where=None):
+        """Returns {outer: {inner: SavingsStats}}, e.g. nested('trade_size', 'agg') has the shape of aggregated_savings()"""
+        r = defaultdict(dict)
+        for (outer, inner), stats in self.group_by(outer_key, inner_key, where=where).items():
+            r[outer][inner] = stats
+        return r
+
+    def total(self, where=None):
+        stats = SavingsStats()
+        for key, s in self.stats.items():
+            if not where or where(*key): stats.merge(s)
+        return stats
+
+
+def summarize(per_pair_savings):
+    """Returns a new SavingsSummary of the given {pair: {trade_size: {agg: [pct_savings, ...]}}} dict, or per_pair_savings
+    itself if it is already a SavingsSummary, so reports on the same data can share one summary"""
+    if isinstance(per_pair_savings, SavingsSummary): return per_pair_savings
+
+    summary = SavingsSummary()
+    for pair, trade_size, agg, pct_savings_list in data_import.pct_savings_gen(per_pair_savings):
+        summary.stats[(pair, trade_size, agg)] = SavingsStats(pct_savings_list)
+    return summary
@@ -1,9 +1,33 @@
 import sys
+import functools
+import json
+import math
+import mmap
+import os
+import struct
+from array import array
+from bisect import bisect_left, bisect_right
 from collections import defaultdict
-from itertools import permutations, combinations_with_replacement
+import heapq
+
+try:
+    import numpy as np
+except ImportError:
+    np = None # numpy is only needed for PriceEstimator.prices and the vectorized splitting_algorithm (load uses it if it's there)
+
 import data_import
 from v2_compare_prices import get_pct_savings
 
+ESTIMATOR_FILE_MAGIC = b'PESTv1\n\0'
+
+NO_PRICES, ONE_PRICE, LEAST_SQUARES = 'none', 'one', 'least_squares'
+
+def price_func(kind, a, b):
+    """Returns the price func for PriceEstimator.get_price_func_params"""
+    if kind == NO_PRICES: return lambda ts: float('inf')
+    if kind == ONE_PRICE: return lambda ts: b if float(ts) == a else float('inf')
+    return lambda ts: a * ts + b
+
 class PriceEstimator:
     def __init__(self, token, ex_ts_prices, ex_known_liquidity):
         # Since DEX.AG uses 'Radar Relay' we never get any price quotes for 0xMesh, which is used in Totle and
@@ -17,11 +41,12 @@ class PriceEstimator:
         self.num_price_points = { ex: len(ts_prices) for ex, ts_prices in ex_ts_prices.items()}
 
         # get the set of dexs and price_funcs (currently used only to set self.base_price)
-        self.all_dexs, self.price_funcs = set(), {}
+        self.all_dexs, self.price_funcs, self.price_func_params = set(), {}, {}
         for ex, ts_prices in ex_ts_prices.items():
             self.all_dexs.add(ex)
             if len(ts_prices) == 0: print(f"WARNING: no ts_prices for {token} {ex} all prices will be infinite")
-            self.price_funcs[ex] = self.get_price_func(ts_prices)
+            self.price_func_params[ex] = self.get_price_func_params(ts_prices)
+            self.price_funcs[ex] = price_func(*self.price_func_params[ex])
         self.all_dexs = sorted(self.all_dexs)
 
         # set the base price by finding the min price at 0.01 ETH
@@ -35,18 +60,100 @@ class PriceEstimator:
             for trade_size, price in ts_prices.items():
                 self.absolute_prices[float(trade_size)][ex] = price
 
+        # sorted trade sizes and prices for each dex, so interpolate_price can binary search instead of scanning
+        self.sampled_trade_sizes, self.sampled_prices = {}, {}
+        for ex in self.all_dexs:
+            samples = sorted((ts, prices[ex]) for ts, prices in self.absolute_prices.items() if prices.get(ex))
+            self.sampled_trade_sizes[ex] = [ ts for ts, _ in samples ]
+            self.sampled_prices[ex] = [ price for _, price in samples ]
+
+        self.hi_res_price_matrices = {} # max_trade_size => get_hi_res_price_matrix() result
+
     @classmethod
-    def construct(cls, token, ts_ex_pscs):
+    def construct(cls, token, ts_ex_pscs, ex_known_liquidity=None):
         """Returns a PriceEstimator by converting the given pscs into prices"""
         ex_ts_prices = defaultdict(lambda: defaultdict(dict))
         for ts, ex_pscs in ts_ex_pscs.items():
             for ex, pscs in ex_pscs.items():
                 ex_ts_prices[ex][ts] = first_price(pscs)
-        return cls(token, ex_ts_prices)
+        return cls(token, ex_ts_prices, defaultdict(float, ex_known_liquidity or {}))
 
     def __repr__(self):
         return f"CostEstimator<{self.token}>[{self.all_dexs}]"
 
+    def save(self, filename):
+        """Saves this estimator's state (fitted price funcs, sampled prices and any hi-res price matrices) to filename.
+        The file is a JSON header followed by packed doubles, so load() can map it into memory rather than parse it"""
+        dexs = list(self.all_dexs)
+        dex_index = { ex: i for i, ex in enumerate(dexs) }
+        doubles, header = [], {
+            'token': self.token, 'base_price': self.base_price, 'all_dexs': dexs,
+            'ex_known_liquidity': dict(self.ex_known_liquidity), 'num_price_points': self.num_price_points,
+            'price_func_params': self.price_func_params, 'samples': {}, 'hi_res_price_matrices': {},
+        }
+        def append(values):
+            doubles.extend(values)
+            return len(doubles) - len(values), len(values)
+
+        # (trade_size, dex, price) triples, which also covers samples that interpolate_price doesn't use
+        header['absolute_prices'] = append([ v for ts, ex_prices in self.absolute_prices.items() for ex, price in ex_prices.items()
+                                             for v in (ts, dex_index.get(ex, -1), float('nan') if price is None else price) ])
+        for ex in dexs:
+            header['samples'][ex] = append(self.sampled_trade_sizes[ex] + self.sampled_prices[ex])
+        for max_trade_size, ts_ex_prices in self.hi_res_price_matrices.items():
+            header['hi_res_price_matrices'][max_trade_size] = append([ v for ts, ex_prices in ts_ex_prices.items() for v in [ts] + [ ex_prices[ex] for ex in dexs ] ])
+
+        header_bytes = json.dumps(header).encode()
+        header_bytes += b' ' * (-(len(ESTIMATOR_FILE_MAGIC) + 4 + len(header_bytes)) % 8) # align the doubles
+        tmp_filename = f"{filename}.{os.getpid()}.tmp"
+        with open(tmp_filename, 'wb') as f:
+            f.write(ESTIMATOR_FILE_MAGIC + struct.pack('<I', len(header_bytes)) + header_bytes)
+            f.write(array('d', doubles).tobytes())
+        os.replace(tmp_filename, filename) # readers in other processes never see a partial file
+
+    @classmethod
+    def load(cls, filename):
+        """Returns a PriceEstimator restored from a file written by save() without refitting or recomputing anything.
+        The file is mapped read-only (the doubles with numpy.memmap if numpy is installed), so only its header is
+        parsed and each value is read straight out of the mapping"""
+        estimator = cls.__new__(cls)
+        with open(filename, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            if mm[:len(ESTIMATOR_FILE_MAGIC)] != ESTIMATOR_FILE_MAGIC: raise ValueError(f"{filename} is not a saved PriceEstimator")
+            header_start = len(ESTIMATOR_FILE_MAGIC) + 4
+            header_len, = struct.unpack('<I', mm[len(ESTIMATOR_FILE_MAGIC):header_start])
+            header = json.loads(mm[header_start:header_start + header_len])
+            doubles_start = header_start + header_len
+            if np and len(mm) > doubles_start:
+                doubles = np.memmap(filename, dtype='d', mode='r', offset=doubles_start)
+                estimator.restore(header, lambda offset_n: doubles[offset_n[0]:offset_n[0] + offset_n[1]].tolist())
+            else:
+                with memoryview(mm)[doubles_start:] as data, data.cast('d') as doubles:
+                    estimator.restore(header, lambda offset_n: doubles[offset_n[0]:offset_n[0] + offset_n[1]].tolist())
+        return estimator
+
+    def restore(self, header, values):
+        self.token, self.base_price, dexs = header['token'], header['base_price'], header['all_dexs']
+        self.all_dexs = dexs
+        self.ex_known_liquidity, self.num_price_points = defaultdict(float, header['ex_known_liquidity']), header['num_price_points']
+        self.price_func_params = { ex: tuple(params) for ex, params in header['price_func_params'].items() }
+        self.price_funcs = { ex: price_func(*params) for ex, params in self.price_func_params.items() }
+
+        self.absolute_prices = defaultdict(dict)
+        triples = values(header['absolute_prices'])
+        for ts, i, price in zip(triples[0::3], triples[1::3], triples[2::3]):
+            if i >= 0: self.absolute_prices[ts][dexs[int(i)]] = None if math.isnan(price) else price
+
+        self.sampled_trade_sizes, self.sampled_prices = {}, {}
+        for ex, offset_n in header['samples'].items():
+            samples = values(offset_n)
+            self.sampled_trade_sizes[ex], self.sampled_prices[ex] = samples[:len(samples)//2], samples[len(samples)//2:]
+
+        self.hi_res_price_matrices = {}
+        row_len = len(dexs) + 1
+        for max_trade_size, offset_n in header['hi_res_price_matrices'].items():
+            rows = values(offset_n)
+            self.hi_res_price_matrices[float(max_trade_size)] = { rows[r]: dict(zip(dexs, rows[r+1:r+row_len])) for r in range(0, len(rows), row_len) }
+
     def is_better(self, candidate, best_candidate, delta=0.0):
         """Returns True of the best_candidate is falsey or the price of candidate is lower than best_candidate"""
         if not best_candidate: return True
@@ -80,6 +187,7 @@ class PriceEstimator:
         return sum([ ts / self.get_absolute_price(ex,ts) for ex, ts in solution.items()])
 
     def solution_cost(self, solution):
+        if isinstance(solution, Solution) and solution.price_estimator is self: return solution.cost
         sum_cost = 0.0
         for dex, ts_allocation in solution.items():
             sum_cost += self.get_slippage_cost(dex, ts_allocation)
@@ -91,6 +199,10 @@ class PriceEstimator:
         # return ts * self.get_ls_normalized_slippage_price(ex, ts)
         return ts_allocation * self.get_normalized_price(dex, ts_allocation)
 
+    def slippage_costs(self, dex, ts_allocations):
+        """Returns get_slippage_cost for each of a numpy array of allocations to dex"""
+        return ts_allocations * ((self.prices(dex, ts_allocations) - self.base_price) / self.base_price)
+
     def get_normalized_price(self, dex, ts_allocation):
         abs_price = self.get_absolute_price(dex, ts_allocation)
         return (abs_price - self.base_price) / self.base_price
@@ -99,45 +211,79 @@ class PriceEstimator:
         trade_size = float(trade_size) # self.absolute_prices was created with float keys
         if trade_size == 0: return 0
         if self.absolute_prices.get(trade_size) and dex in self.absolute_prices[trade_size]: return self.absolute_prices[trade_size][dex]
-        return self.interpolate_price(dex, trade_size, self.absolute_prices)
-
-    def interpolate_price(self, dex, trade_size, matrix):
-        lower_ts, higher_ts = 0.0, float('inf')
-        sampled_trade_sizes = [sts for sts in matrix.keys() if matrix[sts].get(dex)]
-        for sampled_trade_size in sampled_trade_sizes:
-            if matrix[sampled_trade_size].get(dex):
-                if sampled_trade_size < trade_size and sampled_trade_size > lower_ts:
-                    lower_ts = sampled_trade_size
-                if sampled_trade_size > trade_size and sampled_trade_size < higher_ts:
-                    higher_ts = sampled_trade_size
-
-        if higher_ts == float('inf'):
-            if len(sampled_trade_sizes) > 1:
+        return self.interpolate_price(dex, trade_size)
+
+    def interpolate_price(self, dex, trade_size):
+        trade_sizes, prices = self.sampled_trade_sizes.get(dex, []), self.sampled_prices.get(dex, [])
+        higher = bisect_right(trade_sizes, trade_size) # index of the closest sample above trade_size
+
+        if higher == len(trade_sizes):
+            if len(trade_sizes) > 1:
                 # use the slope between the closest 2 samples to estimate price
-                t1, t2 = sampled_trade_sizes[-2:]
+                (t1, t2), (p1, p2) = trade_sizes[-2:], prices[-2:]
                 # extend only to known_liquidity for ex
                 if trade_size > self.ex_known_liquidity[dex] : return float('inf')
-                dydx = (matrix[t2][dex] - matrix[t1][dex]) / (t2 - t1)
-                return matrix[t2][dex] + ((trade_size - t2) * dydx)
+                dydx = (p2 - p1) / (t2 - t1)
+                return p2 + ((trade_size - t2) * dydx)
             else:
                 return float('inf')
 
-        l_price = self.base_price if lower_ts == 0.0 else matrix[lower_ts][dex]
-        h_price = matrix[higher_ts][dex]
+        lower = bisect_left(trade_sizes, trade_size) - 1 # index of the closest sample below trade_size
+        lower_ts, l_price = (0.0, self.base_price) if lower < 0 else (trade_sizes[lower], prices[lower])
+        higher_ts, h_price = trade_sizes[higher], prices[higher]
 
         frac = (trade_size - lower_ts) / (higher_ts - lower_ts)
         return l_price + frac * (h_price - l_price)
 
+    def prices(self, dex, trade_sizes):
+        """Returns the absolute prices for a sequence of trade sizes on dex, the same as calling get_absolute_price for
+        each one (using the same arithmetic, so results are identical). Returns a numpy array if numpy is installed,
+        otherwise a list"""
+        if not np: return [ self.get_absolute_price(dex, ts) for ts in trade_sizes ]
+
+        trade_sizes = np.asarray(trade_sizes, dtype=float)
+        sampled_trade_sizes, sampled_prices = np.array(self.sampled_trade_sizes.get(dex, [])), np.array(self.sampled_prices.get(dex, []))
+        n_samples = len(sampled_trade_sizes)
+        if n_samples == 0: return np.where(trade_sizes == 0, 0.0, float('inf'))
+
+        # interpolate between the closest samples below (or 0 ETH at base_price) and above each trade size
+        higher = np.searchsorted(sampled_trade_sizes, trade_sizes, side='right')
+        lower = np.searchsorted(sampled_trade_sizes, trade_sizes, side='left') - 1
+        h = np.minimum(higher, n_samples - 1)
+        lower_ts = np.where(lower < 0, 0.0, sampled_trade_sizes[np.maximum(lower, 0)])
+        l_price = np.where(lower < 0, self.base_price, sampled_prices[np.maximum(lower, 0)])
+        with np.errstate(divide='ignore', invalid='ignore'):
+            frac = (trade_sizes - lower_ts) / (sampled_trade_sizes[h] - lower_ts)
+            prices = l_price + frac * (sampled_prices[h] - l_price)
+
+        # use the slope between the last 2 samples beyond them, but extend only to known_liquidity for dex
+        beyond = higher == n_samples
+        if n_samples > 1:
+            (t1, t2), (p1, p2) = sampled_trade_sizes[-2:], sampled_prices[-2:]
+            dydx = (p2 - p1) / (t2 - t1)
+            prices = np.where(beyond, p2 + ((trade_sizes - t2) * dydx), prices)
+            beyond &= trade_sizes > self.ex_known_liquidity[dex]
+        prices = np.where(beyond, float('inf'), prices)
+
+        # sampled trade sizes have exact prices
+        exact = lower + 1 < higher
+        prices = np.where(exact, sampled_prices[np.minimum(lower + 1, n_samples - 1)], prices)
+        return np.where(trade_sizes == 0, 0.0, prices)
+
     def get_price_func(self, ts_prices):
+        return price_func(*self.get_price_func_params(ts_prices))
+
+    def get_price_func_params(self, ts_prices):
+        """Returns the (kind, a, b) from which price_func() makes the price func for ts_prices"""
         if len(ts_prices) == 0:  # no prices, so return a func that ensures this DEX won't be used
             print(f"WARNING: len(ts_prices) == 0")
-            return lambda ts: float('inf')
+            return NO_PRICES, 0.0, 0.0
         elif len(ts_prices) == 1:  # one prices, so return a func that returns that one price
             one_ts, one_price = list(ts_prices.items())[0]
-            return lambda ts: one_price if float(ts) == one_ts else float('inf')
+            return ONE_PRICE, one_ts, one_price
         else:  # return a func based on least squares
             slope, intercept = self.least_squares(ts_prices)
-            return lambda ts: slope * ts + intercept
+            return LEAST_SQUARES, slope, intercept
 
     def least_squares(self, ts_prices):
         # number of observations/points
@@ -164,6 +310,56 @@ class PriceEstimator:
         return self.price_funcs[ex](ts)
 
 
+class Solution(dict):
+    """A solution of the form { 'Bancor': 12, 'Kyber': 8 } that keeps the slippage cost of each allocation and their
+    total, so comparing solutions doesn't look up any prices and changing one allocation looks up only that dex's cost"""
+    def __init__(self, price_estimator, allocations=(), costs=None):
+        super().__init__(allocations)
+        self.price_estimator = price_estimator
+        self.costs = costs if costs is not None else { dex: price_estimator.get_slippage_cost(dex, ts_allocation) for dex, ts_allocation in self.items() }
+        self.cost = self.sum_costs()
+
+    def sum_costs(self):
+        # summed in allocation order, the same as PriceEstimator.solution_cost, so both give identical results
+        sum_cost = 0.0
+        for dex_cost in self.costs.values():
+            sum_cost += dex_cost
+        return sum_cost
+
+    def set(self, dex, ts_allocation, cost=None):
+        """Sets the dex's allocation and updates the total by the change in that dex's cost. cost is the slippage cost
+        of ts_allocation on dex, if the caller already has it"""
+        if cost is None: cost = self.price_estimator.get_slippage_cost(dex, ts_allocation)
+        old_cost = self.costs.get(dex, 0.0)
+        super().__setitem__(dex, ts_allocation)
+        self.costs[dex] = cost
+        self.update_cost(old_cost, cost)
+
+    def update_cost(self, old_cost, new_cost):
+        # an infinite term would make the delta inf - inf = nan, so totals with one are summed again instead
+        if math.isfinite(self.cost) and math.isfinite(old_cost) and math.isfinite(new_cost):
+            self.cost += new_cost - old_cost
+        else:
+            self.cost = self.sum_costs()
+
+    def __setitem__(self, dex, ts_allocation):
+        self.set(dex, ts_allocation)
+
+    def __delitem__(self, dex):
+        super().__delitem__(dex)
+        self.update_cost(self.costs.pop(dex), 0.0)
+
+    def add(self, dex, ts_allocation, cost=None):
+        """Adds ts_allocation to the dex's allocation (see set)"""
+        self.set(dex, self.get(dex, 0.0) + ts_allocation, cost)
+
+    def copy(self):
+        solution = Solution.__new__(Solution)
+        dict.update(solution, self)
+        solution.price_estimator, solution.costs, solution.cost = self.price_estimator, self.costs.copy(), self.cost
+        return solution
+
+
 def to_percentages(solution):
     """Converts a solution in ETH allocations to percent allocations (percents are rounded and not guaranteed to add up to 100)"""
     trade_size = sum(solution.values())
@@ -203,40 +399,105 @@ OPTIMAL_SOLUTIONS = {
 
 
 def enumerate_solutions(target_trade_size, price_estimator, dexs, max_ways=None):
-    """Evaluates solutions of the form { 'Bancor': 12, 'Kyber': 8 } """
-    hi_res_price_matrix = get_hi_res_price_matrix(price_estimator)
+    """Finds the lowest cost solutions of the form { 'Bancor': 12, 'Kyber': 8 } with allocations on the hi-res price
+    matrix grid. Returns (winner, best) where best[n] is the lowest cost solution using exactly n of the given dexs.
+
+    Rather than trying every permutation of dexs with every combination of trade sizes, this is a knapsack-style
+    dynamic program over the grid in 0.1 ETH units: cost[k][u] is the lowest cost of allocating u units to k of the
+    dexs seen so far. That's linear in the number of dexs and in the target trade size (times the grid size)"""
+    hi_res_price_matrix = get_hi_res_price_matrix(price_estimator, max_trade_size=max(100, target_trade_size))
     trade_sizes = [sts for sts in hi_res_price_matrix.keys() if sts <= target_trade_size]
-    max_ways = max_ways or len(dexs)
+    max_ways = min(max_ways or len(dexs), len(dexs))
     best, winner = [{}]*(max_ways+1), None
-    sol_cost = lambda solution: price_estimator.solution_cost(solution)
-
-    for n in range(1, len(best)):
-        # print(f"enumerate_solutions: computing the best {n}-DEX splits")
-        for dex_combos in permutations(dexs, n): # groups of n unique dexs
-            for ts_combos in combinations_with_replacement(trade_sizes, n): # groups of n trade sizes (including duplicates)
-                if sum(ts_combos) == target_trade_size:
-                    candidate_solution = dict(zip(dex_combos, ts_combos))
-                    candidate_cost = sol_cost(candidate_solution)
-                    if not best[n] or candidate_cost < sol_cost(best[n]):
-                        best[n] = candidate_solution
-                        if not winner or candidate_cost < sol_cost(winner):
-                            winner = candidate_solution
+
+    target_units = round(target_trade_size * 10)
+    if abs(target_units - target_trade_size * 10) > 1e-9: return winner, best # target_trade_size is not on the grid
+
+    # costs_by_dex[i] is a list of (units, trade_size, cost) for each grid point that dexs[i] can fill
+    costs_by_dex = []
+    for dex in dexs:
+        dex_costs = [ (round(ts * 10), ts, ts * hi_res_price_matrix[ts][dex]) for ts in trade_sizes ]
+        costs_by_dex.append([ (u, ts, c) for u, ts, c in dex_costs if c != float('inf') ])
+
+    # tables[i][k][u] is the lowest cost of allocating u units to exactly k of dexs[:i]
+    inf = float('inf')
+    cost = [ [0.0] + [inf] * target_units ] + [ [inf] * (target_units + 1) for _ in range(max_ways) ]
+    tables = [cost]
+    for i, dex_costs in enumerate(costs_by_dex):
+        new_cost = [ row[:] for row in cost ]
+        for k in range(1, min(i + 1, max_ways) + 1):
+            prev_row, row = cost[k-1], new_cost[k]
+            for u, _, c in dex_costs:
+                row[u:] = map(min, row[u:], [ p + c for p in prev_row[:target_units + 1 - u] ])
+        cost = new_cost
+        tables.append(cost)
+
+    winner_cost = inf
+    for n in range(1, max_ways + 1):
+        if cost[n][target_units] == inf: continue
+        best[n] = solution_from_tables(tables, costs_by_dex, dexs, n, target_units)
+        if cost[n][target_units] < winner_cost:
+            winner, winner_cost = best[n], cost[n][target_units]
 
     return winner, best
 
+def solution_from_tables(tables, costs_by_dex, dexs, n, target_units):
+    """Walks enumerate_solutions' cost tables backwards to recover the allocations of the best n-DEX solution"""
+    solution, k, u = {}, n, target_units
+    for i in reversed(range(len(dexs))):
+        if k == 0: break
+        if tables[i+1][k][u] == tables[i][k][u]: continue # dexs[i] is not part of the solution
+        for units, ts, c in costs_by_dex[i]:
+            if units <= u and tables[i][k-1][u-units] + c == tables[i+1][k][u]:
+                solution[dexs[i]] = ts
+                k, u = k - 1, u - units
+                break
+    return { dex: solution[dex] for dex in dexs if dex in solution }
+
+
+def marginal_cost_solution(target_trade_size, price_estimator, dexs, step=0.1, precision=4):
+    """Allocates target_trade_size in increments of step, each one going to the dex whose cost rises the least. This
+    water-filling gives the lowest cost solution when every dex's slippage cost is convex in trade size, and it takes
+    target_trade_size / step heap operations, so it's practical for trade sizes far beyond enumerate_solutions"""
+    allocs = dict.fromkeys(dexs, 0.0)
+    marginal_cost = lambda dex, inc: price_estimator.get_slippage_cost(dex, allocs[dex] + inc) - price_estimator.get_slippage_cost(dex, allocs[dex])
+
+    n_steps = int(target_trade_size / step + 1e-9)
+    increments = [step] * n_steps
+    if target_trade_size - n_steps * step > 10**-precision: increments.append(target_trade_size - n_steps * step)
+
+    heap = [ (marginal_cost(dex, step), i, dex) for i, dex in enumerate(dexs) ]
+    heapq.heapify(heap)
+    for n, inc in enumerate(increments):
+        if inc != step: # the odd last increment needs marginal costs for its own size
+            heap = [ (marginal_cost(dex, inc), i, dex) for _, i, dex in heap ]
+            heapq.heapify(heap)
+        cost, i, dex = heapq.heappop(heap)
+        if cost == float('inf'): return None # no dex has the liquidity for more
+        allocs[dex] += inc
+        heapq.heappush(heap, (marginal_cost(dex, step), i, dex))
+
+    return { dex: round(alloc, precision) for dex, alloc in allocs.items() if alloc > 0 }
+
 
 def get_hi_res_price_matrix(price_estimator, max_trade_size=100):
-    ts_ex_prices = defaultdict(dict)
+    """Returns normalized prices {trade_size: {dex: price}} on a 0.1 ETH grid up to 2 ETH then a 1 ETH grid up to
+    max_trade_size. Matrices are kept by the estimator, and saved with it (see estimator_cache)"""
+    max_trade_size = float(max_trade_size)
+    if max_trade_size not in price_estimator.hi_res_price_matrices:
+        price_estimator.hi_res_price_matrices[max_trade_size] = compute_hi_res_price_matrix(price_estimator, max_trade_size)
+    return price_estimator.hi_res_price_matrices[max_trade_size]
+
+def compute_hi_res_price_matrix(price_estimator, max_trade_size):
+    ts_ex_prices = {}
     # do 0.1 ETH granularity up to trade_size = 2
-    for i in range(1, 10*min(max_trade_size, 2)):
+    for i in range(1, int(10*min(max_trade_size, 2))):
         ts = i / 10
-        for ex in price_estimator.all_dexs:
-            ts_ex_prices[ts][ex] = price_estimator.get_normalized_price(ex, ts)
+        ts_ex_prices[ts] = { ex: price_estimator.get_normalized_price(ex, ts) for ex in price_estimator.all_dexs }
 
     for i in range(2, int(max_trade_size)+1):
         ts = round(float(i),1)
-        for ex in price_estimator.all_dexs:
-            ts_ex_prices[ts][ex] = price_estimator.get_normalized_price(ex, ts)
+        ts_ex_prices[ts] = { ex: price_estimator.get_normalized_price(ex, ts) for ex in price_estimator.all_dexs }
 
     return ts_ex_prices
 
@@ -267,31 +528,26 @@ def run_optimization_algorithms(token, ts_ex_pscs, target_trade_sizes, delta=0.0
         # price_estimator.compare_costs(f"Rebalancing Branch vs optimal", optimal, rebalancing_branch_winner)
         # price_estimator.compare_costs(f"Rebalancing Branch vs Basic Branch", branch_winner, rebalancing_branch_winner)
 
-def splitting_algorithm(target_trade_size, price_estimator, delta=0.005, exclude_dexs=[], precision=4):
+# splitting_algorithm costs all of the fractions for a DEX at once with numpy, unless this or its vectorized arg is False
+VECTORIZED_SPLITTING = np is not None
+SPLIT_FRACS = [ j/100 for j in range(1,100) ]
+
+def splitting_algorithm(target_trade_size, price_estimator, delta=0.005, exclude_dexs=[], precision=4, vectorized=None):
     """Performs the splitting algorithm on all dexs not in exclude_dexs, adding DEXs that lower cost by more than delta"""
+    vectorized = VECTORIZED_SPLITTING if vectorized is None else vectorized
+    if vectorized and not np: raise ImportError("vectorized splitting_algorithm requires numpy")
+    best_split_with = best_split_with_dex_vectorized if vectorized else best_split_with_dex
 
     # get a ranking of dexs by lowest cost at target_trade_size
     sorted_dexs = price_estimator.dexs_ranked_by_cost(target_trade_size)
     if exclude_dexs: sorted_dexs = [d for d in sorted_dexs if d not in exclude_dexs]
 
     # start with baseline candidate: 1 DEX with the lowest cost at target_trade_size
-    best_new_candidate = {sorted_dexs[0]: target_trade_size}
+    best_new_candidate = Solution(price_estimator, {sorted_dexs[0]: target_trade_size})
 
     # loop over remaining DEXs adding some amount of each as long as cost gets lower
     for dex in sorted_dexs[1:]:
-        best_candidate_for_dex = None
-        # Iterate over all j because the slippage cost function has multiple local minima
-        for j in range(1,100):
-            frac = j/100
-            # create a new candidate with frac allocated to the new dex and (1 - frac) allocated to the the existing ones
-            new_candidate = { existing_dex: round(alloc*(1-frac),precision) for existing_dex,alloc in best_new_candidate.items() }
-            new_alloc = round(target_trade_size - sum(new_candidate.values()), precision)
-            new_candidate[dex] = new_alloc # i.e. frac * target_trade_size
-
-            # Find the candidate with the minimum cost (no delta) for this exchange. If it beats
-            # the existing best by delta, then we'll add the exchange to the best solution
-            if price_estimator.is_better(new_candidate, best_candidate_for_dex):
-                best_candidate_for_dex = new_candidate
+        best_candidate_for_dex = best_split_with(dex, best_new_candidate, target_trade_size, price_estimator, precision)
 
         # If the best candidate for this dex beats the best overall by more than delta then
         # make it the best overall
@@ -300,13 +556,48 @@ def splitting_algorithm(target_trade_size, price_estimator, delta=0.005, exclude
 
     return best_new_candidate
 
+def best_split_with_dex(dex, best_new_candidate, target_trade_size, price_estimator, precision):
+    """Returns the lowest cost Solution that allocates some fraction of target_trade_size to dex"""
+    best_candidate_for_dex = None
+    # Iterate over all j because the slippage cost function has multiple local minima
+    for frac in SPLIT_FRACS:
+        # create a new candidate with frac allocated to the new dex and (1 - frac) allocated to the the existing ones
+        new_candidate = { existing_dex: round(alloc*(1-frac),precision) for existing_dex,alloc in best_new_candidate.items() }
+        new_alloc = round(target_trade_size - sum(new_candidate.values()), precision)
+        new_candidate[dex] = new_alloc # i.e. frac * target_trade_size
+        new_candidate = Solution(price_estimator, new_candidate)
+
+        # Find the candidate with the minimum cost (no delta) for this exchange. If it beats
+        # the existing best by delta, then we'll add the exchange to the best solution.
+        if price_estimator.is_better(new_candidate, best_candidate_for_dex):
+            best_candidate_for_dex = new_candidate
+
+    return best_candidate_for_dex
+
+def best_split_with_dex_vectorized(dex, best_new_candidate, target_trade_size, price_estimator, precision):
+    """Same as best_split_with_dex, but costs the candidates for all fractions at once. The allocations are rounded
+    and the costs summed in the same order as in best_split_with_dex, so both return identical results"""
+    # the columns of the len(SPLIT_FRACS) x n_dex allocation matrix, existing dexs first
+    columns = { existing_dex: [ round(alloc*(1-frac),precision) for frac in SPLIT_FRACS ] for existing_dex, alloc in best_new_candidate.items() }
+    existing_sums = [ sum(row) for row in zip(*columns.values()) ]
+    columns[dex] = [ round(target_trade_size - s, precision) for s in existing_sums ]
+
+    costs, column_costs = np.zeros(len(SPLIT_FRACS)), {}
+    for column_dex, allocs in columns.items():
+        column_costs[column_dex] = price_estimator.slippage_costs(column_dex, np.array(allocs))
+        costs = costs + column_costs[column_dex]
+
+    j = int(np.argmin(costs)) # the first of any equal costs, like the scalar loop
+    return Solution(price_estimator, { column_dex: allocs[j] for column_dex, allocs in columns.items() },
+                    costs={ column_dex: float(c[j]) for column_dex, c in column_costs.items() })
+
 
 
 def rebalancing_branch_and_bound_solutions(target_trade_size, price_estimator, dexs, precision=4):
     # get a ranking of dexs by lowest cost at target_trade_size
     sorted_dexs = price_estimator.dexs_ranked_by_cost(target_trade_size)
     # start with baseline candidate: 1 DEX with the lowest cost at target_trade_size
-    best_new_candidate = {sorted_dexs[0]: target_trade_size}
+    best_new_candidate = Solution(price_estimator, {sorted_dexs[0]: target_trade_size})
     print(f"rebal baseline={best_new_candidate} sorted_dexs[1:]={sorted_dexs[1:]}")
 
     # loop over remaining DEXs adding some amount of each as long as cost gets lower
@@ -322,6 +613,7 @@ def rebalancing_branch_and_bound_solutions(target_trade_size, price_estimator, d
                 raise ValueError(f"BIG DIFF ({abs(new_alloc - (frac * target_trade_size)):.4f}) between new_alloc={new_alloc:.4f} and (frac * target_trade_size) {frac * target_trade_size:.4f}")
 
             new_candidate[ex] = new_alloc # frac * target_trade_size
+            new_candidate = Solution(price_estimator, new_candidate)
 
             if abs(sum(new_candidate.values()) - target_trade_size) > 10**-precision:
                 raise ValueError(f"new_candidate sum allocations = {sum(new_candidate.values())}\n{new_candidate}")
@@ -329,7 +621,7 @@ def rebalancing_branch_and_bound_solutions(target_trade_size, price_estimator, d
 
             if price_estimator.is_better(new_candidate, best_for_ex):
                 if best_for_ex:
-                    how_much_better = price_estimator.solution_cost(new_candidate) - price_estimator.solution_cost(best_for_ex)
+                    how_much_better = new_candidate.cost - best_for_ex.cost
                     # print(f"{ex} at {new_alloc} is {how_much_better:.4f} better: \t{new_candidate}")
                 best_for_ex = new_candidate
 
@@ -339,7 +631,7 @@ def rebalancing_branch_and_bound_solutions(target_trade_size, price_estimator, d
             if len(best_for_ex) == 3:
                 print(f"starting rebalance on {sorted_dexs[2]} best_for_ex={best_for_ex} sorted_dexs={sorted_dexs}")
                 even_better_candidate = optimal_rebalance(ex, best_for_ex, price_estimator)
-                how_much = price_estimator.solution_cost(even_better_candidate) - price_estimator.solution_cost(best_for_ex)
+                how_much = even_better_candidate.cost - best_for_ex.cost
                 print(f"rebal even better {how_much:.4f}: {even_better_candidate}")
                 best_for_ex = even_better_candidate
 
@@ -348,7 +640,8 @@ def rebalancing_branch_and_bound_solutions(target_trade_size, price_estimator, d
     return best_new_candidate
 
 def optimal_rebalance(new_ex, new_candidate, price_estimator):
-    """Given some new DEX and solution try to find a better one by optimizing the split between the existing DEXs"""
+    """Given some new DEX and solution try to find a better one by optimizing the split between the existing DEXs. The
+    test candidates are copies of new_candidate, so only the two rebalanced DEXs' costs are looked up for each"""
     new_ex_fixed_alloc = new_candidate[new_ex]
     old_exs_allocs = {x: t for x, t in new_candidate.items() if x != new_ex }
     if not len(old_exs_allocs) == 2:
@@ -356,14 +649,14 @@ def optimal_rebalance(new_ex, new_candidate, price_estimator):
     d1, d2 = list(old_exs_allocs.keys())
     sum_old_allocs = sum(old_exs_allocs.values())
 
-    best_candidate = new_candidate.copy()
+    best_candidate = Solution(price_estimator, new_candidate)
     for i in range(1, 101):
         frac = i / 100
-        test_candidate = {new_ex: new_ex_fixed_alloc}
+        test_candidate = best_candidate.copy()
         test_candidate[d1] = round(sum_old_allocs * frac, 4)
         test_candidate[d2] = round(sum_old_allocs - test_candidate[d1], 4)
-        how_much_better = price_estimator.solution_cost(test_candidate) - price_estimator.solution_cost(best_candidate)
-        # print(f"\t\t{how_much_better} better: \t{price_estimator.solution_cost(test_candidate)} - {solution_cost(price_estimator.best_candidate)} \t{test_candidate}")
+        how_much_better = test_candidate.cost - best_candidate.cost
+        # print(f"\t\t{how_much_better} better: \t{test_candidate.cost} - {best_candidate.cost} \t{test_candidate}")
 
         if price_estimator.is_better(test_candidate, best_candidate):
             best_candidate = test_candidate
@@ -372,12 +665,18 @@ def optimal_rebalance(new_ex, new_candidate, price_estimator):
 
 
 
-def greedy_solutions(target_trade_size, price_estimator, dexs):
-    max_steps = round(target_trade_size * 2)
-    best, winner = [{}]*(max_steps+1), None
+def greedy_solutions(target_trade_size, price_estimator, dexs, step_counts=None):
+    """Returns the winner, a list of the solution for each of step_counts (by default every count from 1 to
+    2 * target_trade_size) and the step count of the winner. greedy_alg runs only once, at the largest step count, and
+    the solution for each smaller step count is that fine solution rounded onto its coarser grid (see round_to_steps)"""
+    step_counts = step_counts or range(1, round(target_trade_size * 2) + 1)
+    fine_steps = max(step_counts)
+    best, winner, best_steps = [{}]*(fine_steps+1), None, None
+    slippage_cost = memoized_slippage_cost(price_estimator)
+    fine_solution = greedy_alg(target_trade_size, price_estimator, dexs, fine_steps, slippage_cost=slippage_cost)
 
-    for steps in range(1, max_steps + 1):
-        best[steps] = greedy_alg(target_trade_size, price_estimator, dexs, steps)
+    for steps in step_counts:
+        best[steps] = fine_solution if steps == fine_steps else round_to_steps(fine_solution, target_trade_size, steps, slippage_cost)
         if price_estimator.is_better(best[steps], winner):
             # print(f"{steps} steps is best so far for target_trade_size={target_trade_size}")
             winner = best[steps]
@@ -385,21 +684,55 @@ def greedy_solutions(target_trade_size, price_estimator, dexs):
 
     return winner, best, best_steps
 
-def greedy_alg(target_trade_size, price_estimator, dexs, steps):
-    """Finds a solution by choosing the best option at each step (steps=10 takes ten steps)"""
-    candidate = defaultdict(float)
+def round_to_steps(solution, target_trade_size, steps, slippage_cost, precision=4):
+    """Returns a Solution that allocates target_trade_size in steps of target_trade_size / steps, as close to solution
+    as the grid allows: each dex gets the whole steps in its allocation, and the steps left over go to the dexs with the
+    largest remainders. slippage_cost is used to cost the new allocations"""
+    step_size = target_trade_size / steps
+    dex_steps = { dex: int(alloc / step_size + 1e-9) for dex, alloc in solution.items() }
+    remainders = sorted(solution, key=lambda dex: solution[dex] / step_size - dex_steps[dex], reverse=True)
+    for dex in remainders[:steps - sum(dex_steps.values())]:
+        dex_steps[dex] += 1
+
+    allocs = { dex: round(n * step_size, precision) for dex, n in dex_steps.items() if n }
+    last_dex = list(allocs)[-1] # absorbs the rounding so allocations add up to target_trade_size
+    allocs[last_dex] = round(target_trade_size - sum(a for dex, a in allocs.items() if dex != last_dex), precision)
+    return Solution(solution.price_estimator, allocs, costs={ dex: slippage_cost(dex, alloc) for dex, alloc in allocs.items() })
+
+MEMO_SIZE = 100000 # max number of slippage costs memoized_slippage_cost keeps
+
+def memoized_slippage_cost(price_estimator, precision=4, maxsize=MEMO_SIZE):
+    """Returns price_estimator.get_slippage_cost for allocations rounded to precision digits, keeping the last maxsize
+    (dex, allocation) costs. Allocations are rounded before they are costed, so allocations that differ only by float
+    error share one entry"""
+    rounded_slippage_cost = functools.lru_cache(maxsize=maxsize)(price_estimator.get_slippage_cost)
+    return lambda dex, ts_allocation: rounded_slippage_cost(dex, round(ts_allocation, precision))
+
+def greedy_alg(target_trade_size, price_estimator, dexs, steps, slippage_cost=None):
+    """Finds a solution by choosing the best option at each step (steps=10 takes ten steps). The dexs' marginal costs
+    for the next step are kept in a heap, so each step pops the cheapest dex and costs only that dex's next step. The
+    heap entries carry the dex's cost after the step, which the Solution takes as that dex's new cost term"""
+    slippage_cost = slippage_cost or price_estimator.get_slippage_cost
     step_size = round(target_trade_size / steps, 4)
-    while sum(candidate.values()) < target_trade_size:
-        next_step_size = min(target_trade_size - sum(candidate.values()), step_size)
-        best_new_candidate = None
-        for ex in dexs:
-            new_candidate = candidate.copy()
-            new_candidate[ex] += next_step_size
-            if price_estimator.is_better(new_candidate, best_new_candidate):
-                best_new_candidate = new_candidate
-        candidate = best_new_candidate
-        # print(f"allocated={sum(candidate.values())} best_dex={best_dex}, best_cost={best_cost} next_step_size={next_step_size} candidate={dict(candidate)}")
-    return dict(candidate)
+    candidate, allocated = Solution(price_estimator), 0.0
+    def marginal_cost(i, dex, inc):
+        new_cost = slippage_cost(dex, candidate.get(dex, 0.0) + inc)
+        # a dex that can't fill the step costs inf more, even if it already costs inf (inf - inf would be nan)
+        return float('inf') if new_cost == float('inf') else new_cost - candidate.costs.get(dex, 0.0), i, dex, new_cost
+
+    heap = [ marginal_cost(i, dex, step_size) for i, dex in enumerate(dexs) ]
+    heapq.heapify(heap)
+    while allocated < target_trade_size:
+        next_step_size = min(target_trade_size - allocated, step_size)
+        if next_step_size != step_size: # a short last step needs marginal costs for its own size
+            heap = [ marginal_cost(i, dex, next_step_size) for _, i, dex, _ in heap ]
+            heapq.heapify(heap)
+        _, i, dex, new_cost = heapq.heappop(heap)
+        candidate.add(dex, next_step_size, new_cost)
+        allocated += next_step_size
+        heapq.heappush(heap, marginal_cost(i, dex, step_size))
+        # print(f"allocated={allocated} best_dex={dex} next_step_size={next_step_size} candidate={dict(candidate)}")
+    return candidate
 
 ########################################################################################################################
 # CSV generation functions
@@ -0,0 +1,158 @@
+import concurrent.futures
+import csv
+import glob
+import gzip
+import io
+import os
+import sqlite3
+import sys
+import threading
+
+import json_utils
+import totle_client
+
+##############################################################################################
+#
+# Local archive of Totle API snapshots
+#
+# Snapshots (every viable route and trade for a response id, see totle_client.get_snapshot) are
+# appended as independent gzip members to a single data file, and a SQLite index maps each
+# response id to the offset and length of its member. Reading a snapshot seeks to its member and
+# decompresses only that, so batch jobs over thousands of ids don't touch a file per id, and
+# prefetch() fills the archive from the network with bounded parallelism beforehand.
+#
+# Set SNAPSHOT_ARCHIVE_DIR or call configure() to move the archive. Loose snapshot files (as
+# snapshot_utils used to save them, one indented JSON file per id) can be added with
+# import_directory().
+
+ARCHIVE_DIR = os.environ.get('SNAPSHOT_ARCHIVE_DIR', f"{os.path.dirname(os.path.abspath(__file__))}/data/snapshot_archive")
+DATA_FILENAME, INDEX_FILENAME = 'snapshots.gz.dat', 'index.sqlite'
+MAX_PREFETCH_WORKERS = 8
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS snapshots (id TEXT PRIMARY KEY, offset INTEGER, length INTEGER);
+"""
+
+_conn, _conn_pid = None, None
+_lock = threading.Lock()
+
+
+def configure(archive_dir=None):
+    global ARCHIVE_DIR, _conn
+    with _lock:
+        if archive_dir is not None and archive_dir != ARCHIVE_DIR:
+            ARCHIVE_DIR = archive_dir
+            if _conn: _conn.close()
+            _conn = None
+
+def connection():
+    """Returns the shared SQLite connection to the index (must be called with _lock held). Worker processes forked
+    from a process that already had a connection open their own, since SQLite connections can't be shared"""
+    global _conn, _conn_pid
+    if not _conn or _conn_pid != os.getpid():
+        os.makedirs(ARCHIVE_DIR, exist_ok=True)
+        _conn, _conn_pid = sqlite3.connect(os.path.join(ARCHIVE_DIR, INDEX_FILENAME), check_same_thread=False), os.getpid()
+        _conn.executescript(SCHEMA)
+    return _conn
+
+def data_filename():
+    return os.path.join(ARCHIVE_DIR, DATA_FILENAME)
+
+def contains(id):
+    with _lock:
+        return connection().execute("SELECT 1 FROM snapshots WHERE id = ?", (str(id),)).fetchone() is not None
+
+def ids():
+    with _lock:
+        return [ row[0] for row in connection().execute("SELECT id FROM snapshots") ]
+
+def put(id, content):
+    """Adds the snapshot JSON content (str or bytes) for id to the archive, replacing any earlier one"""
+    if isinstance(content, str): content = content.encode()
+    member = gzip.compress(content)
+    with _lock:
+        conn = connection()
+        with open(data_filename(), 'ab') as f:
+            offset = f.seek(0, os.SEEK_END)
+            f.write(member)
+        with conn:
+            conn.execute("INSERT OR REPLACE INTO snapshots (id, offset, length) VALUES (?, ?, ?)", (str(id), offset, len(member)))
+
+def read_member(id):
+    """Returns the compressed gzip member for id, fetching it into the archive if needed"""
+    if not contains(id): fetch(id)
+    with _lock:
+        offset, length = connection().execute("SELECT offset, length FROM snapshots WHERE id = ?", (str(id),)).fetchone()
+    with open(data_filename(), 'rb') as f:
+        f.seek(offset)
+        return f.read(length)
+
+def open_snapshot(id):
+    """Returns a text file object with the JSON of the snapshot for id, fetching it into the archive if needed"""
+    return io.TextIOWrapper(gzip.GzipFile(fileobj=io.BytesIO(read_member(id))), encoding='utf-8')
+
+def get(id):
+    """Returns the snapshot JSON for id, fetching it into the archive if needed"""
+    return json_utils.loads(gzip.decompress(read_member(id)))
+
+def fetch(id):
+    """Fetches the snapshot for id from the network into the archive"""
+    put(id, json_utils.dumps(totle_client.get_snapshot(id)))
+
+
+##############################################################################################
+#
+# Bulk loading
+#
+
+def prefetch(response_ids, max_workers=MAX_PREFETCH_WORKERS):
+    """Fetches the snapshots for the given response ids that aren't already archived, max_workers at a time. Returns
+    {id: exception} for the ids that could not be fetched. Progress is printed to stderr"""
+    missing = sorted({ str(id) for id in response_ids } - set(ids()))
+    print(f"prefetching {len(missing)} snapshots ({max_workers} at a time) into {ARCHIVE_DIR} ...", file=sys.stderr)
+
+    failures = {}
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+        future_ids = { executor.submit(fetch, id): id for id in missing }
+        for n, future in enumerate(concurrent.futures.as_completed(future_ids), 1):
+            try:
+                future.result()
+            except Exception as e:
+                failures[future_ids[future]] = e
+            if n % 100 == 0: print(f"   {n}/{len(missing)} fetched ({len(failures)} failed)", file=sys.stderr)
+
+    for id, e in failures.items(): print(f"   FAILED to fetch snapshot {id}: {e}", file=sys.stderr)
+    return failures
+
+def ids_in_csvs(csv_files):
+    """Returns the set of response ids in the id column of the given output CSV files"""
+    csv_ids = set()
+    for csv_file in csv_files:
+        with open(csv_file, newline='') as f:
+            csv_ids |= { row['id'] for row in csv.DictReader(f) if row.get('id') }
+    return csv_ids
+
+def import_directory(directory):
+    """Adds each file in directory (named by its response id, as saved by the old fetch_snapshot) to the archive"""
+    archived, n = set(ids()), 0
+    for filename in glob.glob(os.path.join(directory, '*')):
+        id = os.path.basename(filename)
+        if id in archived: continue
+        with open(filename) as f:
+            put(id, json_utils.dumps(json_utils.load(f)))
+        n += 1
+    return n
+
+def stats():
+    with _lock:
+        n_snapshots, n_bytes = connection().execute("SELECT COUNT(*), COALESCE(SUM(length), 0) FROM snapshots").fetchone()
+    return {'snapshots': n_snapshots, 'compressed_bytes': n_bytes}
+
+
+def main():
+    csv_files = sys.argv[1:] or glob.glob('outputs/totle_vs_agg_*')
+    failures = prefetch(ids_in_csvs(csv_files))
+    print(f"{stats()} ({len(failures)} failed)")
+
+if __name__ == "__main__":
+    main()
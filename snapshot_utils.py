@@ -1,29 +1,31 @@
+import concurrent.futures
+import contextlib
+import csv
 import functools
-import json
+import io
+import itertools
 import os
+import sys
+import time
 from collections import defaultdict
 
+import json_stream
+import json_utils
+import snapshot_archive
 import token_utils
 import totle_client
 
 DEFAULT_PCT_INC = 2
 
+_exchanges_by_id = None # set in analyze_snapshots workers so that each one doesn't fetch the exchanges
+
 @functools.lru_cache(64)
 def exchange_name(ex_id):
-    return totle_client.exchanges_by_id()[ex_id]
+    return (_exchanges_by_id or totle_client.exchanges_by_id())[ex_id]
 
-SNAP_DATA_DIRECTORY = '/Users/ejp/projects/totle_api_client/snap_data'
 def fetch_snapshot(id):
-    json_filename = os.path.join(SNAP_DATA_DIRECTORY, str(id))
-    if os.path.exists(json_filename):
-        # print(f"FOUND JSON file for {id}!")
-        return json.load(open(json_filename))
-    else:
-        # print(f"FETCHING JSON from network, saving into {json_filename}")
-        j = totle_client.get_snapshot(id)
-        with open(json_filename, 'w') as outfile:
-            json.dump(j, outfile, indent=3)
-        return j
+    """Returns the snapshot JSON for id from the local snapshot_archive, which fetches it from the network if needed"""
+    return snapshot_archive.get(id)
 
 
 def fetch_and_print_curve_info(id):
@@ -31,15 +33,110 @@ def fetch_and_print_curve_info(id):
 
 def fetch_and_get_curve_info(id):
     '''Returns an array of swaps and the info related to their best routes for the given id'''
-    return get_curve_info(fetch_snapshot(id))
+    with snapshot_archive.open_snapshot(id) as f:
+        return get_curve_info_from_stream(f)
 
 
 def get_curve_info(j):
     '''Returns an array of swaps and the info related to their best routes for the given JSON'''
+    swaps_routes = ( (swap, swap['routes']) for swap in j['swaps'] )
+    return curve_info_from_swaps(j['response']['response'], select_routes_by_swap(swaps_routes))
+
+def get_curve_info_from_file(filename):
+    with open(filename) as f:
+        return get_curve_info_from_stream(f)
+
+def get_curve_info_from_stream(f):
+    '''Same as get_curve_info(json.load(f)), but streams the snapshot so that only the summary and the few routes
+    that are selected for each swap are decoded, rather than every viable route and all of their trades'''
+    stream = json_stream.JSONStream(f)
+    respresp, selected_routes = None, []
+    for key in stream.keys():
+        if key == 'response':
+            respresp = stream_respresp(stream)
+        elif key == 'swaps':
+            selected_routes = list(select_routes_by_swap(stream_swaps(stream)))
+        else:
+            stream.skip()
+    if respresp is None: raise ValueError(f"snapshot has no response")
+    return curve_info_from_swaps(respresp, selected_routes)
+
+SWAP_KEYS = ('sourceAsset', 'sourceAmount', 'rate')
+ROUTE_KEYS = ('sourceAsset', 'destinationAsset', 'sourceAmount', 'destinationAmount', 'rate')
+
+def stream_respresp(stream):
+    '''Returns the id and summary of the snapshot's response['response'] from stream'''
+    respresp = {}
+    for key in stream.keys():
+        if key == 'response':
+            for k in stream.keys():
+                if k in ('id', 'summary'): respresp[k] = stream.value()
+                else: stream.skip()
+        else:
+            stream.skip()
+    return respresp
+
+def stream_swaps(stream):
+    '''Yields (swap, routes) for each swap in stream, where routes is an iterator over its routes. Only the fields of
+    swaps and routes needed to select routes are decoded; each route's trades are kept as JSON text'''
+    for _ in stream.elements():
+        swap, routes_yielded = {}, False
+        for key in stream.keys():
+            if key == 'routes' and all(k in swap for k in SWAP_KEYS):
+                yield swap, stream_routes(stream) # routes are selected as they are read
+                routes_yielded = True
+            elif key == 'routes':
+                swap['routes'] = list(stream_routes(stream)) # kept until the rest of the swap has been read
+            elif key in SWAP_KEYS:
+                swap[key] = stream.value()
+            else:
+                stream.skip()
+        if not routes_yielded: yield swap, swap.get('routes', [])
+
+def stream_routes(stream):
+    for _ in stream.elements():
+        route = {}
+        for key in stream.keys():
+            if key == 'trades': route['trades'] = stream.raw()
+            elif key in ROUTE_KEYS: route[key] = stream.value()
+            else: stream.skip()
+        yield route
+
+def route_trades(route):
+    '''Returns route's trades, decoding them if they were kept as JSON text by stream_routes'''
+    trades = route['trades']
+    return json_utils.loads(trades) if isinstance(trades, str) else trades
+
+def select_routes_by_swap(swaps_routes):
+    '''Yields (swap, better_route, used_route, best_route) for each (swap, routes) in a single pass over each swap's
+    routes. better_route has the highest rate, best_route has the highest rate among routes with enough liquidity (the
+    first one wins ties in both cases) and used_route is the last route with the swap's rate and enough liquidity'''
+    used_route = None # as before, a swap without a used route reports the one from the previous swap
+    for swap, routes in swaps_routes:
+        swap_source_asset = swap['sourceAsset']['symbol']
+        swap_source_amount = token_utils.real_amount(swap['sourceAmount'], swap_source_asset)
+        better_route, best_route = None, None
+
+        for route in routes:
+            route_source_asset = route['sourceAsset']['symbol']
+            if route_source_asset != swap_source_asset:
+                raise ValueError(f"route source asset={route_source_asset} BUUUUUT swap_source_asset={swap_source_asset}")
+            rate = float(route['rate'])
+            # routes without enough liquidity (sourceAmount) can't be the used or best route
+            has_liquidity = swap_source_amount - token_utils.real_amount(route['sourceAmount'], route_source_asset) < 0.5
+            if has_liquidity and route['rate'] == swap['rate']: used_route = route
+            if not better_route or rate > float(better_route['rate']): better_route = route
+            if has_liquidity and (not best_route or rate > float(best_route['rate'])): best_route = route
+
+        if not better_route: raise ValueError(f"swap of {swap_source_asset} has no routes")
+        if not best_route: raise ValueError(f"swap of {swap_source_asset} has no routes with enough liquidity")
+        if not used_route: raise ValueError(f"swap of {swap_source_asset} has no route with the swap's rate")
+        yield swap, better_route, used_route, best_route
+
+def curve_info_from_swaps(respresp, selected_routes):
+    '''Returns curve info for each (swap, better_route, used_route, best_route) given the response['response']'''
     curve_info = []
-    # sd = totle_client.swap_data(j['response']['response'], True)
 
-    respresp = j['response']['response']
     response_id = respresp['id']
     # if len(respresp['summary']) > 1: raise ValueError(f"response response has multiple summaries")
     summary = respresp['summary'][0]
@@ -47,84 +144,23 @@ def get_curve_info(j):
     summary_source_amount = token_utils.real_amount(summary['sourceAmount'], summary_source_asset)
     summary_rate = float(summary['rate'])
 
-    for swap in j['swaps']:
-        swap_data = {}
-
+    for swap, better_route, used_route, best_route in selected_routes:
         swap_source_asset = swap['sourceAsset']['symbol']
         swap_source_amount = token_utils.real_amount(swap['sourceAmount'], swap_source_asset)
 
         if swap_source_asset == summary_source_asset and round(swap_source_amount) != round(summary_source_amount):
             raise ValueError(f"swap_source_amount={round(swap_source_amount)} {swap_source_asset} DOES NOT EQUAL summary_source_amount {round(summary_source_amount)} {summary_source_asset}")
 
-        viable_routes = swap['routes']
-
-        for i, route in enumerate(viable_routes):
-            route_source_asset = route['sourceAsset']['symbol']
-            if route_source_asset != swap_source_asset:
-                raise ValueError(f"route source asset={route_source_asset} BUUUUUT swap_source_asset={swap_source_asset}")
-            if route['rate'] == swap['rate'] and swap_source_amount - token_utils.real_amount(route['sourceAmount'], route['sourceAsset']['symbol']) < 0.5:
-                used_route = route
-            #
-            # route_data = {
-            #     'source_asset': route['sourceAsset']['symbol'],
-            #     'destination_asset': route['destinationAsset']['symbol'],
-            #     'real_source_amount': token_utils.real_amount(route['sourceAmount'], route_source_asset),
-            #     'real_destination_amount': token_utils.real_amount(route['destinationAmount'], route['destinationAsset']['symbol']),
-            #     'num_trades': len(route['trades']),
-            #     'rate': float(route['rate']),
-            #     'trades': get_trades_info(route['trades'])
-            # }
-            # print(f"DEBUG Route {i} = { route_data['real_source_amount']} {route_data['source_asset']} gets {round(route_data['real_destination_amount'])} {route_data['destination_asset']} price={1 / route_data['rate']:.6g} rate={route_data['rate']:.6g} using {route_data['num_trades']} trades")
-
+        swap_data = {}
         # look for an aborted route that would have been better
-        better_route = max(viable_routes, key=lambda r: float(r['rate']))
         route_source_asset = better_route['sourceAsset']['symbol']
         route_source_amount = token_utils.real_amount(better_route['sourceAmount'], route_source_asset)
         # This (mostly) handles the case of a broken route with less than trade size source amount
-        if route_source_asset == summary_source_asset and route_source_amount < summary_source_amount:
-            trades_info = get_trades_info(better_route['trades'], for_realz_source_amount=summary_source_amount)
-        else:
-            trades_info = get_trades_info(better_route['trades'])
-
-        swap_data['better_route'] = {
-            'source_asset': route_source_asset,
-            'destination_asset': better_route['destinationAsset']['symbol'],
-            'real_source_amount': route_source_amount,
-            'real_destination_amount': token_utils.real_amount(better_route['destinationAmount'], better_route['destinationAsset']['symbol']),
-            'num_trades': len(better_route['trades']),
-            'rate': float(better_route['rate']),
-            'trades': trades_info
-        }
+        for_realz_source_amount = summary_source_amount if route_source_asset == summary_source_asset and route_source_amount < summary_source_amount else None
+        swap_data['better_route'] = get_route_info(better_route, for_realz_source_amount)
+        swap_data['used_route'] = get_route_info(used_route)
+        swap_data['best_route'] = get_route_info(best_route)
 
-        # filter out routes that don't have enough liquidity (sourceAmount)
-        viable_routes = filter(lambda route: swap_source_amount - token_utils.real_amount(route['sourceAmount'], route['sourceAsset']['symbol']) < 0.5, viable_routes)
-        best_route = max(viable_routes, key=lambda r: float(r['rate']))
-
-        # if best_route_source_asset == swap_source_asset and round(best_route_source_amount) != round(swap_source_amount):
-        #     raise ValueError(f"best_route_source_asset={round(best_route_source_amount)} {best_route_source_asset} DOES NOT EQUAL swap_source_amount {round(swap_source_amount)} {swap_source_asset}")
-
-        swap_data['used_route'] = {
-            'source_asset': used_route['sourceAsset']['symbol'],
-            'destination_asset': used_route['destinationAsset']['symbol'],
-            'real_source_amount': token_utils.real_amount(used_route['sourceAmount'], used_route['sourceAsset']['symbol']),
-            'real_destination_amount': token_utils.real_amount(used_route['destinationAmount'], used_route['destinationAsset']['symbol']),
-            # 'real_source_amount': swap_source_amount,
-            # 'real_destination_amount': token_utils.real_amount(swap['destinationAmount'], swap['destinationAsset']['symbol']),
-            'num_trades': len(used_route['trades']),
-            'rate': float(used_route['rate']),
-            'trades': get_trades_info(used_route['trades'])
-        }
-
-        swap_data['best_route'] = {
-            'source_asset': best_route['sourceAsset']['symbol'],
-            'destination_asset': best_route['destinationAsset']['symbol'],
-            'real_source_amount': token_utils.real_amount(best_route['sourceAmount'], best_route['sourceAsset']['symbol']),
-            'real_destination_amount': token_utils.real_amount(best_route['destinationAmount'], best_route['destinationAsset']['symbol']),
-            'num_trades': len(best_route['trades']),
-            'rate': float(best_route['rate']),
-            'trades': get_trades_info(best_route['trades'])
-        }
-        
         if swap_data['best_route']['rate'] != summary_rate:
             print(f"\n*********************\nDIFF RATE: best_route rate={swap_data['best_route']['rate']} summary_rate={summary_rate}\n{response_id}\n")
 
@@ -135,6 +171,18 @@ def get_curve_info(j):
 
     return curve_info
 
+def get_route_info(route, for_realz_source_amount=None):
+    trades = route_trades(route)
+    return {
+        'source_asset': route['sourceAsset']['symbol'],
+        'destination_asset': route['destinationAsset']['symbol'],
+        'real_source_amount': token_utils.real_amount(route['sourceAmount'], route['sourceAsset']['symbol']),
+        'real_destination_amount': token_utils.real_amount(route['destinationAmount'], route['destinationAsset']['symbol']),
+        'num_trades': len(trades),
+        'rate': float(route['rate']),
+        'trades': get_trades_info(trades, for_realz_source_amount=for_realz_source_amount)
+    }
+
 
 def get_trades_info(trades, for_realz_source_amount=None):
     trade_datas = []
@@ -277,15 +325,14 @@ def print_max_allocs(curve_info, only_dexs=['Kyber', 'Uniswap', 'Oasis'], pct_in
                     print(f"   MAX POSSIBLE ALLOCATION of {split['pct']}% to {split['dex']} for {trade['destination_asset']}/{trade['source_asset']} (rate={split['rate']})")
 
 
-def is_zero_allocation_bug(id):
-    curve_info = fetch_and_get_curve_info(id)
+def is_zero_allocation_bug(curve_info):
+    """Returns True if a split of the better route of any swap in curve_info has a zero rate"""
     for swap in curve_info:
         better_route = swap['better_route']
         if better_route:
             for trade in better_route['trades']:
                 for split in trade['splits']:
-                    split_amount, split_rate = split['real_source_amount'], split['rate']
-                    if split_rate == 0:
+                    if split['rate'] == 0:
                         # print(f"*** ZERO ALLOC {split['dex']}")
                         return True
     return False
@@ -298,3 +345,74 @@ def is_top_liquidity(split):
     return split['high_index'] == split['last_index']
 
 
+
+
+##############################################################################################
+#
+# Batch analysis of many snapshots
+#
+
+ANALYSIS_FIELDS = ['id', 'error', 'num_swaps', 'num_splits', 'zero_alloc', 'max_allocs', 'max_alloc_dexs', 'top_liquidity',
+                   'used_rate', 'better_rate', 'best_rate', 'better_pct', 'best_pct']
+
+def analyze_curve_info(curve_info, pct_inc=DEFAULT_PCT_INC):
+    """Returns a row of flags and metrics for curve_info: whether its better route has a zero allocation split (see
+    is_zero_allocation_bug), the number of its used route's splits that are max allocations or at the top of their
+    liquidity curve, and how much higher (in percent) the better and best route rates are than the used route's"""
+    row = dict.fromkeys(ANALYSIS_FIELDS[2:])
+    used_splits = [ split for swap in curve_info for trade in swap['used_route']['trades'] for split in trade['splits'] ]
+    max_alloc_dexs = sorted({ split['dex'] for split in used_splits if is_max_alloc(split, pct_inc=pct_inc) })
+
+    row['num_swaps'], row['num_splits'] = len(curve_info), len(used_splits)
+    row['zero_alloc'] = is_zero_allocation_bug(curve_info)
+    row['max_allocs'] = sum(is_max_alloc(split, pct_inc=pct_inc) for split in used_splits)
+    row['max_alloc_dexs'] = ';'.join(max_alloc_dexs)
+    row['top_liquidity'] = sum(is_top_liquidity(split) for split in used_splits)
+    if curve_info:
+        swap = curve_info[0] # rates are compared for the first swap, which is the only one for most responses
+        row['used_rate'], row['better_rate'], row['best_rate'] = swap['used_route']['rate'], swap['better_route']['rate'], swap['best_route']['rate']
+        if row['used_rate']:
+            row['better_pct'] = 100 * (row['better_rate'] - row['used_rate']) / row['used_rate']
+            row['best_pct'] = 100 * (row['best_rate'] - row['used_rate']) / row['used_rate']
+    return row
+
+def analyze_snapshot(id, pct_inc=DEFAULT_PCT_INC, fetch=True):
+    """Returns the analyze_curve_info row for the snapshot of id. Errors are reported in the row rather than raised"""
+    try:
+        if not fetch and not snapshot_archive.contains(id): raise KeyError(f"{id} is not in the snapshot archive")
+        with contextlib.redirect_stdout(io.StringIO()): # skip the DIFF RATE and split warnings of thousands of snapshots
+            row = analyze_curve_info(fetch_and_get_curve_info(id), pct_inc=pct_inc)
+        row['error'] = None
+    except Exception as e:
+        row = dict.fromkeys(ANALYSIS_FIELDS[2:])
+        row['error'] = f"{type(e).__name__}: {e}"
+    row['id'] = id
+    return { field: row[field] for field in ANALYSIS_FIELDS }
+
+def init_analysis_worker(exchanges_by_id):
+    global _exchanges_by_id
+    _exchanges_by_id = exchanges_by_id
+
+def analyze_snapshots(ids, max_workers=None, pct_inc=DEFAULT_PCT_INC, prefetch=True, progress_every=1000):
+    """Yields an analyze_snapshot row for each of the given response ids (in order), parsing and analyzing them in
+    max_workers processes. Snapshots missing from the archive are prefetched first (unless prefetch=False, in which
+    case they are reported as errors) because workers only read the archive. Progress and throughput are printed
+    to stderr every progress_every ids, so they don't end up in the CSV"""
+    ids = list(ids)
+    if prefetch: snapshot_archive.prefetch(ids)
+
+    start = time.time()
+    with concurrent.futures.ProcessPoolExecutor(max_workers=max_workers, initializer=init_analysis_worker, initargs=(totle_client.exchanges_by_id(),)) as executor:
+        chunksize = max(1, min(100, len(ids) // (4 * (max_workers or os.cpu_count() or 1))))
+        for n, row in enumerate(executor.map(analyze_snapshot, ids, itertools.repeat(pct_inc), itertools.repeat(False), chunksize=chunksize), 1):
+            if n % progress_every == 0 or n == len(ids):
+                elapsed = time.time() - start
+                print(f"analyzed {n}/{len(ids)} snapshots in {elapsed:.1f}s ({n / elapsed:.1f} snapshots/s)", file=sys.stderr)
+            yield row
+
+def print_snapshot_analysis_csv(rows, file=None):
+    """Prints analyze_snapshot rows as CSV to file (default stdout)"""
+    writer = csv.writer(file or sys.stdout, lineterminator='\n') # quotes errors with commas, quotes or newlines in them
+    writer.writerow(ANALYSIS_FIELDS)
+    for row in rows:
+        writer.writerow([ f"{row[f]:.6g}" if isinstance(row[f], float) else row[f] for f in ANALYSIS_FIELDS ])
@@ -1,3 +1,7 @@
+import ast
+import copy
+import functools
+
 import exchange_utils
 
 def is_multi_route(splits):
@@ -10,15 +14,26 @@ def is_multi_split(splits):
     """ returns True if there are multiple splits keyed by pair e.g. {'BAT/ETH': {'Kyber':90, 'Uniswap':10}, 'OMG/BAT': {...}}"""
     return bool(splits) and type(list(splits.values())[0]) == dict
 
+@functools.lru_cache(maxsize=65536)
+def parse_literal(s):
+    """Safely parses a Python literal (e.g. a dict repr from a CSV column). Results are memoized, so treat them as read-only"""
+    return ast.literal_eval(s or '{}')
+
 def canonicalize_and_sort_splits(raw_splits):
     """Canonicalizes any DEX named in the given raw_splits, which may be a string or a dict"""
+    if isinstance(raw_splits, str): return copy.deepcopy(canonical_splits_from_str(raw_splits))
 
-    split_obj = eval(raw_splits or '{}') if isinstance(raw_splits, str) else raw_splits
-
-    if is_multi_route(split_obj):
-        return [ cs_route(route) for route in split_obj ]
+    raw_splits = raw_splits or {}
+    if is_multi_route(raw_splits):
+        return [ cs_route(route) for route in raw_splits ]
     else:
-        return cs_route(split_obj)
+        return cs_route(raw_splits)
+
+@functools.lru_cache(maxsize=65536)
+def canonical_splits_from_str(split_str):
+    """Same as canonicalize_and_sort_splits, but memoized for split strings (which repeat heavily in CSV files). Equal
+    strings return the same object, so callers must not modify the result"""
+    return canonicalize_and_sort_splits(parse_literal(split_str))
 
 
 def cs_route(split_obj):
@@ -32,3 +47,27 @@ def canonized_sorted_rounded_splits(flat_splits):
     return {k: round(v) for k, v in sorted(a_splits.items()) if round(v) > 0}
 
 
+
+def split_entries(splits):
+    """Flattens a flat, multi-split or multi-route splits object into a list of {'route', 'pair', 'dex', 'pct', 'is_int'}
+    dicts, e.g. for columnar storage. route is None unless splits is a list of routes and pair is None for flat splits.
+    pct is always a float and is_int records whether it was an int. An empty route or pair is kept as an entry whose dex
+    is None, while an empty list of routes has no entries, so that splits_from_entries can rebuild splits exactly"""
+    if isinstance(splits, str): splits = canonicalize_and_sort_splits(splits)
+    entries = []
+    for route, route_splits in (enumerate(splits) if is_multi_route(splits) else [(None, splits or {})]):
+        pair_splits = route_splits.items() if is_multi_split(route_splits) else [(None, route_splits)]
+        for pair, flat_splits in pair_splits:
+            entries += [ {'route': route, 'pair': pair, 'dex': dex, 'pct': float(pct), 'is_int': isinstance(pct, int)} for dex, pct in flat_splits.items() ]
+            if not flat_splits: entries.append({'route': route, 'pair': pair, 'dex': None, 'pct': None, 'is_int': None})
+    return entries
+
+def splits_from_entries(entries):
+    """Inverse of split_entries"""
+    routes = {}
+    for e in entries:
+        route_splits = routes.setdefault(e['route'], {})
+        flat_splits = route_splits if e['pair'] is None else route_splits.setdefault(e['pair'], {})
+        if e['dex'] is not None: flat_splits[e['dex']] = int(e['pct']) if e['is_int'] else e['pct']
+    if None in routes: return routes[None]
+    return [ routes[r] for r in sorted(routes) ]
@@ -3,20 +3,16 @@ import glob
 from collections import defaultdict
 
 import data_import
+from savings_summary import summarize, SavingsStats
 
 ########################################################################################################################
 # data derivative functions
 
 # get savings by trade_size
 def aggregated_savings(per_pair_savings, filter=None):
-    """Aggregates savings over all tokens for each trade_size returns a dict { trade_size: { agg: savings_list, ..."""
-    per_trade_size_savings = defaultdict(lambda: defaultdict(list))
-
-    for pair, trade_size, agg, pct_savings in data_import.pct_savings_gen(per_pair_savings):
-        if not filter or filter(pair):
-            per_trade_size_savings[trade_size][agg] += pct_savings
-
-    return per_trade_size_savings
+    """Aggregates savings over all tokens for each trade_size returns a dict { trade_size: { agg: SavingsStats, ..."""
+    where = (lambda pair, trade_size, agg: filter(pair)) if filter else None
+    return summarize(per_pair_savings).nested('trade_size', 'agg', where=where)
 
 # get a list of unique exchanges
 def unique_exchanges(per_token_savings):
@@ -34,40 +30,22 @@ def print_savings_with_num_samples(savings_by_trade_size):
             print(f"   {exchange}: {compute_mean(pct_savings):.2f}% ({len(pct_savings)} samples)")
 
 
-BEST_WORSE_THRESHOLD = 0.0001
 def print_neg_savings_stats(per_token_savings):
-    neg_savings, pos_savings, same_savings = defaultdict(int), defaultdict(int), defaultdict(int)
-    neg_savings_ts, pos_savings_ts, same_savings_ts = defaultdict(int), defaultdict(int), defaultdict(int)
-    for token, trade_size, exchange, pct_savings in data_import.pct_savings_gen(per_token_savings):
-        for pct in pct_savings:
-            if pct > BEST_WORSE_THRESHOLD:
-                pos_savings[exchange] += 1
-                pos_savings_ts[trade_size] += 1
-            elif pct < -BEST_WORSE_THRESHOLD:
-                neg_savings[exchange] += 1
-                neg_savings_ts[trade_size] += 1
-            else:
-                same_savings[exchange] += 1
-                same_savings_ts[trade_size] += 1
+    summary = summarize(per_token_savings)
+    per_exchange_stats = summary.group_by('agg')
+    pos_savings_ts = { ts: s.better for ts, s in summary.group_by('trade_size').items() if s.better }
+    neg_savings_ts = { ts: s.worse for ts, s in summary.group_by('trade_size').items() if s.worse }
 
-    exchanges = sorted(list(set(neg_savings.keys()) | set(pos_savings.keys())))
-    neg_samples = sum(neg_savings.values())
-    pos_samples = sum(pos_savings.values())
-    same_samples = sum(same_savings.values())
-    total_samples = neg_samples + pos_samples + same_samples
-    neg_pct = 100.0 * neg_samples / total_samples
-    pos_pct = 100.0 * pos_samples / total_samples
-    same_pct = 100.0 * same_samples / total_samples
+    exchanges = sorted(ex for ex, s in per_exchange_stats.items() if s.better or s.worse)
+    all_stats = summary.total()
+    pos_pct, neg_pct, same_pct = all_stats.better_worse_same_pcts()
 
-    print(f"\n\nOut of {total_samples} data points, Totle had a better price {pos_pct:.1f}%, worse price {neg_pct:.1f}%, and same price {same_pct:.1f}% of the time.")
+    print(f"\n\nOut of {all_stats.n} data points, Totle had a better price {pos_pct:.1f}%, worse price {neg_pct:.1f}%, and same price {same_pct:.1f}% of the time.")
 
     header = 'Totle price was         better           worse           same'
     print(f"\n{header}")
     for exchange in exchanges:
-        exchange_samples = neg_savings[exchange] + pos_savings[exchange] + same_savings[exchange]
-        pct_pos_savings = 100 * pos_savings[exchange] / exchange_samples
-        pct_neg_savings = 100 * neg_savings[exchange] / exchange_samples
-        pct_same_savings = 100 * same_savings[exchange] / exchange_samples
+        pct_pos_savings, pct_neg_savings, pct_same_savings = per_exchange_stats[exchange].better_worse_same_pcts()
         print(f"{exchange:<14} {pct_pos_savings:14.2f}% {pct_neg_savings:14.2f}% {pct_same_savings:14.2f}%" )
 
     # header = ''.join([ f"{s:<14}" for s in ['% vs'] + exchanges ])
@@ -88,7 +66,7 @@ def print_neg_savings_stats(per_token_savings):
     row = ["total NPS%"]
     for trade_size in trade_sizes:
         if trade_size in neg_savings_ts:
-            pct_neg_savings = 100 * neg_savings_ts[trade_size] / (neg_savings_ts[trade_size] + pos_savings_ts[trade_size])
+            pct_neg_savings = 100 * neg_savings_ts[trade_size] / (neg_savings_ts[trade_size] + pos_savings_ts.get(trade_size, 0))
             row.append(f"{pct_neg_savings:.2f}%")
         else:
             row.append("")
@@ -228,6 +206,7 @@ def print_slippage_split_pct_csvs(slip_price_splits):
             print(f"{trade_size},{avg_slip:.8f},{avg_price_diff},{split_pct}")
 
 def compute_mean(savings_list):
+    if isinstance(savings_list, SavingsStats): return savings_list.mean
     if not savings_list: return None
     sum_savings, n_samples = sum(savings_list), len(savings_list)
     mean_pct_savings = sum_savings / n_samples
@@ -104,11 +104,11 @@ def print_tokens_split_by_agg_csv(tokens_by_agg, tokens_supported_by_totle=None)
         intersection_tokens = [ t for t in intersection_tokens if t in tokens_supported_by_totle ]
         print(f"Intersection with Totle,{len(intersection_tokens)},\"{','.join(intersection_tokens)}\"")
 
-def print_tokens_not_split_csv():
+def print_tokens_not_split_csv(aggs_tokens, token_dexs, totle_tokens):
     tokens_split = sorted(set(sum(aggs_tokens.values(), [])))
     print(f"Total number of tokens_split = {len(tokens_split)}")
-    totle_tokens_split = [t for t in tokens_split if t in TOTLE_56]
-    not_split = [t for t in TOTLE_56 if t not in totle_tokens_split]
+    totle_tokens_split = [t for t in tokens_split if t in totle_tokens]
+    not_split = [t for t in totle_tokens if t not in totle_tokens_split]
     print(f"Token,Num DEXs,DEXs")
     for token in not_split:
         if len(token_dexs[token]) > 1:
@@ -203,106 +203,114 @@ def token_aggs_quoting(tok_ts_agg_prices):
 
 DATA_DIR = 'order_splitting_data'
 
-# This allows parsing a single set of files at a particular timestamp
-# filename = sys.argv[1] if len(sys.argv) > 1 else 'order_splitting_data/2019-10-27_17:06:03_tok_ts'
-# p = filename.partition('tok_ts') # strip off anything after tok_ts
-# filename = p[0]+p[1]
-
-# Aggregate all the 2019* JSON files (which are defaults)
-tok_ts_splits_by_agg = data_import.get_all_splits_by_agg()
-tok_ts_dexs_with_pair = data_import.get_all_dexs_with_pair()
-tok_ts_agg_prices = data_import.get_all_agg_prices()
-tok_ts_dex_prices = data_import.get_all_dex_prices()
-
-# Aggregate all the totle* JSON files
-totle_tok_ts_splits_by_agg = data_import.get_all_splits_by_agg(tuple(glob.glob(f'{DATA_DIR}/totle*ts_splits_by_agg.json')))
-totle_tok_ts_dexs_with_pair = data_import.get_all_dexs_with_pair(tuple(glob.glob(f'{DATA_DIR}/totle*ts_dexs_with_pair.json')))
-totle_tok_ts_dex_prices = data_import.get_all_dex_prices(tuple(glob.glob(f'{DATA_DIR}/totle*ts_dex_prices.json')))
-
-all_dexs, all_tokens = all_dexs_and_tokens(tok_ts_dexs_with_pair, totle_tok_ts_dexs_with_pair)
-# print(f"{len(all_tokens)} tokens: ", ', '.join(all_tokens))
-# print(f"{len(all_dexs)} DEXs: ", ', '.join(all_dexs))
-all_trade_sizes = data_import.sorted_unique_trade_sizes(tok_ts_splits_by_agg)
-# print(f"{len(all_trade_sizes)} trade_sizes: ", ', '.join(all_trade_sizes))
-
-token_dexs = get_tokens_dexs(tok_ts_dex_prices, totle_tok_ts_dex_prices, tok_ts_dexs_with_pair)
-# Print dex/token matrix in CSV form
-# print_tokens_dex_csv(token_dexs, all_dexs)
-
-# print a list of tokens supported by each exchange
-print(f"\n\nList of tokens supported by each exchange")
-for dex in all_dexs:
-    supported_tokens = [t for t in token_dexs if dex in token_dexs[t]]
-    print(f"{dex},{len(supported_tokens)},\"{','.join(supported_tokens)}\"" )
-
-tokens_samples = tokens_samples_by_agg(tok_ts_splits_by_agg, only_trade_size='2.0')
-for t, agg_samples in tokens_samples.items(): print(f"{t} {dict(agg_samples)}")
-
-# print(f"\n\nTokens by number of DEXs listing the ETH pair: ({len(all_tokens)} tokens)")
-# print_tokens_num_dexs_csv(token_dexs, supported_tokens=all_tokens, supported_dexs=all_dexs)
-
 # Tokens for which Totle quoted a price
 TOTLE_56 = ['ANT','AST','BAT','BMC','BNT','CDAI','CDT','CETH','CND','CUSDC','CVC','CWBTC','CZRX','DAI','DENT','ENG','ENJ','ETHOS','FUN','GNO','KNC','LEND','LINK','MANA','MCO','MKR','MTL','NEXO','NPXS','OMG','PAX','PAY','PLR','POE','POLY','POWR','RCN','RDN','REN','REP','REQ','RLC','RPL','SNT','SNX','SPANK','STORJ','TAU','TKN','TUSD','USDC','USDT','VERI','WBTC','XDCE','ZRX']
-# To compute TOTLE_56
-# totle_56_tokens = set()
-# for token, ts_dexs in totle_tok_ts_dexs_with_pair.items():
-#     if any(ts_dexs.values()): totle_56_tokens.add(token)
-# print(f"len(totle_56_tokens)={len(totle_56_tokens)}")
-# print(f"TOTLE_56 = [{','.join(map(repr, totle_56_tokens)) }]")
-
-# print(f"Totle tokens not priced (in TOTLE_56): {set(tok_ts_dexs_with_pair.keys()) - set(TOTLE_56)}")
-
-# print(f"\n\nConstants useful for selecting per-DEX token pairs")
-# print_token_constants(tok_ts_splits_by_agg, TOTLE_56)
 
 ACTIVE_TOTLE_DEXS = ['Ether Delta', 'Kyber', 'Bancor', 'Oasis', 'Uniswap', 'Compound', '0xMesh']
 
-# print(f"\n\nTokens supported by Totle by number of DEXs active on Totle: ({len(TOTLE_56)} tokens)")
-# print_tokens_num_dexs_csv(token_dexs, supported_tokens=TOTLE_56, supported_dexs=ACTIVE_TOTLE_DEXS)
-#
-# print(f"\n\nTokens supported by Totle by number of DEXs: ({len(TOTLE_56)} tokens)")
-# print_tokens_num_dexs_csv(token_dexs, supported_tokens=TOTLE_56)
-
-# print("\n\nCount of DEXs used to split each token")
-# print(json.dumps(token_splits_dex_counts(tok_ts_splits_by_agg), indent=3))
-
-print("\n\nList of tokens split by agg")
-aggs_tokens = tokens_split_by_agg(tok_ts_splits_by_agg)
-print_tokens_split_by_agg_csv(aggs_tokens, tokens_supported_by_totle=TOTLE_56)
-
-print(f"\n\nTotle tokens that were never split by any aggregator but listed on multiple DEXs:")
-print_tokens_not_split_csv()
-
 # Tokens priced by Totle and split by at least 1 agg
 TOTLE_39 = ['ANT','AST','BAT','BNT','CDT','CND','CVC','DAI','ENG','ENJ','ETHOS','GNO','KNC','LINK','MANA','MCO','MKR','OMG','PAX','PAY','POE','POLY','POWR','RCN','RDN','REN','REP','REQ','RLC','RPL','SNT','SNX','STORJ','TKN','TUSD','USDC','USDT','WBTC','ZRX']
-# To compute TOTLE_39
-# print(f"len(totle_tokens_split)={len(totle_tokens_split)}")
-# print(f"TOTLE_39 = [{','.join(map(repr, totle_tokens_split)) }]")
-
-print("\n\nSplit percentage by token")
-# print_split_pcts_by_token_csv(tok_ts_splits_by_agg, all_trade_sizes)
-for token in ['ENJ', 'MKR']:
-    print(f"\n{token} (all)")
-    print_split_pcts_by_token_csv(tok_ts_splits_by_agg, all_trade_sizes, only_token=token)
-    for agg in [ONE_INCH, DEX_AG, PARASWAP]:
-        print(f"{token} ({agg} only)")
-        print_split_pcts_by_token_csv(tok_ts_splits_by_agg, all_trade_sizes, only_token=token, only_agg=agg)
-exit(0)
-
-# print("\n\nTokens and aggregators providing quotes")
-# aggs_quoted = token_aggs_quoting(tok_ts_agg_prices)
-# for token, aggs in aggs_quoted.items():
-#     # print(f"{token}: {', '.join(aggs)}")
-#     for agg in AGG_NAMES:
-#         if not agg in aggs: print(f"{agg} had no prices for {token} at any trade size")
-#
-# print("\n\nAggregators list of tokens quoted")
-# for agg in AGG_NAMES:
-#     print(f"{agg}: {','.join([token for token,aggs in aggs_quoted.items() if agg in aggs])}")
-#
-#
-# print("\n\nAggregators list of tokens split")
-# for agg in AGG_NAMES:
-#     print(f"{agg}: {','.join([token for token,aggs in aggs_quoted.items() if agg in aggs])}")
-#
-#
+
+
+def main():
+    # This allows parsing a single set of files at a particular timestamp
+    # filename = sys.argv[1] if len(sys.argv) > 1 else 'order_splitting_data/2019-10-27_17:06:03_tok_ts'
+    # p = filename.partition('tok_ts') # strip off anything after tok_ts
+    # filename = p[0]+p[1]
+
+    # Aggregate all the 2019* JSON files (which are defaults)
+    tok_ts_splits_by_agg = data_import.get_all_splits_by_agg()
+    tok_ts_dexs_with_pair = data_import.get_all_dexs_with_pair()
+    tok_ts_agg_prices = data_import.get_all_agg_prices()
+    tok_ts_dex_prices = data_import.get_all_dex_prices()
+
+    # Aggregate all the totle* JSON files
+    totle_tok_ts_splits_by_agg = data_import.get_all_splits_by_agg(tuple(glob.glob(f'{DATA_DIR}/totle*ts_splits_by_agg.json')))
+    totle_tok_ts_dexs_with_pair = data_import.get_all_dexs_with_pair(tuple(glob.glob(f'{DATA_DIR}/totle*ts_dexs_with_pair.json')))
+    totle_tok_ts_dex_prices = data_import.get_all_dex_prices(tuple(glob.glob(f'{DATA_DIR}/totle*ts_dex_prices.json')))
+
+    all_dexs, all_tokens = all_dexs_and_tokens(tok_ts_dexs_with_pair, totle_tok_ts_dexs_with_pair)
+    # print(f"{len(all_tokens)} tokens: ", ', '.join(all_tokens))
+    # print(f"{len(all_dexs)} DEXs: ", ', '.join(all_dexs))
+    all_trade_sizes = data_import.sorted_unique_trade_sizes(tok_ts_splits_by_agg)
+    # print(f"{len(all_trade_sizes)} trade_sizes: ", ', '.join(all_trade_sizes))
+
+    token_dexs = get_tokens_dexs(tok_ts_dex_prices, totle_tok_ts_dex_prices, tok_ts_dexs_with_pair)
+    # Print dex/token matrix in CSV form
+    # print_tokens_dex_csv(token_dexs, all_dexs)
+
+    # print a list of tokens supported by each exchange
+    print(f"\n\nList of tokens supported by each exchange")
+    for dex in all_dexs:
+        supported_tokens = [t for t in token_dexs if dex in token_dexs[t]]
+        print(f"{dex},{len(supported_tokens)},\"{','.join(supported_tokens)}\"" )
+
+    tokens_samples = tokens_samples_by_agg(tok_ts_splits_by_agg, only_trade_size='2.0')
+    for t, agg_samples in tokens_samples.items(): print(f"{t} {dict(agg_samples)}")
+
+    # print(f"\n\nTokens by number of DEXs listing the ETH pair: ({len(all_tokens)} tokens)")
+    # print_tokens_num_dexs_csv(token_dexs, supported_tokens=all_tokens, supported_dexs=all_dexs)
+
+    # To compute TOTLE_56
+    # totle_56_tokens = set()
+    # for token, ts_dexs in totle_tok_ts_dexs_with_pair.items():
+    #     if any(ts_dexs.values()): totle_56_tokens.add(token)
+    # print(f"len(totle_56_tokens)={len(totle_56_tokens)}")
+    # print(f"TOTLE_56 = [{','.join(map(repr, totle_56_tokens)) }]")
+
+    # print(f"Totle tokens not priced (in TOTLE_56): {set(tok_ts_dexs_with_pair.keys()) - set(TOTLE_56)}")
+
+    # print(f"\n\nConstants useful for selecting per-DEX token pairs")
+    # print_token_constants(tok_ts_splits_by_agg, TOTLE_56)
+
+
+    # print(f"\n\nTokens supported by Totle by number of DEXs active on Totle: ({len(TOTLE_56)} tokens)")
+    # print_tokens_num_dexs_csv(token_dexs, supported_tokens=TOTLE_56, supported_dexs=ACTIVE_TOTLE_DEXS)
+    #
+    # print(f"\n\nTokens supported by Totle by number of DEXs: ({len(TOTLE_56)} tokens)")
+    # print_tokens_num_dexs_csv(token_dexs, supported_tokens=TOTLE_56)
+
+    # print("\n\nCount of DEXs used to split each token")
+    # print(json.dumps(token_splits_dex_counts(tok_ts_splits_by_agg), indent=3))
+
+    print("\n\nList of tokens split by agg")
+    aggs_tokens = tokens_split_by_agg(tok_ts_splits_by_agg)
+    print_tokens_split_by_agg_csv(aggs_tokens, tokens_supported_by_totle=TOTLE_56)
+
+    print(f"\n\nTotle tokens that were never split by any aggregator but listed on multiple DEXs:")
+    print_tokens_not_split_csv(aggs_tokens, token_dexs, TOTLE_56)
+
+    # To compute TOTLE_39
+    # print(f"len(totle_tokens_split)={len(totle_tokens_split)}")
+    # print(f"TOTLE_39 = [{','.join(map(repr, totle_tokens_split)) }]")
+
+    print("\n\nSplit percentage by token")
+    # print_split_pcts_by_token_csv(tok_ts_splits_by_agg, all_trade_sizes)
+    for token in ['ENJ', 'MKR']:
+        print(f"\n{token} (all)")
+        print_split_pcts_by_token_csv(tok_ts_splits_by_agg, all_trade_sizes, only_token=token)
+        for agg in [ONE_INCH, DEX_AG, PARASWAP]:
+            print(f"{token} ({agg} only)")
+            print_split_pcts_by_token_csv(tok_ts_splits_by_agg, all_trade_sizes, only_token=token, only_agg=agg)
+    return
+
+    # print("\n\nTokens and aggregators providing quotes")
+    # aggs_quoted = token_aggs_quoting(tok_ts_agg_prices)
+    # for token, aggs in aggs_quoted.items():
+    #     # print(f"{token}: {', '.join(aggs)}")
+    #     for agg in AGG_NAMES:
+    #         if not agg in aggs: print(f"{agg} had no prices for {token} at any trade size")
+    #
+    # print("\n\nAggregators list of tokens quoted")
+    # for agg in AGG_NAMES:
+    #     print(f"{agg}: {','.join([token for token,aggs in aggs_quoted.items() if agg in aggs])}")
+    #
+    #
+    # print("\n\nAggregators list of tokens split")
+    # for agg in AGG_NAMES:
+    #     print(f"{agg}: {','.join([token for token,aggs in aggs_quoted.items() if agg in aggs])}")
+    #
+    #
+
+if __name__ == "__main__":
+    main()
@@ -2,8 +2,6 @@ from datetime import datetime
 import glob
 from collections import defaultdict
 
-import csv
-
 import data_import
 import snapshot_utils
 
@@ -11,6 +9,7 @@ from summarize_csvs import aggregated_savings, print_savings_summary_table_csv,
     print_savings_summary_table, compute_mean, sorted_trade_sizes, do_splits_vs_non_splits
 
 from split_utils import is_multi_split, canonicalize_and_sort_splits
+from savings_summary import summarize, SavingsStats
 
 CSV_FIELDS = "time action trade_size token quote exchange exchange_price totle_used totle_price pct_savings splits ex_prices".split()
 
@@ -30,92 +29,39 @@ def check_overlap(per_pair_savings):
     full_overlap_pair_savings = { pair: sav for pair, sav in per_pair_savings.items() if pair not in remove_pairs }
     print(f"{len(full_overlap_pair_savings)} pairs fully overlap")
 
-def do_neg_savings(per_token_savings, trade_sizes):
-    neg_savings, pos_savings = defaultdict(lambda: defaultdict(int)), defaultdict(lambda: defaultdict(int))
-    neg_savings_without_fee = defaultdict(lambda: defaultdict(int))
-    for token, trade_size, agg, pct_savings in data_import.pct_savings_gen(per_token_savings):
-        for pct in pct_savings:
-            if pct > 0.0:
-                pos_savings[agg][trade_size] += 1
-            else:
-                neg_savings[agg][trade_size] += 1
-                if pct < -0.25:
-                    neg_savings_without_fee[agg][trade_size] += 1
+def do_neg_savings(summary, trade_sizes):
+    agg_ts_stats, per_agg_stats = summary.nested('agg', 'trade_size'), summary.group_by('agg')
+    pos_savings = { agg: { ts: s.pos for ts, s in ts_stats.items() } for agg, ts_stats in agg_ts_stats.items() }
+    neg_savings = { agg: { ts: s.neg for ts, s in ts_stats.items() if s.neg } for agg, ts_stats in agg_ts_stats.items() }
+    neg_savings_without_fee = { agg: { ts: s.neg_without_fee for ts, s in ts_stats.items() if s.neg_without_fee } for agg, ts_stats in agg_ts_stats.items() }
 
-    neg_samples, pos_samples, neg_without_fee_samples = 0, 0, 0
-    aggs = sorted(list(set(neg_savings.keys()) | set(pos_savings.keys())))
+    aggs = sorted(agg_ts_stats)
     for agg in aggs:
-        neg_samples_agg = sum(neg_savings[agg].values())
-        neg_samples += neg_samples_agg
-        neg_without_fee_samples_agg = sum(neg_savings_without_fee[agg].values())
-        neg_without_fee_samples += neg_without_fee_samples_agg
-        pos_samples_agg = sum(pos_savings[agg].values())
-        pos_samples += pos_samples_agg
-
-        total_samples_agg = neg_samples_agg + pos_samples_agg
-        neg_pct_agg = 100.0 * neg_samples_agg / total_samples_agg
-        neg_pct_without_fee_agg = 100.0 * neg_without_fee_samples_agg / total_samples_agg
-        print(f"\nOut of {total_samples_agg} comparisons, Totle's price (without fees) was worse than {agg}'s {neg_without_fee_samples_agg} times, resulting in worse price {neg_pct_without_fee_agg:.1f}% of the time.")
-        # print(f"Out of {total_samples_agg} comparisons, Totle's fees exceeded the price savings {neg_samples_agg} times, resulting in negative price savings {neg_pct_agg:.1f}% of the time.")
+        agg_stats = per_agg_stats[agg]
+        neg_pct_without_fee_agg = 100.0 * agg_stats.neg_without_fee / agg_stats.n
+        print(f"\nOut of {agg_stats.n} comparisons, Totle's price (without fees) was worse than {agg}'s {agg_stats.neg_without_fee} times, resulting in worse price {neg_pct_without_fee_agg:.1f}% of the time.")
+        # print(f"Out of {agg_stats.n} comparisons, Totle's fees exceeded the price savings {agg_stats.neg} times, resulting in negative price savings {100.0 * agg_stats.neg / agg_stats.n:.1f}% of the time.")
 
+    all_stats = summary.total()
+    neg_pct = 100.0 * all_stats.neg / all_stats.n
+    neg_pct_without_fee = 100.0 * all_stats.neg_without_fee / all_stats.n
 
-    total_samples = neg_samples + pos_samples
-    neg_pct = 100.0 * neg_samples / total_samples
-    neg_pct_without_fee = 100.0 * neg_without_fee_samples / total_samples
-
-    print(f"\n\nOut of {total_samples} comparisons, Totle's price (without fees) was worse than competitor's {neg_without_fee_samples} times, resulting in worse price {neg_pct_without_fee:.1f}% of the time.")
-    print(f"Out of {total_samples} comparisons, Totle's fees exceeded the price savings {neg_samples} times, resulting in negative price savings {neg_pct:.1f}% of the time.")
+    print(f"\n\nOut of {all_stats.n} comparisons, Totle's price (without fees) was worse than competitor's {all_stats.neg_without_fee} times, resulting in worse price {neg_pct_without_fee:.1f}% of the time.")
+    print(f"Out of {all_stats.n} comparisons, Totle's fees exceeded the price savings {all_stats.neg} times, resulting in negative price savings {neg_pct:.1f}% of the time.")
 
     print_neg_savings_csv(pos_savings, neg_savings, aggs, trade_sizes, label="Negative Price Savings Pct. vs Competitors")
     print_neg_savings_csv(pos_savings, neg_savings_without_fee, aggs, trade_sizes, label="Worse price (without fees) vs Competitors")
 
-BEST_WORSE_THRESHOLD = 0.0001
-
-def better_worse_same_counts(pct_savings_list):
-    better_count, worse_count, same_count = 0, 0, 0
-    for pct in pct_savings_list:
-        if pct > BEST_WORSE_THRESHOLD:
-            better_count += 1
-        elif pct < -BEST_WORSE_THRESHOLD:
-            worse_count += 1
-        else:
-            same_count += 1
-
-    return better_count, worse_count, same_count
-
-def better_worse_same_pcts(pct_savings_list):
-    better_count, worse_count, same_count = better_worse_same_counts(pct_savings_list)
-    total_count = better_count + worse_count + same_count
-    return round(100 * better_count / total_count), round(100 * worse_count / total_count), round(100 * same_count / total_count)
-
-def do_better_worse_same_price(per_pair_savings, label, agg_breakdown=False):
+def do_better_worse_same_price(summary, label, agg_breakdown=False):
     print(f"\n{label}")
-    better_price, worse_price, same_price = defaultdict(lambda: defaultdict(int)), defaultdict(lambda: defaultdict(int)), defaultdict(lambda: defaultdict(int))
-
-    for token, trade_size, agg, pct_savings in data_import.pct_savings_gen(per_pair_savings):
-        better_count, worse_count, same_count = better_worse_same_counts(pct_savings)
-        better_price[agg][trade_size] += better_count
-        worse_price[agg][trade_size] += worse_count
-        same_price[agg][trade_size] += same_count
-
-    better_price_samples, worse_price_samples, same_price_samples = 0, 0, 0
-    better_pct, worse_pct, same_pct = {}, {}, {}
-    aggs = sorted(list(set(better_price.keys()) | set(worse_price.keys()) | set(worse_price.keys())))
-    for agg in aggs:
-        better_price_samples_agg = sum(better_price[agg].values())
-        better_price_samples += better_price_samples_agg
-        worse_price_samples_agg = sum(worse_price[agg].values())
-        worse_price_samples += worse_price_samples_agg
-        same_price_samples_agg = sum(same_price[agg].values())
-        same_price_samples += same_price_samples_agg
-
-        total_samples_agg = better_price_samples_agg + worse_price_samples_agg + same_price_samples_agg
-
-        better_pct[agg] = 100.0 * better_price_samples_agg / total_samples_agg
-        worse_pct[agg] = 100.0 * worse_price_samples_agg / total_samples_agg
-        same_pct[agg] = 100.0 * same_price_samples_agg / total_samples_agg
+    per_agg_stats = summary.group_by('agg')
+    aggs = sorted(per_agg_stats)
 
     if agg_breakdown:
+        better_pct, worse_pct, same_pct = {}, {}, {}
+        for agg in aggs:
+            better_pct[agg], worse_pct[agg], same_pct[agg] = per_agg_stats[agg].better_worse_same_pcts()
+
         header = 'Totle price was         better           worse           same'
         print(f"\n{header}")
         for agg in aggs:
@@ -128,10 +74,9 @@ def do_better_worse_same_price(per_pair_savings, label, agg_breakdown=False):
             print(f"{agg},{better_pct[agg]:.2f}%,{worse_pct[agg]:.2f}%,{same_pct[agg]:.2f}%" )
 
 
-    total_samples = better_price_samples + worse_price_samples + same_price_samples
-    better_pct = 100.0 * better_price_samples / total_samples
-    worse_pct = 100.0 * worse_price_samples / total_samples
-    same_pct = 100.0 * same_price_samples / total_samples
+    all_stats = summary.total()
+    total_samples = all_stats.n
+    better_pct, worse_pct, same_pct = all_stats.better_worse_same_pcts()
 
     print("\n")
     print(f"Out of {total_samples} comparisons, Totle's price was better than competitor's {better_pct:.1f}% of the time, worse {worse_pct:.1f}% of the time, and the same {same_pct:.1f}% of the time.")
@@ -140,36 +85,25 @@ def do_better_worse_same_price(per_pair_savings, label, agg_breakdown=False):
     return total_samples
 
 
-def do_better_worse_same_by_trade_size(per_pair_savings, label):
+def do_better_worse_same_by_trade_size(summary, label):
     print(f"\n{label}")
-    better_price, worse_price, same_price, total_samples = defaultdict(int), defaultdict(int), defaultdict(int), defaultdict(int)
-    trade_sizes = set()
-    total_samples
-
-    for pair, trade_size, agg, pct_savings in data_import.pct_savings_gen(per_pair_savings):
-        trade_sizes.add(trade_size)
-        better_count, worse_count, same_count = better_worse_same_counts(pct_savings)
-        better_price[trade_size] += better_count
-        worse_price[trade_size] += worse_count
-        same_price[trade_size] += same_count
-        total_samples[trade_size] += better_count + worse_count + same_count
+    per_trade_size_stats = summary.group_by('trade_size')
+    trade_sizes = sorted(per_trade_size_stats)
 
     better_pct, worse_pct, same_pct = {}, {}, {}
     for trade_size in trade_sizes:
-        better_pct[trade_size] = 100.0 * better_price[trade_size] / total_samples[trade_size]
-        worse_pct[trade_size] = 100.0 * worse_price[trade_size] / total_samples[trade_size]
-        same_pct[trade_size] = 100.0 * same_price[trade_size] / total_samples[trade_size]
+        better_pct[trade_size], worse_pct[trade_size], same_pct[trade_size] = per_trade_size_stats[trade_size].better_worse_same_pcts()
 
 
     header = 'Totle price was         better           worse           same'
     print(f"\n{header}")
-    for trade_size in sorted(trade_sizes):
+    for trade_size in trade_sizes:
         print(f"{trade_size:<14} {better_pct[trade_size]:14.2f}% {worse_pct[trade_size]:14.2f}% {same_pct[trade_size]:14.2f}%" )
 
     # do CSV
     *a, b, c, d = header.split()
     print(','.join([' '.join(a), b, c, d]))
-    for trade_size in sorted(trade_sizes):
+    for trade_size in trade_sizes:
         print(f"{trade_size},{better_pct[trade_size]:.2f}%,{worse_pct[trade_size]:.2f}%,{same_pct[trade_size]:.2f}%" )
 
 
@@ -204,71 +138,64 @@ def print_split_counts_table(split_count_by_agg, non_split_count_by_agg, agg_nam
         print(csv_row)
 
 
-def print_savings_summary_by_pair_csv(per_pair_savings, only_trade_size, agg_names, only_token=None, min_stablecoins=0, label="Average Savings by ETH pair"):
+def print_savings_summary_by_pair_csv(summary, only_trade_size, agg_names, only_token=None, min_stablecoins=0, label="Average Savings by ETH pair"):
     print(f"\n{label} trade size = {only_trade_size}")
-
-    pair_agg_savings = defaultdict(lambda: defaultdict(list))
     print(f"\nPair,{','.join(agg_names)}")
 
-    for pair, trade_size, agg, pct_savings_list in data_import.pct_savings_gen(per_pair_savings):
-        if trade_size != only_trade_size: continue
-        # if only_token and only_token not in pair: continue
-        # if only_token and pair[0] != only_token: continue
-        if only_token and pair[1] != only_token: continue
-        if min_stablecoins == 1 and not has_stablecoin(pair): continue
-        if min_stablecoins == 2 and not both_stablecoins(pair): continue
+    def where(pair, trade_size, agg):
+        if trade_size != only_trade_size: return False
+        # if only_token and only_token not in pair: return False
+        # if only_token and pair[0] != only_token: return False
+        if only_token and pair[1] != only_token: return False
+        return stablecoin_filter(pair, min_stablecoins)
 
-        pair_agg_savings[pair][agg] += pct_savings_list
+    pair_agg_stats = summary.nested('pair', 'agg', where=where)
 
-    for pair in sorted(pair_agg_savings):
+    for pair in sorted(pair_agg_stats):
         row = f"{pair[0]}/{pair[1]}"
-        agg_savings = pair_agg_savings[pair]
+        agg_stats = pair_agg_stats[pair]
         for agg in agg_names:
-            if agg in agg_savings:
-                row += f",{compute_mean(agg_savings[agg]) :.2f}"
+            if agg in agg_stats:
+                row += f",{agg_stats[agg].mean :.2f}"
             else:
                 row += f","
         print(row)
 
 
-def print_avg_savings_per_pair_by_agg(per_pair_savings, only_trade_size=None, print_threshold=0, samples=False, min_stablecoins=0):
+def print_avg_savings_per_pair_by_agg(summary, only_trade_size=None, print_threshold=0, samples=None, min_stablecoins=0):
+    """samples can be the per_pair_savings that summary was made from, to print their raw samples too"""
     for_trade_size = f"for Trade Size = {only_trade_size}" if only_trade_size else ''
 
-    pair_agg_savings = defaultdict(lambda: defaultdict(list))
-
-    for pair, trade_size, agg, pct_savings in data_import.pct_savings_gen(per_pair_savings):
-        if only_trade_size and trade_size != only_trade_size: continue
-        if min_stablecoins == 1 and not has_stablecoin(pair): continue
-        if min_stablecoins == 2 and not both_stablecoins(pair): continue
+    where = lambda pair, trade_size, agg: (not only_trade_size or trade_size == only_trade_size) and stablecoin_filter(pair, min_stablecoins)
+    pair_stats, pair_agg_stats = summary.group_by('pair', where=where), summary.nested('pair', 'agg', where=where)
 
-        pair_agg_savings[pair][agg] += pct_savings
+    if samples: # the raw samples are only gathered when they are to be printed
+        pair_agg_savings = defaultdict(lambda: defaultdict(list))
+        for pair, trade_size, agg, pct_savings in data_import.pct_savings_gen(samples):
+            if where(pair, trade_size, agg): pair_agg_savings[pair][agg] += pct_savings
 
     print(f"\n\nAverage Savings {for_trade_size} (min_stablecoins={min_stablecoins})")
 
     print(f"\nToken\tMean Pct. Savings")
-    for pair, agg_savings in sorted(pair_agg_savings.items()):
-        print(f"{pair[1]}\t{compute_mean(sum(agg_savings.values(), [])):.2f}")
+    for pair, agg_stats in sorted(pair_agg_stats.items()):
+        print(f"{pair[1]}\t{pair_stats[pair].mean:.2f}")
 
-        for agg, savings in agg_savings.items():
-            better_pct, worse_pct, same_pct = better_worse_same_pcts(savings)
-            avg_savings = compute_mean(savings)
+        for agg, stats in agg_stats.items():
+            better_pct, worse_pct, same_pct = map(round, stats.better_worse_same_pcts())
+            avg_savings = stats.mean
             if abs(avg_savings)  > print_threshold:
                 print(f"    {agg:<8}\t{better_pct:>3}/{worse_pct:>3}/{same_pct:>3}\t{avg_savings:.2f}")
-                if samples: print(f"    {agg}:\t{savings}")
+                if samples: print(f"    {agg}:\t{pair_agg_savings[pair][agg]}")
 
 
 
-def print_top_ten_pairs_savings(per_pair_savings, only_trade_size=None):
+def print_top_ten_pairs_savings(summary, only_trade_size=None):
     for_trade_size = f"for Trade Size = {only_trade_size}" if only_trade_size else ''
 
-    pair_savings = defaultdict(list)
-    for pair, trade_size, exchange, pct_savings in data_import.pct_savings_gen(per_pair_savings):
-        if only_trade_size and trade_size != only_trade_size: continue
-        pair_savings[pair] += pct_savings
-
+    where = lambda pair, trade_size, agg: not only_trade_size or trade_size == only_trade_size
     avg_savings_pairs = {}
-    for pair, savings_list in pair_savings.items():
-        avg_savings_pairs[compute_mean(savings_list)] = pair
+    for pair, stats in summary.group_by('pair', where=where).items():
+        avg_savings_pairs[stats.mean] = pair
     sorted_avg_savings_pairs = sorted(avg_savings_pairs.items())
 
     print(f"\nTop 10 Negative Price Savings {for_trade_size}")
@@ -277,18 +204,18 @@ def print_top_ten_pairs_savings(per_pair_savings, only_trade_size=None):
     for pct_savings, pair in reversed(sorted_avg_savings_pairs[-10:-1]): print(f"{pair[0]}/{pair[1]}\t{pct_savings:.2f}%")
 
 
-def print_top_ten_savings_by_token(per_pair_savings, only_trade_size=None):
+def print_top_ten_savings_by_token(summary, only_trade_size=None):
     for_trade_size = f"for Trade Size = {only_trade_size}" if only_trade_size else ''
 
-    token_savings = defaultdict(list)
-    for pair, trade_size, exchange, pct_savings in data_import.pct_savings_gen(per_pair_savings):
-        if only_trade_size and trade_size != only_trade_size: continue
-        token_savings[pair[0]] += pct_savings
-        token_savings[pair[1]] += pct_savings
+    where = lambda pair, trade_size, agg: not only_trade_size or trade_size == only_trade_size
+    token_stats = defaultdict(SavingsStats)
+    for pair, stats in summary.group_by('pair', where=where).items():
+        token_stats[pair[0]].merge(stats)
+        token_stats[pair[1]].merge(stats)
 
     avg_savings_tokens = {}
-    for token, savings_list in token_savings.items():
-        avg_savings_tokens[compute_mean(savings_list)] = token
+    for token, stats in token_stats.items():
+        avg_savings_tokens[stats.mean] = token
     sorted_avg_savings_tokens = sorted(avg_savings_tokens.items())
 
     print(f"\nTop 10 Negative Price Savings {for_trade_size}")
@@ -296,17 +223,15 @@ def print_top_ten_savings_by_token(per_pair_savings, only_trade_size=None):
     print(f"\nTop 10 Positive Price Savings {for_trade_size}")
     for pct_savings, token in reversed(sorted_avg_savings_tokens[-10:-1]): print(f"{token}\t{pct_savings:.2f}%")
 
-def print_avg_savings_per_pair_by_trade_size(per_pair_savings, only_trade_sizes):
-    pairs_trade_size_savings = defaultdict(lambda: defaultdict(list))
-    for pair, trade_size, agg, pct_savings in data_import.pct_savings_gen(per_pair_savings):
-        pairs_trade_size_savings[pair][trade_size] += pct_savings
+def print_avg_savings_per_pair_by_trade_size(summary, only_trade_sizes):
+    pairs_trade_size_stats = summary.nested('pair', 'trade_size')
 
     trade_size_strs = map(lambda ts: f"{ts:8.1f}", only_trade_sizes)
     print(f"Pair            {''.join(trade_size_strs)}")
-    for pair, trade_size_savings in pairs_trade_size_savings.items():
+    for pair, trade_size_stats in pairs_trade_size_stats.items():
         row = f"{str(pair):<16}"
         for ts in only_trade_sizes:
-            row += f"{compute_mean(trade_size_savings[ts]):8.2f}" if ts in trade_size_savings else "      "
+            row += f"{trade_size_stats[ts].mean:8.2f}" if ts in trade_size_stats else "      "
         print(row)
 
 def print_largest_absolute_savings_samples(per_pair_savings):
@@ -345,6 +270,11 @@ def print_stablecoin_pcts(pair_savings):
     print(f"\n{ss_count}/{all_count} ({100*ss_count/all_count}%) involved a stablecoin")
 
 STABLECOINS = ['DAI', 'PAX', 'SAI', 'TUSD', 'USDC', 'USDT']
+def stablecoin_filter(pair, min_stablecoins):
+    if min_stablecoins == 1: return has_stablecoin(pair)
+    if min_stablecoins == 2: return both_stablecoins(pair)
+    return True
+
 def has_stablecoin(pair):
     return pair[0] in STABLECOINS or pair[1] in STABLECOINS
 def both_stablecoins(pair):
@@ -372,6 +302,13 @@ def print_large_neg_savings(large_neg_savings, min_samples=10):
             printed_samples += 1
     print(f"printed_samples={printed_samples}")
 
+def print_select_samples_snapshot_analysis(select_samples, max_workers=None):
+    """Prints a snapshot_utils.analyze_snapshots table for the ids of all select samples (rather than each snapshot's
+    curve info, as print_sample(..., print_snapshot=True) does one id at a time)"""
+    ids = sorted({ prices_splits[0] for prices_splits_list in select_samples.values() for prices_splits in prices_splits_list })
+    print(f"\nAnalyzing {len(ids)} snapshots of select samples")
+    snapshot_utils.print_snapshot_analysis_csv(snapshot_utils.analyze_snapshots(ids, max_workers=max_workers))
+
 def print_sample(tok_ts_agg, prices_splits, print_num_times=False, print_snapshot=False):
     pair_or_token, trade_size, agg = tok_ts_agg
 
@@ -430,6 +367,12 @@ def parse_row(row):
     return id, time, from_token, to_token, trade_size, totle_price, totle_splits, agg, agg_price, agg_splits, pct_savings
 
 
+def parsed_rows(filename):
+    """Returns an iterator of parse_row() tuples for all rows in filename, loaded as typed columns by data_import.load_savings_csv"""
+    c = data_import.load_savings_csv(filename)
+    return zip(c['id'], c['time'], c['quote'], c['token'], c['trade_size'], c['totle_price'], c['totle_splits'], c['exchange'], c['exchange_price'], c['splits'], c['pct_savings'])
+
+
 def do_summary_erc20_pairs(csv_files):
     """Returns a dict containing pct savings token: { trade_size:  {exchange: [sample, sample, ...], ...}"""
     print(f"Processing {len(csv_files)} CSV files")
@@ -449,72 +392,70 @@ def do_summary_erc20_pairs(csv_files):
     agg_names = set()
 
     for filename in csv_files:
-        with open(filename, newline='') as csvfile:
-            reader = csv.DictReader(csvfile, fieldnames=None)
-            for row in reader:
-                id, time, from_token, to_token, trade_size, totle_price, totle_splits, agg, agg_price, agg_splits, pct_savings = parse_row(row)
-                pair = (to_token, from_token)
-
-                if pair[0] != to_token: raise ValueError(f"id={id} pair[0]=={pair[0]} but to_token={to_token}")
-                from_token = pair[1]
-
-                # Remove all WETH<>ETH pairs
-                if to_token in ('WETH','ETH') and from_token in ('WETH','ETH'):
-                    continue
-
-                # Remove the 13 outliers where a bug caused > 1000% price diff
-                if totle_price / agg_price > 1000:
-                    continue
-
-                agg_names.add(agg)
-                timestamp_by_id[id] = time
-                if len(agg_splits) > 1: split_count_by_agg[agg][trade_size] += 1
-                else: non_split_count_by_agg[agg][trade_size] += 1
-                data_points += 1
-                data_points_by_agg[agg] += 1
-
-                # ******************* Select Samples (saves all samples) **************************
-                # if totle_splits == agg_splits and totle_price / agg_price > 1.05: # same split diff price indicates price data discrepancy
-                # if totle_price / agg_price > 1.05 and totle_splits != agg_splits and trade_size == 100 and to_token == 'REP' and agg not in ['1-Inch', '1-Inch V2']:
-                # if id == '0x49a6c1f9578d48f5bb855ebe0b59cb5cff0caec8f7474e2aa0720763b0f55fff':
-                if from_token == 'UNI' and to_token == 'ETH' and totle_price / agg_price > 1.1:
-                    key = (pair, trade_size, agg)
-                    select_samples[key].append((id, totle_price, totle_splits, agg_price, agg_splits))
-
-
-                # if both_stablecoins(pair):
-                    # if trade_size == 1.0 and agg == '1-Inch' and agg_price < 0.6:
-                    #     if 'PMM' not in agg_splits or agg_splits['PMM'] != 10:
-                    #         print(f"1-Inch: {agg} split {pair} at ${trade_size} between {agg_splits} for price {agg_price} and savings of {pct_savings}% totle_used={totle_used}")
-                    # stablecoin_stablecoin_prices[trade_size][agg].append(agg_price)
-                    # if len(agg_splits) < 2:
-                    #     ss_non_split_count_by_agg[agg][trade_size] += 1
-                    # else:
-                    #     ss_split_count_by_agg[agg][trade_size] += 1
-
-
-                per_pair_savings[pair][trade_size][agg].append(pct_savings)
-                if is_multi_split(totle_splits):
-                    multi_data_points += 1
-                else:
-                    single_data_points += 1
+        for id, time, from_token, to_token, trade_size, totle_price, totle_splits, agg, agg_price, agg_splits, pct_savings in parsed_rows(filename):
+            pair = (to_token, from_token)
+
+            if pair[0] != to_token: raise ValueError(f"id={id} pair[0]=={pair[0]} but to_token={to_token}")
+            from_token = pair[1]
+
+            # Remove all WETH<>ETH pairs
+            if to_token in ('WETH','ETH') and from_token in ('WETH','ETH'):
+                continue
+
+            # Remove the 13 outliers where a bug caused > 1000% price diff
+            if totle_price / agg_price > 1000:
+                continue
+
+            agg_names.add(agg)
+            timestamp_by_id[id] = time
+            if len(agg_splits) > 1: split_count_by_agg[agg][trade_size] += 1
+            else: non_split_count_by_agg[agg][trade_size] += 1
+            data_points += 1
+            data_points_by_agg[agg] += 1
+
+            # ******************* Select Samples (saves all samples) **************************
+            # if totle_splits == agg_splits and totle_price / agg_price > 1.05: # same split diff price indicates price data discrepancy
+            # if totle_price / agg_price > 1.05 and totle_splits != agg_splits and trade_size == 100 and to_token == 'REP' and agg not in ['1-Inch', '1-Inch V2']:
+            # if id == '0x49a6c1f9578d48f5bb855ebe0b59cb5cff0caec8f7474e2aa0720763b0f55fff':
+            if from_token == 'UNI' and to_token == 'ETH' and totle_price / agg_price > 1.1:
+                key = (pair, trade_size, agg)
+                select_samples[key].append((id, totle_price, totle_splits, agg_price, agg_splits))
+
+
+            # if both_stablecoins(pair):
+                # if trade_size == 1.0 and agg == '1-Inch' and agg_price < 0.6:
+                #     if 'PMM' not in agg_splits or agg_splits['PMM'] != 10:
+                #         print(f"1-Inch: {agg} split {pair} at ${trade_size} between {agg_splits} for price {agg_price} and savings of {pct_savings}% totle_used={totle_used}")
+                # stablecoin_stablecoin_prices[trade_size][agg].append(agg_price)
+                # if len(agg_splits) < 2:
+                #     ss_non_split_count_by_agg[agg][trade_size] += 1
+                # else:
+                #     ss_split_count_by_agg[agg][trade_size] += 1
+
+
+            per_pair_savings[pair][trade_size][agg].append(pct_savings)
+            if is_multi_split(totle_splits):
+                multi_data_points += 1
+            else:
+                single_data_points += 1
 
 
     agg_names = sorted(agg_names)
     trade_sizes = sorted_trade_sizes(*per_pair_savings.values())
+    summary = summarize(per_pair_savings) # shared by all of the reports below
 
     print_data_points(data_points, single_data_points, multi_data_points, timestamp_by_id)
     for agg in agg_names: print(f"{agg}: {data_points_by_agg[agg]}")
 
     if True:
-        print_savings_summary_table_csv(aggregated_savings(per_pair_savings), agg_names, label="Average Savings (all samples)")
-        print_avg_savings_by_pair(per_pair_savings, only_aggs=agg_names)
-        print_avg_savings_by_pair(per_pair_savings, only_trade_size=3000000.0, only_aggs=agg_names)
-        print_avg_savings_by_pair(per_pair_savings, only_trade_size=4000000.0, only_aggs=agg_names)
-        # print_avg_savings_by_pair(per_pair_savings, only_trade_size=1000.0, only_aggs=agg_names)
-        # print_avg_savings_by_pair(per_pair_savings, only_trade_size=10000.0, only_aggs=agg_names)
-        # print_avg_savings_by_pair(per_pair_savings, only_trade_size=100000.0, only_aggs=agg_names)
-        # print_avg_savings_by_pair(per_pair_savings, only_trade_size=1000000.0, only_aggs=agg_names)
+        print_savings_summary_table_csv(aggregated_savings(summary), agg_names, label="Average Savings (all samples)")
+        print_avg_savings_by_pair(summary, only_aggs=agg_names)
+        print_avg_savings_by_pair(summary, only_trade_size=3000000.0, only_aggs=agg_names)
+        print_avg_savings_by_pair(summary, only_trade_size=4000000.0, only_aggs=agg_names)
+        # print_avg_savings_by_pair(summary, only_trade_size=1000.0, only_aggs=agg_names)
+        # print_avg_savings_by_pair(summary, only_trade_size=10000.0, only_aggs=agg_names)
+        # print_avg_savings_by_pair(summary, only_trade_size=100000.0, only_aggs=agg_names)
+        # print_avg_savings_by_pair(summary, only_trade_size=1000000.0, only_aggs=agg_names)
 
 
     # Stablecoin savings
@@ -522,32 +463,32 @@ def do_summary_erc20_pairs(csv_files):
     # print_stablecoin_pcts(per_pair_savings)
     # print_stablecoin_pcts(per_pair_savings)
     # print_stablecoin_pcts(outlier_pair_savings)
-    # print_savings_summary_table_csv(aggregated_savings(per_pair_savings, filter=both_stablecoins), agg_names, label="Stablecoin/Stablecoin Savings (all samples)")
+    # print_savings_summary_table_csv(aggregated_savings(summary, filter=both_stablecoins), agg_names, label="Stablecoin/Stablecoin Savings (all samples)")
     # print_stablecoin_stablecoin_price_table(stablecoin_stablecoin_prices, agg_names, trade_sizes)
 
-    # print_avg_savings_per_pair_by_agg(per_pair_savings, 10.0, print_threshold=0, samples=True, min_stablecoins=2)
+    # print_avg_savings_per_pair_by_agg(summary, 10.0, print_threshold=0, samples=per_pair_savings, min_stablecoins=2)
     # for trade_size in USD_TRADE_SIZES[0:-1]:
-    #     print_avg_savings_per_pair_by_agg(per_pair_savings, trade_size, filtered=True, samples=True)
+    #     print_avg_savings_per_pair_by_agg(summary, trade_size, filtered=True, samples=per_pair_savings)
 
     if False:
-        print_top_ten_pairs_savings(per_pair_savings)
-        print_top_ten_savings_by_token(per_pair_savings)
+        print_top_ten_pairs_savings(summary)
+        print_top_ten_savings_by_token(summary)
         print("\n\n---\n\n")
 
     if False:
         for trade_size in trade_sizes:
-            # print_savings_summary_by_pair_csv(per_pair_savings, trade_size, agg_names, only_token='ENJ', label=f"Average Savings at trade size {trade_size}")
-            # print_savings_summary_by_pair_csv(per_pair_savings, trade_size, agg_names, only_token='POWR', label=f"Average Savings at trade size {trade_size}")
-            # print_savings_summary_by_pair_csv(per_pair_savings, trade_size, agg_names, only_token='ANT', label=f"Average Savings at trade size {trade_size}")
-            # print_savings_summary_by_pair_csv(per_pair_savings, trade_size, agg_names, only_token='RCN', label=f"Average Savings at trade size {trade_size}")
-            # print_savings_summary_by_pair_csv(per_pair_savings, trade_size, agg_names, only_token='TUSD', label=f"Average Savings at trade size {trade_size}")
-            print_savings_summary_by_pair_csv(per_pair_savings, trade_size, agg_names, only_token='USDT', label=f"Average Savings at trade size {trade_size}")
-            print_savings_summary_by_pair_csv(per_pair_savings, trade_size, agg_names, only_token='CVC', label=f"Average Savings at trade size {trade_size}")
+            # print_savings_summary_by_pair_csv(summary, trade_size, agg_names, only_token='ENJ', label=f"Average Savings at trade size {trade_size}")
+            # print_savings_summary_by_pair_csv(summary, trade_size, agg_names, only_token='POWR', label=f"Average Savings at trade size {trade_size}")
+            # print_savings_summary_by_pair_csv(summary, trade_size, agg_names, only_token='ANT', label=f"Average Savings at trade size {trade_size}")
+            # print_savings_summary_by_pair_csv(summary, trade_size, agg_names, only_token='RCN', label=f"Average Savings at trade size {trade_size}")
+            # print_savings_summary_by_pair_csv(summary, trade_size, agg_names, only_token='TUSD', label=f"Average Savings at trade size {trade_size}")
+            print_savings_summary_by_pair_csv(summary, trade_size, agg_names, only_token='USDT', label=f"Average Savings at trade size {trade_size}")
+            print_savings_summary_by_pair_csv(summary, trade_size, agg_names, only_token='CVC', label=f"Average Savings at trade size {trade_size}")
 
     # **************** BETTER WORSE SAME / SAVINGS SUMMARY TABLE **********************
     if True:
-        total_samples = do_better_worse_same_price(per_pair_savings, "All Samples by Competitor", agg_breakdown=True)
-        do_better_worse_same_by_trade_size(per_pair_savings, "All Samples by Trade Size", )
+        total_samples = do_better_worse_same_price(summary, "All Samples by Competitor", agg_breakdown=True)
+        do_better_worse_same_by_trade_size(summary, "All Samples by Trade Size", )
 
     # **************** SELECT SAMPLES **********************
     if True:
@@ -574,28 +515,26 @@ def do_totle_splits_vs_non_splits(csv_files, aggs):
     print_savings_summary_table_csv(per_trade_size_non_splits, aggs, label="All tokens savings by trade size (only Totle non-splits)")
     print_savings_summary_table_csv(per_trade_size_splits_only, aggs, label="All tokens savings by trade size (only Totle splits)")
 
-def do_both_splitting(per_token_both_splitting_savings, aggs):
+def do_both_splitting(both_splitting_summary, aggs):
     # print average savings summary table
-    per_trade_size_splits_only = aggregated_savings(per_token_both_splitting_savings)
+    per_trade_size_splits_only = aggregated_savings(both_splitting_summary)
 
     # print splits vs non-splits summary CSV
     print_savings_summary_table_csv(per_trade_size_splits_only, aggs, label="All tokens savings by trade size (both Totle and agg splitting)")
 
 
-def print_avg_savings_by_pair(per_pair_savings, only_trade_size=None, only_aggs=None, show_only_to=False):
-    token_savings = defaultdict(lambda: defaultdict(list))
-    for pair, trade_size, agg, pct_savings in data_import.pct_savings_gen(per_pair_savings):
-        if only_trade_size and trade_size != only_trade_size: continue
-        token_savings[pair][agg] += pct_savings
+def print_avg_savings_by_pair(summary, only_trade_size=None, only_aggs=None, show_only_to=False):
+    where = lambda pair, trade_size, agg: not only_trade_size or trade_size == only_trade_size
+    pair_agg_stats = summary.nested('pair', 'agg', where=where)
 
     print(f"\nAverage Savings by Pair for Trade Size={only_trade_size}")
     print(f"\nPair,{','.join(only_aggs)}")
 
-    for pair, savings in sorted(token_savings.items()):
+    for pair, agg_stats in sorted(pair_agg_stats.items()):
         row = f"{pair[1]}" if show_only_to else f"{pair[1]}>{pair[0]}"
         for agg in only_aggs:
-            if agg in savings:
-                row += f",{compute_mean(savings[agg]) :.2f}"
+            if agg in agg_stats:
+                row += f",{agg_stats[agg].mean :.2f}"
             else:
                 row += f","
         print(row)
@@ -637,62 +576,60 @@ def do_summary_eth_pairs(csv_files):
     totle_best_splits = defaultdict(lambda: defaultdict(lambda: defaultdict()))
 
     for filename in csv_files:
-        with open(filename, newline='') as csvfile:
-            reader = csv.DictReader(csvfile, fieldnames=None)
-            for row in reader:
-                id, time, from_token, to_token, trade_size, totle_price, totle_splits, agg, agg_price, agg_splits, pct_savings = parse_row(row)
-                pair = (to_token, from_token)
-
-                agg_names.add(agg)
-                timestamp_by_id[id] = time
-                data_points += 1
-
-                if len(agg_splits) > 1: split_count_by_agg[agg][trade_size] += 1
-                else: non_split_count_by_agg[agg][trade_size] += 1
-
-                # ******************* Select Samples (saves all samples) **************************
-                # if totle_splits == agg_splits and totle_price / agg_price > 1.05: # same split diff price indicates price data discrepancy
-                # if totle_price / agg_price > 1.05 and totle_splits != agg_splits and trade_size == 100 and to_token == 'REP' and agg not in ['1-Inch', '1-Inch V2']:
-                if totle_price / agg_price > 1.05 and trade_size == 100 and to_token == 'REP' and agg == 'Paraswap':
-                # if id == '0xda29700714084710ab72d95e0510a044881839807586493c870d4d7a7000a444':
-                    key = (to_token, trade_size, agg)
-                    select_samples[key].append((id, totle_price, totle_splits, agg_price, agg_splits))
-
-                # ******************* Large neg savings (saves only the worst sample, keeps tally in the key) ***********************
-                if trade_size == 50 and pct_savings < -2 and agg != 'DEX.AG':
-                    large_neg_savings_count += 1
-                    if is_multi_split(totle_splits): large_neg_savings_with_routing_count += 1
-                    key = (to_token, trade_size, agg)
-                    # print(f"{to_token} for {trade_size} ETH Totle price is {totle_price} {agg} price is {agg_price} -> Totle's price is {100 * ((totle_price - agg_price) / agg_price)}% GREATER\n   id={id}\n   Totle Split:\t{totle_splits}\n   {agg} Split:\t{agg_splits}")
-
-                    if key in large_neg_savings:
-                        n_samples, old_totle_price, old_totle_splits, old_agg_price, old_agg_splits = large_neg_savings[key]
-                        if totle_price / agg_price > old_totle_price / old_agg_price:
-                            large_neg_savings[key] = (n_samples + 1, totle_price, totle_splits, agg_price, agg_splits)
-                        else:
-                            large_neg_savings[key] = (n_samples + 1, old_totle_price, old_totle_splits, old_agg_price, old_agg_splits)
+        for id, time, from_token, to_token, trade_size, totle_price, totle_splits, agg, agg_price, agg_splits, pct_savings in parsed_rows(filename):
+            pair = (to_token, from_token)
+
+            agg_names.add(agg)
+            timestamp_by_id[id] = time
+            data_points += 1
+
+            if len(agg_splits) > 1: split_count_by_agg[agg][trade_size] += 1
+            else: non_split_count_by_agg[agg][trade_size] += 1
+
+            # ******************* Select Samples (saves all samples) **************************
+            # if totle_splits == agg_splits and totle_price / agg_price > 1.05: # same split diff price indicates price data discrepancy
+            # if totle_price / agg_price > 1.05 and totle_splits != agg_splits and trade_size == 100 and to_token == 'REP' and agg not in ['1-Inch', '1-Inch V2']:
+            if totle_price / agg_price > 1.05 and trade_size == 100 and to_token == 'REP' and agg == 'Paraswap':
+            # if id == '0xda29700714084710ab72d95e0510a044881839807586493c870d4d7a7000a444':
+                key = (to_token, trade_size, agg)
+                select_samples[key].append((id, totle_price, totle_splits, agg_price, agg_splits))
+
+            # ******************* Large neg savings (saves only the worst sample, keeps tally in the key) ***********************
+            if trade_size == 50 and pct_savings < -2 and agg != 'DEX.AG':
+                large_neg_savings_count += 1
+                if is_multi_split(totle_splits): large_neg_savings_with_routing_count += 1
+                key = (to_token, trade_size, agg)
+                # print(f"{to_token} for {trade_size} ETH Totle price is {totle_price} {agg} price is {agg_price} -> Totle's price is {100 * ((totle_price - agg_price) / agg_price)}% GREATER\n   id={id}\n   Totle Split:\t{totle_splits}\n   {agg} Split:\t{agg_splits}")
+
+                if key in large_neg_savings:
+                    n_samples, old_totle_price, old_totle_splits, old_agg_price, old_agg_splits = large_neg_savings[key]
+                    if totle_price / agg_price > old_totle_price / old_agg_price:
+                        large_neg_savings[key] = (n_samples + 1, totle_price, totle_splits, agg_price, agg_splits)
                     else:
-                        large_neg_savings[key] = (1, totle_price, totle_splits, agg_price, agg_splits)
+                        large_neg_savings[key] = (n_samples + 1, old_totle_price, old_totle_splits, old_agg_price, old_agg_splits)
+                else:
+                    large_neg_savings[key] = (1, totle_price, totle_splits, agg_price, agg_splits)
 
 
-                # print(f"{to_token}/{from_token} trade_size={trade_size} {from_token} \n\ttotle_splits={totle_splits} \n\tagg_splits={splits} savings={pct_savings}")
+            # print(f"{to_token}/{from_token} trade_size={trade_size} {from_token} \n\ttotle_splits={totle_splits} \n\tagg_splits={splits} savings={pct_savings}")
 
-                per_pair_savings[pair][trade_size][agg].append(pct_savings)
-                if is_multi_split(totle_splits):
-                    multi_data_points += 1
-                    per_pair_savings_with_routing[pair][trade_size][agg].append(pct_savings)
-                else:
-                    single_data_points += 1
-                    per_pair_savings_without_routing[pair][trade_size][agg].append(pct_savings)
+            per_pair_savings[pair][trade_size][agg].append(pct_savings)
+            if is_multi_split(totle_splits):
+                multi_data_points += 1
+                per_pair_savings_with_routing[pair][trade_size][agg].append(pct_savings)
+            else:
+                single_data_points += 1
+                per_pair_savings_without_routing[pair][trade_size][agg].append(pct_savings)
 
-                totle_current = {'price': totle_price, 'split': totle_splits}
-                totle_best_splits[pair][trade_size][id] = totle_current
-                current = {'price': agg_price, 'split': agg_splits} if totle_price > agg_price else totle_current
-                if (best_splits[pair][trade_size].get(id) is None) or (best_splits[pair][trade_size][id]['price'] > current['price']):
-                    best_splits[pair][trade_size][id] = current
+            totle_current = {'price': totle_price, 'split': totle_splits}
+            totle_best_splits[pair][trade_size][id] = totle_current
+            current = {'price': agg_price, 'split': agg_splits} if totle_price > agg_price else totle_current
+            if (best_splits[pair][trade_size].get(id) is None) or (best_splits[pair][trade_size][id]['price'] > current['price']):
+                best_splits[pair][trade_size][id] = current
 
 
     agg_names = sorted(agg_names)
+    summary = summarize(per_pair_savings) # shared by all of the reports below
     # trade_sizes = sorted_trade_sizes(*per_pair_savings.values())
 
     print_data_points(data_points, single_data_points, multi_data_points, timestamp_by_id)
@@ -708,36 +645,37 @@ def do_summary_eth_pairs(csv_files):
 
     # ************ AVERAGE SAVINGS ****************
     if True:
-        print_savings_summary_table_csv(aggregated_savings(per_pair_savings), agg_names, label="Average Savings (all samples)")
-        print_avg_savings_by_pair(per_pair_savings, only_aggs=agg_names, show_only_to=True)
-        print_avg_savings_by_pair(per_pair_savings, only_trade_size=1.0, only_aggs=agg_names, show_only_to=True)
-        print_avg_savings_by_pair(per_pair_savings, only_trade_size=10.0, only_aggs=agg_names, show_only_to=True)
-        print_avg_savings_by_pair(per_pair_savings, only_trade_size=100.0, only_aggs=agg_names, show_only_to=True)
+        print_savings_summary_table_csv(aggregated_savings(summary), agg_names, label="Average Savings (all samples)")
+        print_avg_savings_by_pair(summary, only_aggs=agg_names, show_only_to=True)
+        print_avg_savings_by_pair(summary, only_trade_size=1.0, only_aggs=agg_names, show_only_to=True)
+        print_avg_savings_by_pair(summary, only_trade_size=10.0, only_aggs=agg_names, show_only_to=True)
+        print_avg_savings_by_pair(summary, only_trade_size=100.0, only_aggs=agg_names, show_only_to=True)
 
     if False:
-        print_savings_summary_table_csv(aggregated_savings(per_pair_savings, lambda pair: pair[1] == 'BAL'), agg_names, label="Average Savings (BAL/ETH)")
-        print_savings_summary_table_csv(aggregated_savings(per_pair_savings, lambda pair: pair[1] == 'KNC'), agg_names, label="Average Savings (KNC/ETH)")
-        print_savings_summary_table_csv(aggregated_savings(per_pair_savings, lambda pair: pair[1] == 'REP'), agg_names, label="Average Savings (REP/ETH)")
+        print_savings_summary_table_csv(aggregated_savings(summary, lambda pair: pair[1] == 'BAL'), agg_names, label="Average Savings (BAL/ETH)")
+        print_savings_summary_table_csv(aggregated_savings(summary, lambda pair: pair[1] == 'KNC'), agg_names, label="Average Savings (KNC/ETH)")
+        print_savings_summary_table_csv(aggregated_savings(summary, lambda pair: pair[1] == 'REP'), agg_names, label="Average Savings (REP/ETH)")
 
 
     # **************** BETTER WORSE SAME / SAVINGS SUMMARY TABLE **********************
     if True:
-        total_samples = do_better_worse_same_price(per_pair_savings, "All Samples", agg_breakdown=True)
+        total_samples = do_better_worse_same_price(summary, "All Samples", agg_breakdown=True)
 
 
     # **************** BETTER WORSE SAME / WITH/WITHOUT ROUTING **********************
     if False:
-        do_better_worse_same_price(per_pair_savings_with_routing, "Samples Where Totle Employed Smart Routing")
-        print_savings_summary_table_csv(aggregated_savings(per_pair_savings_with_routing), agg_names, label="Average Savings (samples with smart routing)")
+        with_routing_summary, without_routing_summary = summarize(per_pair_savings_with_routing), summarize(per_pair_savings_without_routing)
+        do_better_worse_same_price(with_routing_summary, "Samples Where Totle Employed Smart Routing")
+        print_savings_summary_table_csv(aggregated_savings(with_routing_summary), agg_names, label="Average Savings (samples with smart routing)")
 
-        do_better_worse_same_price(per_pair_savings_without_routing, "Samples Where Totle Did Not Employ Smart Routing")
-        print_savings_summary_table_csv(aggregated_savings(per_pair_savings_without_routing), agg_names, label="Average Savings (samples without smart routing)")
+        do_better_worse_same_price(without_routing_summary, "Samples Where Totle Did Not Employ Smart Routing")
+        print_savings_summary_table_csv(aggregated_savings(without_routing_summary), agg_names, label="Average Savings (samples without smart routing)")
 
 
     # **************** NEGATIVE SAVINGS **********************
     if False:
         print(f"\n\nNegative Savings Analysis")
-        do_neg_savings(per_pair_savings, trade_sizes)
+        do_neg_savings(summary, trade_sizes)
 
 
     # **************** LARGE NEG SAVINGS **********************
@@ -761,26 +699,31 @@ def do_summary_eth_pairs(csv_files):
                 print_sample(tok_ts_agg, prices_splits)
                 # print_sample(tok_ts_agg, prices_splits, print_snapshot=True)
 
+    # **************** SELECT SAMPLES SNAPSHOT ANALYSIS **********************
+    if False:
+        print_select_samples_snapshot_analysis(select_samples)
+
     # ****************************************  Does Totle win more when it splits **********************
     if False:
         do_splits_vs_non_splits(csv_files, agg_names)
         do_totle_splits_vs_non_splits(csv_files, agg_names)
         per_token_both_splitting_savings, _ = data_import.parse_csv_files(csv_files, only_splits=True, only_totle_splits=True)
-        do_neg_savings(per_token_both_splitting_savings, trade_sizes)
+        both_splitting_summary = summarize(per_token_both_splitting_savings)
+        do_neg_savings(both_splitting_summary, trade_sizes)
 
-        do_both_splitting(per_token_both_splitting_savings, agg_names)
-        do_neg_savings(per_token_both_splitting_savings, trade_sizes)
-        print_avg_savings_by_pair(per_token_both_splitting_savings, only_trade_size=10.0, only_aggs=agg_names, show_only_to=True)
-        print_avg_savings_by_pair(per_token_both_splitting_savings, only_trade_size=100.0, only_aggs=agg_names, show_only_to=True)
+        do_both_splitting(both_splitting_summary, agg_names)
+        do_neg_savings(both_splitting_summary, trade_sizes)
+        print_avg_savings_by_pair(both_splitting_summary, only_trade_size=10.0, only_aggs=agg_names, show_only_to=True)
+        print_avg_savings_by_pair(both_splitting_summary, only_trade_size=100.0, only_aggs=agg_names, show_only_to=True)
 
 
     # ***************************** PER PAIR SAVINGS **********************
     if False:
-        print_avg_savings_per_pair_by_agg(per_pair_savings, 10.0, print_threshold=4, samples=True, min_stablecoins=0)
-        print_savings_summary_by_pair_csv(per_pair_savings, 50.0, agg_names)
+        print_avg_savings_per_pair_by_agg(summary, 10.0, print_threshold=4, samples=per_pair_savings, min_stablecoins=0)
+        print_savings_summary_by_pair_csv(summary, 50.0, agg_names)
         for trade_size in trade_sizes:
-            print_avg_savings_per_pair_by_agg(per_pair_savings, trade_size, print_threshold=0, samples=False)
-        print_avg_savings_per_pair_by_trade_size(per_pair_savings, trade_sizes)
+            print_avg_savings_per_pair_by_agg(summary, trade_size, print_threshold=0)
+        print_avg_savings_per_pair_by_trade_size(summary, trade_sizes)
 
 
     # ***************************** SPLIT COUNTS **********************
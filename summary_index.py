@@ -0,0 +1,110 @@
+import contextlib
+import io
+import json
+import os
+import pickle
+import sqlite3
+import sys
+import threading
+import zlib
+
+##############################################################################################
+#
+# Persistent per-file index of parsed CSV data
+#
+# Summarizers like data_import.parse_csv_files re-read every file in outputs/ each run, and
+# their lru_cache only lasts for one process. This index stores each file's parsed partial
+# result (e.g. its {token: {trade_size: {exchange: [samples]}}}) in a SQLite file keyed by the
+# file's path, mtime and size, so later runs only parse files that are new or have changed and
+# merge the stored partials for the rest. Whatever a parse function prints (e.g. csv_row_gen's
+# warnings about large negative savings) is stored with its partial and printed again when the
+# stored partial is used, so the output of a run doesn't depend on the state of the index.
+#
+# The index is off unless SUMMARY_INDEX=on or configure(enabled=True). Set SUMMARY_INDEX_PATH to
+# move it.
+
+VERSION = 2 # bump when the partials produced by the parse functions change shape or meaning
+
+ENABLED = os.environ.get('SUMMARY_INDEX', 'off') == 'on'
+PATH = os.environ.get('SUMMARY_INDEX_PATH', f"{os.path.dirname(os.path.abspath(__file__))}/data/summary_index.sqlite")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS partials (kind TEXT, file TEXT, mtime_ns INTEGER, size INTEGER, partial BLOB, PRIMARY KEY (kind, file));
+"""
+
+_conn = None
+_lock = threading.Lock()
+_stats = {'hits': 0, 'misses': 0}
+
+
+def configure(enabled=None, path=None):
+    global ENABLED, PATH, _conn
+    with _lock:
+        if enabled is not None: ENABLED = enabled
+        if path is not None and path != PATH:
+            PATH = path
+            if _conn: _conn.close()
+            _conn = None
+
+def connection():
+    """Returns the shared SQLite connection (must be called with _lock held)"""
+    global _conn
+    if not _conn:
+        os.makedirs(os.path.dirname(PATH) or '.', exist_ok=True)
+        _conn = sqlite3.connect(PATH, check_same_thread=False)
+        _conn.executescript(SCHEMA)
+    return _conn
+
+def index_kind(name, **kwargs):
+    """Returns the key under which partials of parse function name called with kwargs are stored"""
+    return f"{name}:v{VERSION}:{json.dumps(kwargs, sort_keys=True)}"
+
+def file_partial(kind, file, parse_file):
+    """Returns the stored partial for file if it hasn't changed since it was stored, otherwise parse_file(file),
+    which is stored for next time along with anything it printed. Either way, that output is printed. Partials must be
+    picklable (i.e. plain dicts, not defaultdicts with lambdas)"""
+    if not ENABLED: return parse_file(file)
+
+    file = os.path.abspath(file)
+    st = os.stat(file)
+    with _lock:
+        row = connection().execute("SELECT partial FROM partials WHERE kind = ? AND file = ? AND mtime_ns = ? AND size = ?", (kind, file, st.st_mtime_ns, st.st_size)).fetchone()
+    if row:
+        _stats['hits'] += 1
+        partial, output = pickle.loads(zlib.decompress(row[0]))
+        sys.stdout.write(output)
+        return partial
+
+    _stats['misses'] += 1
+    with contextlib.redirect_stdout(io.StringIO()) as out:
+        partial = parse_file(file)
+    output = out.getvalue()
+    sys.stdout.write(output)
+    blob = zlib.compress(pickle.dumps((partial, output), protocol=pickle.HIGHEST_PROTOCOL))
+    with _lock:
+        conn = connection()
+        with conn:
+            conn.execute("INSERT OR REPLACE INTO partials (kind, file, mtime_ns, size, partial) VALUES (?, ?, ?, ?, ?)", (kind, file, st.st_mtime_ns, st.st_size, blob))
+    return partial
+
+def merge_samples(total, partial):
+    """Merges a nested dict of sample lists (any depth) into total, e.g. {token: {trade_size: {exchange: [samples]}}}"""
+    for k, v in partial.items():
+        if isinstance(v, dict):
+            merge_samples(total[k], v)
+        else:
+            total[k] += v
+    return total
+
+def prune(files):
+    """Removes stored partials for files other than the given ones (and any from older VERSIONs)"""
+    keep = { os.path.abspath(f) for f in files }
+    with _lock:
+        conn = connection()
+        stale = [ (kind, file) for kind, file in conn.execute("SELECT kind, file FROM partials") if file not in keep or f":v{VERSION}:" not in kind ]
+        with conn:
+            conn.executemany("DELETE FROM partials WHERE kind = ? AND file = ?", stale)
+    return len(stale)
+
+def stats():
+    return dict(_stats)
@@ -0,0 +1,76 @@
+import random
+
+##############################################################################################
+#
+# Synthetic slippage curves
+#
+# Generates ts_ex_pscs data ({trade_size: {exchange: [(price, slippage, cost)]}}, the shape
+# data_import.read_slippage_csvs returns for each token) with the kinds of price curves seen
+# on DEXs, so split optimizers can be benchmarked without recorded price data.
+
+DEFAULT_TRADE_SIZES = [0.1, 0.5, 1.0, 5.0, 10.0, 20.0, 50.0, 100.0, 200.0, 300.0, 400.0, 500.0]
+CURVE_KINDS = ['amm', 'order_book', 'step']
+
+
+def amm_price(base_price, ts, liquidity, fee=0.003):
+    """Price of buying with ts ETH from a constant product pool with liquidity ETH in reserve"""
+    return base_price * (1 + ts / liquidity) / (1 - fee)
+
+def order_book_price(base_price, ts, levels):
+    """Average price of buying with ts ETH by filling levels [(ETH depth, price premium), ...] in order"""
+    filled, spent_premium = 0.0, 0.0
+    for depth, premium in levels:
+        fill = min(depth, ts - filled)
+        filled, spent_premium = filled + fill, spent_premium + fill * premium
+        if filled >= ts: break
+    return base_price * (1 + spent_premium / filled)
+
+def step_price(base_price, ts, steps):
+    """Price that jumps at the given [(trade_size, price premium), ...] thresholds, e.g. reserve tiers on Kyber"""
+    premium = 0.0
+    for threshold, step_premium in steps:
+        if ts > threshold: premium = step_premium
+    return base_price * (1 + premium)
+
+def random_curve(kind, rng, max_trade_size):
+    """Returns (price_func(base_price, ts), known_liquidity) for a random curve of the given kind"""
+    if kind == 'amm':
+        liquidity = rng.uniform(50, 5000)
+        fee = rng.choice([0.001, 0.002, 0.003])
+        return (lambda base_price, ts: amm_price(base_price, ts, liquidity, fee)), max_trade_size
+    elif kind == 'order_book':
+        levels, premium = [], rng.uniform(0.0005, 0.003)
+        for _ in range(rng.randint(3, 12)):
+            levels.append((rng.uniform(1, 60), premium))
+            premium += rng.uniform(0.001, 0.01)
+        depth = sum(d for d, _ in levels)
+        return (lambda base_price, ts: order_book_price(base_price, ts, levels)), depth
+    elif kind == 'step':
+        thresholds = sorted(rng.uniform(1, max_trade_size / 2) for _ in range(rng.randint(1, 4)))
+        steps, premium = [], rng.uniform(0.001, 0.004)
+        for threshold in thresholds:
+            premium += rng.uniform(0.005, 0.03)
+            steps.append((threshold, premium))
+        first_premium = rng.uniform(0.001, 0.004)
+        return (lambda base_price, ts: step_price(base_price, ts, [(0.0, first_premium)] + steps)), max_trade_size
+    else:
+        raise ValueError(f"unknown curve kind '{kind}' (expected one of {CURVE_KINDS})")
+
+def synthetic_ts_ex_pscs(n_dexs=5, trade_sizes=DEFAULT_TRADE_SIZES, kinds=CURVE_KINDS, base_price=0.005, seed=None):
+    """Returns (ts_ex_pscs, ex_known_liquidity) for n_dexs DEXs with curves of the given kinds (assigned round robin)
+    sampled at trade_sizes. Prices are only sampled up to each DEX's liquidity, as with real quotes"""
+    rng = random.Random(seed)
+    max_trade_size = max(trade_sizes)
+    ts_ex_pscs, ex_known_liquidity = {float(ts): {} for ts in trade_sizes}, {}
+    for i in range(n_dexs):
+        kind = kinds[i % len(kinds)]
+        dex = f"{kind.title().replace('_', '')}{i}"
+        price_func, known_liquidity = random_curve(kind, rng, max_trade_size)
+        dex_base_price = base_price * (1 + rng.uniform(0, 0.002))
+        ex_known_liquidity[dex] = known_liquidity
+        for ts in trade_sizes:
+            if ts > known_liquidity: continue
+            price = price_func(dex_base_price, ts)
+            slippage = 100 * (price - base_price) / base_price
+            ts_ex_pscs[float(ts)][dex] = [(price, slippage, ts * slippage / 100)]
+    return ts_ex_pscs, ex_known_liquidity
@@ -0,0 +1,113 @@
+import contextlib
+import io
+import sys
+import time
+
+import slippage_curves
+import synthetic_curves
+
+# Benchmarks the split optimizers on synthetic AMM, order book and step function curves. Each algorithm is scored by
+# its runtime and its optimality gap: the percent by which its solution costs more than the lowest cost found by any
+# of them. That is a relative gap, not a gap to the true optimum: enumerate_solutions is exact only over allocations on
+# the hi-res price matrix grid, which is 0.1 ETH up to 2 ETH but 1 ETH above, so the finer steps of greedy and
+# marginal_cost can beat it by a few percent.
+#
+#   python bench_split_optimizers.py [n_markets] [tolerance_pct]
+
+TARGET_TRADE_SIZES = [5.0, 20.0, 50.0, 100.0]
+N_DEXS = [3, 5, 8]
+TOLERANCE_PCT = 1.0 # gaps larger than this are flagged
+
+ALGORITHMS = {
+    'splitting': lambda ts, pe: slippage_curves.splitting_algorithm(ts, pe),
+    'greedy': lambda ts, pe: slippage_curves.greedy_solutions(ts, pe, pe.all_dexs)[0],
+    'marginal_cost': lambda ts, pe: slippage_curves.marginal_cost_solution(ts, pe, pe.all_dexs),
+    'rebalancing': lambda ts, pe: slippage_curves.rebalancing_branch_and_bound_solutions(ts, pe, pe.all_dexs),
+    'enumerate': lambda ts, pe: slippage_curves.enumerate_solutions(ts, pe, pe.all_dexs)[0],
+}
+
+def run_algorithm(algorithm, target_trade_size, price_estimator):
+    """Returns (solution, seconds) with the algorithm's prints suppressed. Failed runs return a None solution"""
+    start = time.perf_counter()
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            solution = algorithm(target_trade_size, price_estimator)
+    except ValueError:
+        solution = None
+    return solution, time.perf_counter() - start
+
+def benchmark(n_markets=3, target_trade_sizes=TARGET_TRADE_SIZES, n_dexs=N_DEXS, algorithms=ALGORITHMS):
+    """Returns {algorithm: {'seconds': [...], 'gaps': [...], 'failures': n}} over synthetic markets"""
+    results = { name: {'seconds': [], 'gaps': [], 'failures': 0} for name in algorithms }
+    for n in n_dexs:
+        for seed in range(n_markets):
+            ts_ex_pscs, ex_known_liquidity = synthetic_curves.synthetic_ts_ex_pscs(n_dexs=n, seed=seed)
+            price_estimator = slippage_curves.PriceEstimator.construct('SYN', ts_ex_pscs, ex_known_liquidity)
+            for target_trade_size in target_trade_sizes:
+                costs = {}
+                for name, algorithm in algorithms.items():
+                    solution, seconds = run_algorithm(algorithm, target_trade_size, price_estimator)
+                    results[name]['seconds'].append(seconds)
+                    cost = price_estimator.solution_cost(solution) if solution else float('inf')
+                    if abs(sum(solution.values()) - target_trade_size) > 0.001 if solution else True:
+                        results[name]['failures'] += 1
+                    else:
+                        costs[name] = cost
+
+                best_cost = min(costs.values(), default=float('inf'))
+                for name, cost in costs.items():
+                    gap = 0.0 if cost == best_cost else 100 * (cost - best_cost) / abs(best_cost or 1)
+                    results[name]['gaps'].append(gap)
+    return results
+
+def print_benchmark(results, tolerance_pct=TOLERANCE_PCT):
+    print(f"algorithm,total_seconds,mean_ms,mean_gap_pct,max_gap_pct,failures,within_tolerance")
+    for name, r in results.items():
+        mean_ms = 1000 * sum(r['seconds']) / len(r['seconds'])
+        mean_gap = sum(r['gaps']) / len(r['gaps']) if r['gaps'] else float('nan')
+        max_gap = max(r['gaps'], default=float('nan'))
+        within = max_gap <= tolerance_pct and not r['failures']
+        print(f"{name},{sum(r['seconds']):.3f},{mean_ms:.2f},{mean_gap:.4f},{max_gap:.4f},{r['failures']},{within}")
+
+def fastest_within_tolerance(results, tolerance_pct=TOLERANCE_PCT):
+    within = [ (sum(r['seconds']), name) for name, r in results.items() if not r['failures'] and max(r['gaps'], default=0) <= tolerance_pct ]
+    return min(within)[1] if within else None
+
+def test_synthetic_curves():
+    for kind in synthetic_curves.CURVE_KINDS:
+        ts_ex_pscs, ex_known_liquidity = synthetic_curves.synthetic_ts_ex_pscs(n_dexs=2, kinds=[kind], seed=1)
+        for dex in ex_known_liquidity:
+            prices = [ ex_pscs[dex][0][0] for ts, ex_pscs in sorted(ts_ex_pscs.items()) if dex in ex_pscs ]
+            assert prices and prices == sorted(prices), f"{kind} prices should rise with trade size: {prices}"
+
+def test_enumerate_is_never_beaten_by_splitting():
+    # only splitting: greedy and marginal_cost can beat enumerate off its grid (see above)
+    results = benchmark(n_markets=1, target_trade_sizes=[5.0, 20.0], n_dexs=[3], algorithms={ k: ALGORITHMS[k] for k in ('splitting', 'enumerate') })
+    assert max(results['enumerate']['gaps']) < 0.01, results['enumerate']['gaps']
+
+def test_greedy_solutions():
+    ts_ex_pscs, ex_known_liquidity = synthetic_curves.synthetic_ts_ex_pscs(n_dexs=5, seed=1)
+    price_estimator = slippage_curves.PriceEstimator.construct('SYN', ts_ex_pscs, ex_known_liquidity)
+    winner, best, best_steps = slippage_curves.greedy_solutions(20.0, price_estimator, price_estimator.all_dexs)
+    assert winner is best[best_steps] and len(best) == 41
+    for steps, solution in enumerate(best[1:], 1):
+        assert abs(sum(solution.values()) - 20.0) < 1e-9, (steps, solution)
+        assert all(abs(alloc * steps / 20.0 - round(alloc * steps / 20.0)) < 1e-3 for alloc in solution.values()), (steps, solution)
+        assert abs(solution.cost - price_estimator.solution_cost(dict(solution))) < 1e-12, (steps, solution)
+        assert solution.cost >= winner.cost
+
+    # no dex has the liquidity for any step, so every marginal cost is inf (and none may be nan)
+    winner, best, _ = slippage_curves.greedy_solutions(100000.0, price_estimator, price_estimator.all_dexs, step_counts=[1, 2, 4])
+    assert winner.cost == float('inf') and all(abs(sum(best[steps].values()) - 100000.0) < 1e-9 for steps in [1, 2, 4])
+
+
+test_synthetic_curves()
+test_greedy_solutions()
+test_enumerate_is_never_beaten_by_splitting()
+
+if __name__ == "__main__":
+    n_markets = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+    tolerance_pct = float(sys.argv[2]) if len(sys.argv) > 2 else TOLERANCE_PCT
+    results = benchmark(n_markets=n_markets)
+    print_benchmark(results, tolerance_pct)
+    print(f"fastest within {tolerance_pct}% of the best cost: {fastest_within_tolerance(results, tolerance_pct)}")
@@ -0,0 +1,79 @@
+import contextlib
+import tempfile
+
+import json_utils
+import snapshot_archive
+import snapshot_utils
+import totle_client
+from token_fixtures import saved_registry
+
+# Shared by the tests that need snapshots without calling the Totle API. Amounts are in ETH and USDC, the tokens of
+# token_fixtures.TOKENS_JSON, and exchanges are named by EXCHANGES_BY_ID
+
+EXCHANGES_BY_ID = { 1: 'Kyber', 2: 'Uniswap', 3: 'Bancor' }
+EXCHANGE_IDS = { name: ex_id for ex_id, name in EXCHANGES_BY_ID.items() }
+DECIMALS = { 'ETH': 18, 'USDC': 6 }
+
+def int_amount(amount, symbol):
+    return str(round(amount * 10 ** DECIMALS[symbol]))
+
+def asset(symbol):
+    return { 'symbol': symbol, 'address': f"0x{symbol}" }
+
+def trade(source_amount, rate, splits, source='ETH', destination='USDC'):
+    """Returns the JSON of a trade of source_amount at rate split between DEXs given as [(dex, pct, order_rate, data_points)]"""
+    orders = [ { 'exchangeId': EXCHANGE_IDS[dex], 'sourceAsset': asset(source), 'destinationAsset': asset(destination),
+                 'sourceAmount': int_amount(source_amount * pct / 100, source),
+                 'destinationAmount': int_amount(source_amount * pct / 100 * order_rate, destination),
+                 'splitPercentage': pct, 'rate': str(order_rate) } for dex, pct, order_rate, _ in splits ]
+    return {
+        'sourceAsset': asset(source), 'destinationAsset': asset(destination),
+        'sourceAmount': int_amount(source_amount, source), 'destinationAmount': int_amount(source_amount * rate, destination),
+        'rate': str(rate), 'orders': {'main': orders},
+        'split': [ { 'exchangeId': EXCHANGE_IDS[dex], 'percentage': str(pct), 'dataPoints': data_points } for dex, pct, _, data_points in splits ],
+    }
+
+def route(source_amount, rate, splits, **kwargs):
+    """Returns the JSON of a route with a single trade (see trade)"""
+    t = trade(source_amount, rate, splits, **kwargs)
+    return dict({ k: t[k] for k in ('sourceAsset', 'destinationAsset', 'sourceAmount', 'destinationAmount', 'rate') }, trades=[t])
+
+def snapshot(id, source_amount, swap_rate, routes, summary_rate=None):
+    """Returns the JSON of a snapshot with one swap of source_amount ETH for USDC at swap_rate, with the given routes.
+    The summary's rate (which is the best route's) defaults to swap_rate"""
+    swap = { 'sourceAsset': asset('ETH'), 'sourceAmount': int_amount(source_amount, 'ETH'), 'rate': str(swap_rate), 'routes': routes }
+    summary = { 'sourceAsset': asset('ETH'), 'sourceAmount': int_amount(source_amount, 'ETH'), 'rate': str(summary_rate or swap_rate) }
+    return { 'response': { 'success': True, 'response': { 'id': id, 'summary': [summary] } }, 'swaps': [swap] }
+
+# A 10 ETH swap whose used route (rate 200) splits 60/40 between Kyber, whose 6 ETH is all of its liquidity, and
+# Uniswap. Its better route (rate 215) doesn't have the liquidity for 10 ETH and has a zero rate split, and its best
+# route (rate 205) is all Uniswap
+KYBER_POINTS = [['1', '200'], ['5', '199'], ['6', '198']]
+UNISWAP_POINTS = [['1', '201'], ['10', '195'], ['20', '180']]
+USED_ROUTE = route(10, 200, [('Kyber', 60, 199, KYBER_POINTS), ('Uniswap', 40, 201, UNISWAP_POINTS)])
+BETTER_ROUTE = route(8, 215, [('Bancor', 50, 0, [['1', '230'], ['4', '220']]), ('Uniswap', 50, 201, UNISWAP_POINTS)])
+BEST_ROUTE = route(10, 205, [('Uniswap', 100, 205, UNISWAP_POINTS)])
+
+def zero_alloc_snapshot(id):
+    return snapshot(id, 10, 200, [USED_ROUTE, BETTER_ROUTE, BEST_ROUTE], summary_rate=205)
+
+def plain_snapshot(id):
+    """A snapshot like zero_alloc_snapshot's without the better route, so the used route is also the better one"""
+    return snapshot(id, 10, 200, [USED_ROUTE])
+
+@contextlib.contextmanager
+def snapshot_env(snapshots=None):
+    """Makes snapshot_utils use a temporary snapshot_archive holding snapshots ({id: json}), the tokens of
+    token_fixtures and EXCHANGES_BY_ID for the duration of the block, restoring them afterwards"""
+    archive_dir, exchanges_by_id = snapshot_archive.ARCHIVE_DIR, totle_client.exchanges_by_id
+    snapshot_archive.configure(archive_dir=tempfile.mkdtemp())
+    totle_client.exchanges_by_id = lambda: EXCHANGES_BY_ID
+    snapshot_utils.exchange_name.cache_clear()
+    try:
+        with saved_registry():
+            for id, j in (snapshots or {}).items(): snapshot_archive.put(id, json_utils.dumps(j))
+            yield snapshot_archive.ARCHIVE_DIR
+    finally:
+        snapshot_archive.configure(archive_dir=archive_dir)
+        totle_client.exchanges_by_id = exchanges_by_id
+        snapshot_utils.exchange_name.cache_clear()
@@ -1,5 +1,12 @@
-import data_import
+import csv
 import glob
+import os
+import tempfile
+from array import array
+
+import data_import
+import exchange_utils
+import split_utils
 
 csv_files = tuple(glob.glob(f'../outputs/2020-03-22_1[123]*buy.csv'))
 #     per_token_savings, slip_price_splits = data_import.parse_csv_files(csv_files)
@@ -12,3 +19,49 @@ for csv_file in csv_files:
 
 print(f"count={count}")
 
+
+# load_savings_csv returns typed columns, with splits and ex_prices parsed safely
+for csv_file in csv_files[:1]:
+    columns = data_import.load_savings_csv(csv_file)
+    print(f"{csv_file}: {len(columns['time'])} rows, trade_size={type(columns['trade_size']).__name__}, first splits={columns['splits'][:1]}")
+
+
+def write_savings_csv(rows, header="time id action trade_size token exchange exchange_price totle_used totle_price pct_savings splits totle_splits ex_prices"):
+    filename = os.path.join(tempfile.mkdtemp(), 'savings_buy.csv')
+    with open(filename, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(header.split())
+        writer.writerows(rows)
+    return filename
+
+def test_load_savings_csv_types():
+    splits, totle_splits = "{'Uniswap': 60.4, 'kyber': 39.6}", "[{'Uniswap': 100}, {'BAT/DAI': {'Kyber': 90, 'Uniswap': 10}}]"
+    ex_prices = "{'Uniswap': 0.0041, 'Kyber': 0.00412}"
+    filename = write_savings_csv([
+        ['2020-03-22T11:00:00', 'id1', 'buy', '10.0', 'BAT', '1-Inch', '0.0041', 'Uniswap/Kyber', '0.004', '1.5', splits, totle_splits, ex_prices],
+        ['2020-03-22T11:01:00', 'id2', 'buy', '0.5', 'DAI', 'Paraswap', '0.0051', 'Kyber', '0.005', '-0.25', '', '{}'], # short row
+    ])
+    columns = data_import.load_savings_csv(filename)
+
+    for c in data_import.FLOAT_COLUMNS:
+        assert isinstance(columns[c], array) and columns[c].typecode == 'd', f"{c} is {type(columns[c])}"
+    assert list(columns['trade_size']) == [10.0, 0.5] and list(columns['pct_savings']) == [1.5, -0.25]
+    assert columns['token'] == ['BAT', 'DAI'] and columns['quote'] == [None, None] # quote is missing from this file
+
+    # splits and ex_prices are parsed exactly as the eval() they replaced did
+    assert columns['splits'] == [split_utils.canonicalize_and_sort_splits(eval(splits)), {}]
+    assert columns['totle_splits'] == [split_utils.canonicalize_and_sort_splits(eval(totle_splits)), {}]
+    assert columns['ex_prices'] == [exchange_utils.canonical_and_splittable(eval(ex_prices)), {}]
+
+def test_load_savings_csv_rejects_malformed_literals():
+    for bad_splits in ["{'Uniswap': 60", "__import__('os').getcwd()", "{'Uniswap': 60 + 40}", "open('x')"]:
+        filename = write_savings_csv([['2020-03-22T11:00:00', 'id1', 'buy', '1.0', 'BAT', '1-Inch', '0.0041', 'Uniswap', '0.004', '1.5', bad_splits, '{}', '{}']])
+        try:
+            data_import.load_savings_csv(filename)
+            assert False, f"load_savings_csv accepted splits={bad_splits}"
+        except (ValueError, SyntaxError):
+            pass
+
+
+test_load_savings_csv_types()
+test_load_savings_csv_rejects_malformed_literals()
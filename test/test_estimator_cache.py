@@ -0,0 +1,70 @@
+import os
+import tempfile
+
+import estimator_cache
+import slippage_curves
+
+EX_TS_PRICES = {
+    'Kyber': {0.1: 0.00102, 1.0: 0.00103, 5.0: 0.00108, 10.0: 0.00115},
+    'Uniswap': {0.1: 0.00101, 1.0: 0.00104, 5.0: 0.00112, 10.0: 0.00125},
+    'Bancor': {1.0: 0.00105},
+}
+EX_KNOWN_LIQUIDITY = {'Kyber': 50.0, 'Uniswap': 0.0, 'Bancor': 0.0}
+
+built = []
+
+def build():
+    built.append(1)
+    return slippage_curves.PriceEstimator('XYZ', {ex: dict(p) for ex, p in EX_TS_PRICES.items()}, dict(EX_KNOWN_LIQUIDITY))
+
+def test_save_and_load_give_identical_prices_and_splits():
+    estimator = build()
+    filename = os.path.join(tempfile.mkdtemp(), 'XYZ.pest')
+    slippage_curves.get_hi_res_price_matrix(estimator, 30)
+    estimator.save(filename)
+    loaded = slippage_curves.PriceEstimator.load(filename)
+
+    np, slippage_curves.np = slippage_curves.np, None # load maps the doubles with numpy.memmap if it can, else with mmap
+    try:
+        loaded_without_numpy = slippage_curves.PriceEstimator.load(filename)
+    finally:
+        slippage_curves.np = np
+    assert loaded_without_numpy.absolute_prices == loaded.absolute_prices and loaded_without_numpy.hi_res_price_matrices == loaded.hi_res_price_matrices
+
+    assert loaded.all_dexs == estimator.all_dexs and loaded.base_price == estimator.base_price
+    assert loaded.absolute_prices == estimator.absolute_prices
+    assert loaded.hi_res_price_matrices == estimator.hi_res_price_matrices
+    for ex in estimator.all_dexs:
+        for ts in (0.1, 0.5, 1.0, 3.3, 10.0, 25.0, 60.0):
+            assert loaded.get_absolute_price(ex, ts) == estimator.get_absolute_price(ex, ts), (ex, ts)
+            assert loaded.get_ls_price(ex, ts) == estimator.get_ls_price(ex, ts), (ex, ts)
+    assert slippage_curves.splitting_algorithm(12.0, loaded) == slippage_curves.splitting_algorithm(12.0, estimator)
+
+def test_estimators_are_only_built_once_per_source_data():
+    d = tempfile.mkdtemp()
+    source_file = os.path.join(d, 'prices.csv')
+    with open(source_file, 'w') as f: f.write("v1\n")
+
+    built.clear()
+    if 'ESTIMATOR_CACHE' not in os.environ: assert not estimator_cache.ENABLED # the cache is opt-in
+    estimator_cache.configure(enabled=False)
+    estimator_cache.get('XYZ', source_file, build)
+    estimator_cache.get('XYZ', source_file, build)
+    assert len(built) == 2
+
+    built.clear()
+    estimator_cache.configure(enabled=True, cache_dir=os.path.join(d, 'cache'))
+    first = estimator_cache.get('XYZ', source_file, build)
+    second = estimator_cache.get('XYZ', source_file, build)
+    assert len(built) == 1 and second.base_price == first.base_price
+    assert 100.0 in second.hi_res_price_matrices
+
+    with open(source_file, 'a') as f: f.write("v2\n")
+    estimator_cache.get('XYZ', source_file, build)
+    assert len(built) == 2
+    assert estimator_cache.get('ABC', source_file, lambda: None) is None
+    print(f"stats={estimator_cache.stats()}")
+
+
+test_save_and_load_give_identical_prices_and_splits()
+test_estimators_are_only_built_once_per_source_data()
@@ -11,3 +11,13 @@ exchanges_prices = {'ag': 0.001372651378552163, 'uniswap': 0.00140777550778961,
 can_splittable = exchange_utils.canonical_and_splittable(exchanges_prices)
 print(f"can_splittable={can_splittable}")
 
+
+column = ['uniswap', 'Uniswap', 'UNISWAP', 'kyber', 'Oasis', 'eth2dai'] * 3
+canonical_column = exchange_utils.canonicalize_many(column)
+print(f"canonicalize_many={canonical_column[:6]}")
+assert canonical_column == [ exchange_utils.canonical_name(d) for d in column ]
+try:
+    exchange_utils.canonicalize_many(['uniswap', 'not a dex'])
+    raise AssertionError("canonicalize_many should raise ValueError for unknown exchanges")
+except ValueError as e:
+    print(e)
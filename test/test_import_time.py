@@ -0,0 +1,56 @@
+import concurrent.futures
+import glob
+import os
+import subprocess
+import sys
+import time
+
+# Every top-level module must be importable without network I/O, output or exiting, and quickly, so that short analysis
+# jobs and this test suite don't pay for work that driver scripts only need in main(). Each module is imported in a
+# fresh interpreter (so the time includes everything it imports) with sockets disabled.
+
+IMPORT_TIME_BUDGET = 2.0 # seconds per module, including the interpreter's own startup
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+IMPORT_SCRIPT = """
+import socket, sys
+def no_network(*args, **kwargs): raise RuntimeError("network I/O at import time")
+socket.socket.connect = socket.getaddrinfo = socket.create_connection = no_network
+sys.argv = [sys.argv[0]]
+try:
+    __import__(MODULE)
+except SystemExit as e:
+    raise RuntimeError(f"exit({e.code}) at import time")
+"""
+
+def module_names():
+    return sorted(os.path.basename(f)[:-3] for f in glob.glob(os.path.join(REPO_DIR, '*.py')))
+
+def time_import(module):
+    """Imports module in a new interpreter, returning (elapsed seconds, stdout, stderr, returncode)"""
+    script = f"MODULE = {module!r}\n{IMPORT_SCRIPT}"
+    env = dict(os.environ, PYTHONPATH=REPO_DIR)
+    t0 = time.time()
+    p = subprocess.run([sys.executable, '-c', script], cwd=REPO_DIR, env=env, capture_output=True, text=True, timeout=60)
+    return time.time() - t0, p.stdout, p.stderr, p.returncode
+
+def test_modules_import_without_side_effects():
+    with concurrent.futures.ThreadPoolExecutor(max_workers=os.cpu_count() or 4) as executor:
+        results = dict(zip(module_names(), executor.map(time_import, module_names())))
+
+    failures = []
+    for module, (elapsed, stdout, stderr, returncode) in results.items():
+        if returncode != 0:
+            failures.append(f"{module}: {stderr.strip().splitlines()[-1] if stderr.strip() else f'returned {returncode}'}")
+        elif stdout:
+            failures.append(f"{module}: printed {stdout[:80]!r} at import time")
+        elif elapsed > IMPORT_TIME_BUDGET:
+            failures.append(f"{module}: took {elapsed:.2f}s to import (budget is {IMPORT_TIME_BUDGET}s)")
+
+    slowest = sorted(results, key=lambda m: results[m][0], reverse=True)[:5]
+    print(f"imported {len(results)} modules, slowest: {', '.join(f'{m} {results[m][0]:.2f}s' for m in slowest)}")
+    assert not failures, "\n".join(failures)
+
+
+test_modules_import_without_side_effects()
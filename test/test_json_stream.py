@@ -0,0 +1,59 @@
+import io
+import json
+
+import json_stream
+
+DOC = {'response': {'id': 'abc', 'summary': [{'rate': '1.5e3', 'n': -0.25}]}, 'swaps': [{'routes': [{'rate': 1, 'trades': [{'x': "a\"]}"}]}, {'rate': 2, 'trades': []}]}], 'empty': {}}
+
+def walk(stream):
+    c = stream.peek()
+    if c == '{': return { key: walk(stream) for key in stream.keys() }
+    if c == '[': return [ walk(stream) for _ in stream.elements() ]
+    return stream.value()
+
+def test_walk_matches_json_load():
+    text = json.dumps(DOC, indent=3)
+    for chunk_size in (1, 3, 64, 1 << 16):
+        assert walk(json_stream.JSONStream(io.StringIO(text), chunk_size=chunk_size)) == DOC, chunk_size
+
+def test_raw_and_skip():
+    stream = json_stream.JSONStream(io.StringIO(json.dumps(DOC)), chunk_size=5)
+    for key in stream.keys():
+        if key == 'swaps':
+            for _ in stream.elements():
+                for swap_key in stream.keys():
+                    routes = [ stream.raw() for _ in stream.elements() ]
+                    assert [ json.loads(r) for r in routes ] == DOC['swaps'][0]['routes']
+        else:
+            stream.skip()
+
+def test_raw_and_skip_dont_decode_containers():
+    decoded = []
+    class CountingDecoder(json.JSONDecoder):
+        def raw_decode(self, s, idx=0):
+            decoded.append(s[idx])
+            return super().raw_decode(s, idx)
+
+    decoder, json_stream._DECODER = json_stream._DECODER, CountingDecoder()
+    try:
+        for chunk_size in (1, 3, 64):
+            stream = json_stream.JSONStream(io.StringIO(json.dumps(DOC, indent=3)), chunk_size=chunk_size)
+            raws = [ stream.raw() if key == 'swaps' else stream.skip() for key in stream.keys() ]
+            assert json.loads(raws[1]) == DOC['swaps'], chunk_size
+    finally:
+        json_stream._DECODER = decoder
+    assert decoded and all(c == '"' for c in decoded), decoded # only the top-level keys were decoded
+
+def test_scan_errors():
+    for bad in ['{"a": [1, 2}', '{"a": "b', '[[]', '{"a": "\\"}']:
+        try:
+            json_stream.JSONStream(io.StringIO(bad), chunk_size=2).skip()
+            assert False, f"skipped {bad!r}"
+        except ValueError:
+            pass
+
+
+test_walk_matches_json_load()
+test_raw_and_skip()
+test_raw_and_skip_dont_decode_containers()
+test_scan_errors()
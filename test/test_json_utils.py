@@ -0,0 +1,102 @@
+import io
+import json
+import random
+import time
+
+import json_utils
+
+DOC = {'id': 'abc', 'summary': [{'rate': 1500.25, 'sourceAmount': '1000000000000000000', 'ok': True, 'dex': None, 'name': 'Curve.fi é'}]}
+
+def each_backend(test):
+    backend = json_utils.BACKEND
+    try:
+        for b in json_utils.available_backends():
+            json_utils.configure(b)
+            test(b)
+    finally:
+        json_utils.configure(backend)
+
+def test_round_trip():
+    def check(backend):
+        s = json_utils.dumps(DOC)
+        assert ': ' not in s and ', ' not in s, f"{backend} output is not compact: {s}"
+        assert json_utils.loads(s) == DOC and json_utils.loads(s.encode()) == DOC
+        assert json.loads(s) == DOC # readable by anything
+        assert json_utils.loads(json_utils.dumps(DOC, sort_keys=True)) == DOC
+        f = io.StringIO()
+        json_utils.dump({0.5: 'half', 2.0: 'two'}, f) # trade sizes are used as keys, as with json.dump
+        assert json_utils.loads(f.getvalue()) == {'0.5': 'half', '2.0': 'two'}
+    each_backend(check)
+
+def test_indent():
+    assert json_utils.dumps(DOC, indent=3) == json.dumps(DOC, indent=3)
+
+def test_big_ints_and_nan_fall_back_to_json():
+    def check(backend):
+        assert json_utils.dumps([10**21]) == '[1000000000000000000000]'
+        assert json_utils.loads('[NaN]')[0] != json_utils.loads('[NaN]')[0]
+        big = {'a': [1, -10**23 - 1], 'b': 2**64 - 1, 'c': 10**20, 'amount': str(10**21)}
+        for text in [json.dumps(big), json.dumps(big, indent=3), json.dumps(big).encode()]:
+            assert json_utils.loads(text) == big, f"{backend} decoded {text!r} as {json_utils.loads(text)}"
+            assert all(type(v) is int for v in [*json_utils.loads(text)['a'], json_utils.loads(text)['b'], json_utils.loads(text)['c']])
+        for text in ['18446744073709551616', ' -9223372036854775809', '[\n   -9223372036854775809\n]', b'{"a":[1,\n 100000000000000000000]}']:
+            assert json_utils.loads(text) == json.loads(text) and json_utils.dumps(json_utils.loads(text)) == json.dumps(json.loads(text), separators=(',', ':')), f"{backend} decoded {text!r} as {json_utils.loads(text)}"
+    each_backend(check)
+
+def snapshot_like_doc(n_routes=150):
+    """Returns a document shaped like a Totle snapshot, with token amounts as long digit strings"""
+    rnd = random.Random(1)
+    assets = [ {'address': f"0x{rnd.getrandbits(160):040x}", 'symbol': symbol, 'decimals': 18} for symbol in ['ETH', 'DAI', 'BAT', 'MKR'] ]
+    amount = lambda: str(rnd.randint(10**15, 10**23))
+    order = lambda: {'exchangeId': rnd.randint(1, 30), 'sourceAsset': rnd.choice(assets), 'destinationAsset': rnd.choice(assets),
+                     'sourceAmount': amount(), 'destinationAmount': amount(), 'rate': rnd.random() * 1000, 'splitPercentage': rnd.randint(1, 100),
+                     'fee': {'asset': rnd.choice(assets), 'amount': amount(), 'percentage': 0.25}, 'isPartial': False, 'dataPoints': [
+                         {'min': rnd.random(), 'max': rnd.random(), 'price': rnd.random() * 100} for _ in range(3)]}
+    routes = [ {'rate': rnd.random(), 'sourceAmount': amount(), 'trades': [{'orders': [order() for _ in range(3)]} for _ in range(2)]} for _ in range(n_routes) ]
+    return {'response': {'id': 'abc', 'summary': []}, 'swaps': [{'sourceAsset': assets[0], 'routes': routes}]}
+
+def best_times(*fs, n=15):
+    """Returns the best time of n runs of each f, alternating between them so that load on the machine affects all"""
+    times = [ [] for _ in fs ]
+    for _ in range(n):
+        for f, f_times in zip(fs, times):
+            t0 = time.perf_counter()
+            f()
+            f_times.append(time.perf_counter() - t0)
+    return [ min(f_times) for f_times in times ]
+
+def test_faster_than_json():
+    doc = snapshot_like_doc()
+    def check(backend):
+        if backend == 'json': return
+        for text in [json.dumps(doc), json.dumps(doc, indent=3)]:
+            assert json_utils.loads(text) == doc
+            codec_time, json_time = best_times(lambda: json_utils.loads(text), lambda: json.loads(text))
+            print(f"{backend}: {len(text)} chars decoded in {1000 * codec_time:.1f}ms (json: {1000 * json_time:.1f}ms)")
+            assert codec_time < json_time, f"{backend} took {codec_time:.4f}s to decode, json took {json_time:.4f}s"
+    each_backend(check)
+
+def test_decode_errors():
+    def check(backend):
+        for bad in ['{"a": ', '', b'\xff\xfe{']:
+            try:
+                json_utils.loads(bad)
+                assert False, f"{backend} decoded {bad!r}"
+            except json_utils.JSONDecodeError:
+                pass
+    each_backend(check)
+
+def test_configure():
+    try:
+        json_utils.configure('no_such_backend')
+        assert False, "configure accepted an unknown backend"
+    except ValueError:
+        pass
+
+
+test_round_trip()
+test_indent()
+test_big_ints_and_nan_fall_back_to_json()
+test_faster_than_json()
+test_decode_errors()
+test_configure()
@@ -0,0 +1,56 @@
+import concurrent.futures
+import time
+
+import quote_cache
+
+calls = []
+
+@quote_cache.cached
+def get_quote(from_token, to_token, from_amount=None, to_amount=None, dex=None, verbose=False, debug=False):
+    calls.append((from_token, to_token, from_amount, dex))
+    time.sleep(0.1)
+    return {'price': 0.01 * from_amount, 'exchanges_parts': {'Uniswap': 100}} if from_amount else {}
+
+def reset():
+    quote_cache.clear()
+    quote_cache.configure(ttl=30.0, maxsize=4096)
+    calls.clear()
+
+def test_hits_and_misses():
+    reset()
+    get_quote('ETH', 'DAI', from_amount=1.0)
+    q = get_quote('ETH', 'DAI', from_amount=1.0, verbose=True) # verbose doesn't change the key
+    get_quote('ETH', 'DAI', from_amount=2.0)
+    get_quote('ETH', 'DAI', from_amount=2.0, dex='Uniswap')
+    q['price'] = -1 # callers get copies
+    print(f"stats={quote_cache.stats()} calls={len(calls)}")
+    assert len(calls) == 3 and get_quote('ETH', 'DAI', 1.0)['price'] == 0.01
+
+def test_failed_quotes_not_cached():
+    reset()
+    get_quote('ETH', 'DAI', from_amount=0)
+    get_quote('ETH', 'DAI', from_amount=0)
+    assert len(calls) == 2
+
+def test_ttl_and_lru():
+    reset()
+    quote_cache.configure(ttl=0.2, maxsize=2)
+    for amount in [1.0, 2.0, 3.0]: get_quote('ETH', 'DAI', from_amount=amount)
+    get_quote('ETH', 'DAI', from_amount=1.0) # evicted by 3.0
+    time.sleep(0.2)
+    get_quote('ETH', 'DAI', from_amount=3.0) # expired
+    print(f"stats={quote_cache.stats()} calls={len(calls)}")
+    assert len(calls) == 5
+
+def test_coalescing():
+    reset()
+    with concurrent.futures.ThreadPoolExecutor(max_workers=8) as executor:
+        quotes = list(executor.map(lambda _: get_quote('ETH', 'MKR', from_amount=5.0), range(8)))
+    quote_cache.print_stats()
+    assert len(calls) == 1 and all(q == quotes[0] for q in quotes)
+
+
+test_hits_and_misses()
+test_failed_quotes_not_cached()
+test_ttl_and_lru()
+test_coalescing()
@@ -0,0 +1,86 @@
+import http.server
+import threading
+import time
+import types
+
+import requests
+import http_utils
+import rate_limiter
+import totle_client
+
+
+def fake_response(status_code, headers={}):
+    return types.SimpleNamespace(status_code=status_code, headers=headers)
+
+def test_token_bucket():
+    bucket = rate_limiter.TokenBucket(rate=20.0, burst=2)
+    start = time.monotonic()
+    for _ in range(6): bucket.acquire()
+    elapsed = time.monotonic() - start
+    print(f"6 requests with burst=2 at 20/sec took {elapsed:.2f} seconds (expected ~0.2)")
+    assert 0.15 < elapsed < 0.5
+
+def test_retry_after():
+    limiter = rate_limiter.HostLimiter('example.com', {'rate': 100.0, 'burst': 100})
+    responses = [fake_response(429, {'Retry-After': '0.2'}), fake_response(200)]
+    start = time.monotonic()
+    r = limiter.call(lambda: responses.pop(0))
+    print(f"429 with Retry-After: 0.2 then {r.status_code} after {time.monotonic() - start:.2f} seconds")
+    assert r.status_code == 200 and time.monotonic() - start >= 0.2
+
+def test_retries_exhausted():
+    limiter = rate_limiter.HostLimiter('example.com', {'rate': 100.0, 'burst': 100, 'backoff_base': 0.01})
+    calls = []
+    r = limiter.call(lambda: calls.append(1) or fake_response(503), max_retries=2)
+    print(f"after {len(calls)} calls returned status_code={r.status_code}")
+    assert len(calls) == 3 and r.status_code == 503
+
+def test_circuit_breaker():
+    limiter = rate_limiter.HostLimiter('example.com', {'rate': 100.0, 'burst': 100, 'backoff_base': 0.01, 'failure_threshold': 3, 'reset_timeout': 0.2})
+    limiter.call(lambda: fake_response(500), max_retries=2)
+    try:
+        limiter.call(lambda: fake_response(200))
+        assert False, "circuit should be open"
+    except requests.exceptions.RequestException as e:
+        print(f"fails fast while open: {e}")
+
+    time.sleep(0.2)
+    r = limiter.call(lambda: fake_response(200)) # half-open trial succeeds and closes the circuit
+    assert r.status_code == 200 and limiter.breaker.opened_at is None
+    print(f"circuit closed again after a successful trial request")
+
+def test_config_table():
+    for module, settings in rate_limiter.RATE_LIMITS.items():
+        for host in settings['hosts']:
+            print(f"{module:<20} {host:<40} {rate_limiter.limiter(host).settings['rate']} req/sec")
+
+def test_post_with_retries_is_the_only_retry_layer():
+    calls = []
+    class UnavailableHandler(http.server.BaseHTTPRequestHandler):
+        def do_POST(self):
+            calls.append(self.rfile.read(int(self.headers['Content-Length'])))
+            self.send_response(503)
+            self.end_headers()
+        def log_message(self, *args):
+            pass
+
+    server = http.server.HTTPServer(('127.0.0.1', 0), UnavailableHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_port}/swap"
+    rate_limiter.limiter(http_utils.host(url)).settings.update(backoff_base=0.01, failure_threshold=100)
+    try:
+        totle_client.post_with_retries(url, {'swap': {}}, num_retries=3)
+        assert False, "post_with_retries should have given up"
+    except totle_client.TotleAPIException as e:
+        print(f"{len(calls)} requests sent before: {e}")
+    finally:
+        server.shutdown()
+    assert len(calls) == 3 # not 3 x (limiter retries + 1)
+
+
+test_token_bucket()
+test_retry_after()
+test_retries_exhausted()
+test_circuit_breaker()
+test_config_table()
+test_post_with_retries_is_the_only_retry_layer()
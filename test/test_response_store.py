@@ -0,0 +1,56 @@
+import http.server
+import json
+import os
+import tempfile
+import threading
+
+import http_utils
+import response_store
+
+
+class QuoteHandler(http.server.BaseHTTPRequestHandler):
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.end_headers()
+        self.wfile.write(json.dumps({'path': self.path, 'price': 0.0042}).encode())
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers['Content-Length']))
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.end_headers()
+        self.wfile.write(json.dumps({'success': True, 'echo': json.loads(body)}).encode())
+
+    def log_message(self, *args):
+        pass
+
+def test_record_and_replay():
+    server = http.server.HTTPServer(('127.0.0.1', 0), QuoteHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_port}/quote"
+
+    response_store.configure(mode=response_store.RECORD, path=os.path.join(tempfile.mkdtemp(), 'responses.sqlite'))
+    recorded_get = http_utils.get(url, params={'fromToken': 'ETH', 'toToken': 'DAI'}).json()
+    recorded_post = http_utils.post(url, data=json.dumps({'swap': {'sourceAsset': 'ETH', 'sourceAmount': 1}}, indent=3)).json()
+    print(f"recorded {response_store.stats()}")
+
+    server.shutdown()
+    server.server_close()
+
+    response_store.configure(mode=response_store.REPLAY)
+    replayed_get = http_utils.get(url, params={'toToken': 'DAI', 'fromToken': 'ETH'}).json() # param order doesn't matter
+    replayed_post = http_utils.post(url, data=json.dumps({'swap': {'sourceAmount': 1, 'sourceAsset': 'ETH'}})).json() # neither does JSON formatting
+    print(f"replayed_get={replayed_get}\nreplayed_post={replayed_post}")
+    assert replayed_get == recorded_get and replayed_post == recorded_post
+
+    try:
+        http_utils.get(url, params={'fromToken': 'ETH', 'toToken': 'MKR'})
+        assert False, "unrecorded request should not be replayed"
+    except response_store.ResponseNotRecorded as e:
+        print(f"unrecorded request raised {e}")
+    finally:
+        response_store.configure(mode=response_store.OFF)
+
+
+test_record_and_replay()
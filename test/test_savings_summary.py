@@ -0,0 +1,31 @@
+import savings_summary
+
+def per_pair_savings():
+    return {
+        ('ETH', 'DAI'): {1.0: {'1-Inch': [0.5, -0.3, 0.0], 'Paraswap': [0.1]}, 10.0: {'1-Inch': [-1.0]}},
+        ('ETH', 'MKR'): {1.0: {'Paraswap': [0.2, 0.00001]}},
+    }
+
+def test_group_by():
+    summary = savings_summary.summarize(per_pair_savings())
+    by_agg = summary.group_by('agg')
+    print(f"by_agg={by_agg}")
+    assert by_agg['1-Inch'].n == 4 and by_agg['1-Inch'].mean == (0.5 - 0.3 + 0.0 - 1.0) / 4
+    assert (by_agg['1-Inch'].better, by_agg['1-Inch'].worse, by_agg['1-Inch'].same) == (1, 2, 1)
+    assert by_agg['1-Inch'].neg_without_fee == 2 and by_agg['Paraswap'].pos == 3
+
+    by_ts_agg = summary.nested('trade_size', 'agg', where=lambda pair, trade_size, agg: pair[1] == 'DAI')
+    assert set(by_ts_agg[1.0]) == {'1-Inch', 'Paraswap'} and by_ts_agg[10.0]['1-Inch'].mean == -1.0
+    assert summary.total().n == 7
+
+def test_summaries_see_new_samples():
+    savings = per_pair_savings()
+    summary = savings_summary.summarize(savings)
+    assert savings_summary.summarize(summary) is summary # reports can share a summary
+    savings[('ETH', 'MKR')][1.0]['Paraswap'].append(3.0)
+    assert savings_summary.summarize(savings).group_by('pair')[('ETH', 'MKR')].n == 3
+    assert summary.group_by('pair')[('ETH', 'MKR')].n == 2 # an existing summary is a snapshot
+
+
+test_group_by()
+test_summaries_see_new_samples()
@@ -0,0 +1,66 @@
+import csv
+import io
+
+import snapshot_utils
+from snapshot_fixtures import snapshot_env, zero_alloc_snapshot, plain_snapshot
+
+ZERO_ALLOC_ID, PLAIN_ID, MISSING_ID = '0x01', '0x02', '0x03'
+SNAPSHOTS = { ZERO_ALLOC_ID: zero_alloc_snapshot(ZERO_ALLOC_ID), PLAIN_ID: plain_snapshot(PLAIN_ID) }
+
+def used_splits(curve_info):
+    return [ split for swap in curve_info for trade in swap['used_route']['trades'] for split in trade['splits'] ]
+
+def test_analyze_curve_info():
+    with snapshot_env(SNAPSHOTS):
+        for id in SNAPSHOTS:
+            curve_info = snapshot_utils.fetch_and_get_curve_info(id)
+            row = snapshot_utils.analyze_curve_info(curve_info)
+            splits = used_splits(curve_info)
+            assert row['zero_alloc'] == snapshot_utils.is_zero_allocation_bug(curve_info)
+            assert row['max_allocs'] == sum(map(snapshot_utils.is_max_alloc, splits))
+            assert row['max_alloc_dexs'] == ';'.join(sorted(s['dex'] for s in splits if snapshot_utils.is_max_alloc(s)))
+            assert row['top_liquidity'] == sum(map(snapshot_utils.is_top_liquidity, splits))
+            assert (row['num_swaps'], row['num_splits']) == (len(curve_info), len(splits))
+
+        row = snapshot_utils.analyze_curve_info(snapshot_utils.fetch_and_get_curve_info(ZERO_ALLOC_ID))
+        assert row['zero_alloc'] and row['max_allocs'] == 1 and row['max_alloc_dexs'] == 'Kyber' and row['top_liquidity'] == 1
+        assert (row['used_rate'], row['better_rate'], row['best_rate']) == (200.0, 215.0, 205.0)
+        assert abs(row['better_pct'] - 7.5) < 1e-9 and abs(row['best_pct'] - 2.5) < 1e-9
+
+        row = snapshot_utils.analyze_curve_info(snapshot_utils.fetch_and_get_curve_info(PLAIN_ID))
+        assert not row['zero_alloc'] and row['better_pct'] == row['best_pct'] == 0.0
+
+def test_analyze_snapshot():
+    with snapshot_env(SNAPSHOTS):
+        row = snapshot_utils.analyze_snapshot(ZERO_ALLOC_ID, fetch=False)
+        assert list(row) == snapshot_utils.ANALYSIS_FIELDS and row['id'] == ZERO_ALLOC_ID and row['error'] is None
+        assert row['zero_alloc'] and row['max_allocs'] == 1
+
+        row = snapshot_utils.analyze_snapshot(MISSING_ID, fetch=False)
+        assert row['error'].startswith('KeyError') and row['num_swaps'] is None
+
+def test_analyze_snapshots():
+    ids = [PLAIN_ID, MISSING_ID, ZERO_ALLOC_ID]
+    with snapshot_env(SNAPSHOTS):
+        rows = list(snapshot_utils.analyze_snapshots(ids, max_workers=2, prefetch=False))
+        assert rows == [ snapshot_utils.analyze_snapshot(id, fetch=False) for id in ids ]
+        assert [ row['id'] for row in rows ] == ids and [ bool(row['error']) for row in rows ] == [False, True, False]
+
+def test_print_snapshot_analysis_csv():
+    error = 'ValueError: "bad" route, see\nnext line'
+    rows = [ dict(dict.fromkeys(snapshot_utils.ANALYSIS_FIELDS), id='0x04', error=error, better_pct=1/3) ]
+    with snapshot_env(SNAPSHOTS):
+        rows += [ snapshot_utils.analyze_snapshot(ZERO_ALLOC_ID, fetch=False) ]
+    out = io.StringIO()
+    snapshot_utils.print_snapshot_analysis_csv(rows, file=out)
+
+    header, *csv_rows = csv.reader(io.StringIO(out.getvalue()))
+    assert header == snapshot_utils.ANALYSIS_FIELDS and len(csv_rows) == 2
+    assert csv_rows[0][1] == error and csv_rows[0][header.index('better_pct')] == '0.333333' and csv_rows[0][2] == ''
+    assert csv_rows[1][header.index('max_alloc_dexs')] == 'Kyber' and csv_rows[1][header.index('zero_alloc')] == 'True'
+
+
+test_analyze_curve_info()
+test_analyze_snapshot()
+test_analyze_snapshots()
+test_print_snapshot_analysis_csv()
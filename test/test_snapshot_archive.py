@@ -0,0 +1,80 @@
+import contextlib
+import csv
+import io
+import json
+import os
+import tempfile
+import threading
+import time
+
+import snapshot_archive
+import totle_client
+
+SNAPSHOTS = { f"0x{n:064x}": {'response': {'response': {'id': f"0x{n:064x}", 'summary': []}}, 'swaps': [{'n': n}] * n} for n in range(5) }
+
+def test_put_and_get():
+    snapshot_archive.configure(archive_dir=tempfile.mkdtemp())
+    for id, j in SNAPSHOTS.items(): snapshot_archive.put(id, json.dumps(j))
+    snapshot_archive.put('0x0', '{"replaced": false}')
+    snapshot_archive.put('0x0', '{"replaced": true}')
+
+    for id, j in SNAPSHOTS.items(): assert snapshot_archive.get(id) == j
+    assert snapshot_archive.get('0x0') == {'replaced': True}
+    assert set(snapshot_archive.ids()) == set(SNAPSHOTS) | {'0x0'}
+    with snapshot_archive.open_snapshot(list(SNAPSHOTS)[3]) as f: assert json.load(f)['swaps'] == [{'n': 3}] * 3
+    print(snapshot_archive.stats())
+
+def test_import_directory_and_ids_in_csvs():
+    d = tempfile.mkdtemp()
+    snapshot_archive.configure(archive_dir=os.path.join(d, 'archive'))
+    os.makedirs(os.path.join(d, 'snap_data'))
+    for id, j in SNAPSHOTS.items():
+        with open(os.path.join(d, 'snap_data', id), 'w') as f: json.dump(j, f, indent=3)
+    assert snapshot_archive.import_directory(os.path.join(d, 'snap_data')) == len(SNAPSHOTS)
+    assert snapshot_archive.import_directory(os.path.join(d, 'snap_data')) == 0
+    assert snapshot_archive.get(list(SNAPSHOTS)[2]) == list(SNAPSHOTS.values())[2]
+
+    csv_file = os.path.join(d, 'totle_vs_agg.csv')
+    with open(csv_file, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['time', 'id', 'action'])
+        writer.writerows([['t', id, 'buy'] for id in SNAPSHOTS] + [['t', '', 'buy']])
+    assert snapshot_archive.ids_in_csvs([csv_file]) == set(SNAPSHOTS)
+    assert snapshot_archive.prefetch(snapshot_archive.ids_in_csvs([csv_file])) == {} # all archived, nothing to fetch
+
+def test_prefetch_fetches_in_parallel_and_reports_failures():
+    snapshot_archive.configure(archive_dir=tempfile.mkdtemp())
+    ids = [ f"0x{n:064x}" for n in range(20) ]
+    failing_ids = set(ids[3::5])
+    snapshot_archive.put(ids[0], json.dumps({'archived': True}))
+
+    lock, running, max_running, fetched = threading.Lock(), [0], [0], []
+    def get_snapshot(id):
+        with lock:
+            running[0] += 1
+            max_running[0] = max(max_running[0], running[0])
+            fetched.append(id)
+        time.sleep(0.02)
+        with lock: running[0] -= 1
+        if id in failing_ids: raise ConnectionError(f"no snapshot for {id}")
+        return {'id': id}
+
+    get_snapshot_was, totle_client.get_snapshot = totle_client.get_snapshot, get_snapshot
+    try:
+        stderr = io.StringIO()
+        with contextlib.redirect_stderr(stderr):
+            failures = snapshot_archive.prefetch(ids, max_workers=4)
+    finally:
+        totle_client.get_snapshot = get_snapshot_was
+
+    assert sorted(fetched) == ids[1:] # archived snapshots aren't fetched again
+    assert 1 < max_running[0] <= 4, max_running[0]
+    assert set(failures) == failing_ids and all(isinstance(e, ConnectionError) for e in failures.values())
+    assert all(f"FAILED to fetch snapshot {id}: no snapshot for {id}" in stderr.getvalue() for id in failing_ids)
+    assert set(snapshot_archive.ids()) == set(ids) - failing_ids
+    assert snapshot_archive.get(ids[1]) == {'id': ids[1]} and snapshot_archive.get(ids[0]) == {'archived': True}
+
+
+test_put_and_get()
+test_import_directory_and_ids_in_csvs()
+test_prefetch_fetches_in_parallel_and_reports_failures()
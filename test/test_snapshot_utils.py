@@ -1,7 +1,9 @@
 import glob
+import io
 import json
 
 import snapshot_utils
+from snapshot_fixtures import snapshot_env, snapshot, zero_alloc_snapshot, plain_snapshot, route, USED_ROUTE, BETTER_ROUTE, BEST_ROUTE, UNISWAP_POINTS
 
 
 def test_fetch_and_print_curve_info(id):
@@ -10,6 +12,27 @@ def test_fetch_and_print_curve_info(id):
     ci = snapshot_utils.get_curve_info(j)
     snapshot_utils.print_curve_info(ci, pct_inc=2)
 
+def test_stream_and_json_curve_info_are_the_same():
+    # routes before the swap's own fields, a route that ties the better route's rate, and fields that are skipped
+    tied_route = route(10, 215, [('Uniswap', 100, 215, UNISWAP_POINTS)])
+    routes_first = zero_alloc_snapshot('0x03')
+    routes_first['swaps'] = [ dict(routes=swap['routes'] + [tied_route], extra={'nested': [1, {'a': None}]}, **{ k: v for k, v in swap.items() if k != 'routes' })
+                              for swap in routes_first['swaps'] ]
+    routes_first['response']['response']['summary'][0]['rate'] = '215' # the tied route is its best route
+    two_swaps = snapshot('0x04', 10, 200, [USED_ROUTE, BETTER_ROUTE, BEST_ROUTE], summary_rate=205)
+    two_swaps['swaps'].append(dict(two_swaps['swaps'][0], rate='205'))
+
+    with snapshot_env():
+        for j in (zero_alloc_snapshot('0x01'), plain_snapshot('0x02'), routes_first, two_swaps):
+            expected = snapshot_utils.get_curve_info(j)
+            for indent in (None, 3):
+                assert snapshot_utils.get_curve_info_from_stream(io.StringIO(json.dumps(j, indent=indent))) == expected, (j['response']['response']['id'], indent)
+
+        # the better route wins rate ties, the best route needs enough liquidity and the used route has the swap's rate
+        swaps_routes = [ (swap, swap['routes']) for swap in routes_first['swaps'] + two_swaps['swaps'] ]
+        selected = [ (better, used, best) for _, better, used, best in snapshot_utils.select_routes_by_swap(swaps_routes) ]
+        assert selected == [(BETTER_ROUTE, USED_ROUTE, tied_route), (BETTER_ROUTE, USED_ROUTE, BEST_ROUTE), (BETTER_ROUTE, BEST_ROUTE, BEST_ROUTE)]
+
 
 #######################################################################################################################
 
@@ -67,10 +90,11 @@ def test_fetch_and_print_curve_info(id):
 # Totle's price is 1298.89% higher than Paraswap's. Totle rate=11.0368 Paraswap: rate=154.393
 # test_fetch_and_print_curve_info('0xd9919152a010406dba827f92bd15b2bb62779acef0c54c88b4c360ef23730641')
 
-# all_snapshots = tuple(glob.glob(f'{snapshot_utils.SNAP_DATA_DIRECTORY}/*'))
+# all_snapshots = tuple(snapshot_utils.snapshot_archive.ids())
 # for snap_id in all_snapshots:
 #     j = snapshot_utils.fetch_snapshot(snap_id)
 #     ci = snapshot_utils.get_curve_info(j)
 
+test_stream_and_json_curve_info_are_the_same()
 test_fetch_and_print_curve_info('0xf049b3b8577c4da1ad68ca9bffcd07f72d50c979117f470a8b54254ca94c344f')
 
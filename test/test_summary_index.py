@@ -0,0 +1,66 @@
+import contextlib
+import io
+import os
+import tempfile
+
+import summary_index
+
+@contextlib.contextmanager
+def temp_index():
+    """Enables the summary index in a new temporary file for the duration of the block"""
+    enabled, path = summary_index.ENABLED, summary_index.PATH
+    summary_index.configure(enabled=True, path=os.path.join(tempfile.mkdtemp(), 'summary_index.sqlite'))
+    try:
+        yield
+    finally:
+        summary_index.configure(enabled=enabled, path=path)
+
+def write_files(n):
+    d = tempfile.mkdtemp()
+    files = [os.path.join(d, f"{i}.txt") for i in range(n)]
+    for i, file in enumerate(files):
+        with open(file, 'w') as f: f.write(f"{i}\n")
+    return files
+
+def test_only_new_or_changed_files_are_parsed():
+    parsed = []
+    def parse_file(file):
+        parsed.append(file)
+        with open(file) as f:
+            return {'DAI': {1.0: {'Uniswap': [float(line) for line in f]}}}
+
+    with temp_index():
+        files = write_files(3)
+        kind = summary_index.index_kind('test', only_splits=False)
+        merged = lambda: [ summary_index.file_partial(kind, file, parse_file)['DAI'][1.0]['Uniswap'][0] for file in files ]
+        assert merged() == [0.0, 1.0, 2.0] and len(parsed) == 3
+        assert merged() == [0.0, 1.0, 2.0] and len(parsed) == 3
+
+        with open(files[1], 'a') as f: f.write("5\n")
+        assert merged() == [0.0, 1.0, 2.0] and len(parsed) == 4
+        print(f"parsed {len(parsed)} times, stats={summary_index.stats()}")
+
+def test_output_is_replayed_on_hits():
+    def parse_file(file):
+        print(f"reading {os.path.basename(file)} ...")
+        return {}
+
+    with temp_index():
+        file, = write_files(1)
+        kind = summary_index.index_kind('test_output')
+        for _ in range(2):
+            with contextlib.redirect_stdout(io.StringIO()) as out:
+                summary_index.file_partial(kind, file, parse_file)
+            assert out.getvalue() == "reading 0.txt ...\n", out.getvalue()
+
+def test_merge_samples():
+    from collections import defaultdict
+    total = defaultdict(lambda: defaultdict(lambda: defaultdict(list)))
+    summary_index.merge_samples(total, {'DAI': {1.0: {'Uniswap': [1, 2]}}})
+    summary_index.merge_samples(total, {'DAI': {1.0: {'Uniswap': [3], 'Kyber': [4]}}})
+    assert total['DAI'][1.0] == {'Uniswap': [1, 2, 3], 'Kyber': [4]}
+
+
+test_only_new_or_changed_files_are_parsed()
+test_output_is_replayed_on_hits()
+test_merge_samples()
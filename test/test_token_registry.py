@@ -0,0 +1,39 @@
+import concurrent.futures
+import time
+
+import token_utils
+from token_fixtures import TOKENS_JSON, saved_registry
+
+def test_lookups_from_saved_registry():
+    with saved_registry(): # no network calls are made, since the registry is loaded from disk
+        assert token_utils.tokens() == {'ETH': TOKENS_JSON[0]['address'], 'USDC': TOKENS_JSON[1]['address']}
+        assert token_utils.addr('usdc') == TOKENS_JSON[1]['address']
+        assert token_utils.tokens_by_addr()[TOKENS_JSON[1]['address']] == 'USDC'
+        assert token_utils.int_amount(1.5, 'USDC') == 1500000
+        assert token_utils.real_amount(1500000, 'usdc') == 1.5
+        assert token_utils.ten_to_the_decimals('OLD') == 10**8
+        assert token_utils.canonical_symbol('eth') == 'ETH' and token_utils.canonical_symbol('OLD') is None
+        assert token_utils.tokens_json() == TOKENS_JSON
+
+def test_concurrent_lookups():
+    with saved_registry():
+        with concurrent.futures.ThreadPoolExecutor(max_workers=8) as executor:
+            amounts = list(executor.map(lambda i: token_utils.real_amount(i * 10**6, 'USDC'), range(1000)))
+    assert amounts == [ float(i) for i in range(1000) ]
+
+def test_stale_registry_is_refreshed_in_background():
+    fetch = token_utils.TokenRegistry.fetch
+    token_utils.TokenRegistry.fetch = classmethod(lambda cls: cls(TOKENS_JSON[:2]))
+    try:
+        with saved_registry(created_at=time.time() - token_utils.REGISTRY_MAX_AGE - 1) as registry_path:
+            assert token_utils.ten_to_the_decimals('OLD') == 10**8 # the saved registry is used while refreshing
+            token_utils._refresh_thread.join()
+            assert 'OLD' not in token_utils.token_decimals()
+            assert token_utils.TokenRegistry.load(registry_path).tokens_json == TOKENS_JSON[:2]
+    finally:
+        token_utils.TokenRegistry.fetch = fetch
+
+
+test_lookups_from_saved_registry()
+test_concurrent_lookups()
+test_stale_registry_is_refreshed_in_background()
@@ -0,0 +1,78 @@
+import contextlib
+
+import totle_client
+from token_fixtures import TOKENS_JSON, saved_registry
+
+DECIMALS = { t['symbol']: t['decimals'] for t in TOKENS_JSON }
+USDC_PER_ETH = { 1: 400, 2: 399, 5: 395 } # price gets worse with trade size
+
+@contextlib.contextmanager
+def fake_swap_endpoint(fillable, fail_multi_swap_requests=False):
+    """Answers Totle swap requests with a FakeSwapEndpoint using the test tokens (and no quote caching) in the block"""
+    post_with_retries = totle_client.post_with_retries
+    totle_client.post_with_retries = FakeSwapEndpoint(fillable, fail_multi_swap_requests)
+    try:
+        with saved_registry(quote_ttl=0):
+            yield totle_client.post_with_retries
+    finally:
+        totle_client.post_with_retries = post_with_retries
+
+def summary(eth_amount, dexs=('Uniswap', 'Kyber')):
+    """Returns a summary for a swap of eth_amount ETH to USDC split evenly across dexs"""
+    src, dest = eth_amount * 10**DECIMALS['ETH'], eth_amount * USDC_PER_ETH[eth_amount] * 10**DECIMALS['USDC']
+    asset = lambda symbol: {'symbol': symbol, 'decimals': str(DECIMALS[symbol])}
+    orders = [ {'sourceAsset': asset('ETH'), 'destinationAsset': asset('USDC'), 'sourceAmount': str(src // len(dexs)),
+                'destinationAmount': str(dest // len(dexs)), 'exchange': {'name': dex}, 'splitPercentage': str(100 / len(dexs))} for dex in dexs ]
+    return {'sourceAsset': asset('ETH'), 'destinationAsset': asset('USDC'), 'sourceAmount': str(src),
+            'destinationAmount': str(dest), 'trades': [{'orders': orders}]}
+
+class FakeSwapEndpoint:
+    """Stands in for post_with_retries, answering from fillable {eth_amount: summary}"""
+    def __init__(self, fillable, fail_multi_swap_requests=False):
+        self.fillable, self.fail_multi_swap_requests, self.requests = fillable, fail_multi_swap_requests, []
+
+    def __call__(self, endpoint, inputs, num_retries=3, debug=False, timer=False):
+        self.requests.append(inputs)
+        swaps = inputs.get('swaps') or [inputs['swap']]
+        eth_amounts = [ int(s['sourceAmount']) // 10**DECIMALS['ETH'] for s in swaps ]
+        if 'swaps' in inputs and self.fail_multi_swap_requests:
+            return {'success': False, 'response': {'name': 'ServerError', 'code': 5000, 'message': 'Internal error'}}
+        if 'swap' in inputs and eth_amounts[0] not in self.fillable:
+            return {'success': False, 'response': {'name': 'NotEnoughOrders', 'code': 2100, 'message': "We couldn't find enough orders to fill your request for "}}
+        summaries = [ self.fillable[a] for a in reversed(eth_amounts) if a in self.fillable ] # order shouldn't matter
+        return {'success': True, 'response': {'id': f"id{len(self.requests)}", 'summary': summaries}}
+
+def test_multi_swap_request():
+    with fake_swap_endpoint({1: summary(1), 2: summary(2, dexs=['Uniswap'])}) as fake:
+        quotes = totle_client.get_quotes([('ETH', 'USDC', 5, None), ('ETH', 'USDC', 1, None), ('ETH', 'USDC', 2, None)])
+
+    assert len(fake.requests) == 1 and len(fake.requests[0]['swaps']) == 3
+    assert all(s['isOptional'] for s in fake.requests[0]['swaps'])
+    assert quotes[0] == {} # 5 ETH could not be filled, but the others still got quotes
+    assert quotes[1]['source_amount'] == 1 and quotes[1]['price'] == 1 / 400
+    assert quotes[1]['exchanges_parts'] == {'Uniswap': 50.0, 'Kyber': 50.0}
+    assert quotes[2]['source_amount'] == 2 and quotes[2]['price'] == 1 / 399
+    assert quotes[2]['exchanges_parts'] == {'Uniswap': 100.0}
+
+def test_requests_are_split_at_max_swaps():
+    max_swaps, totle_client.MAX_SWAPS_PER_REQUEST = totle_client.MAX_SWAPS_PER_REQUEST, 2
+    try:
+        with fake_swap_endpoint({1: summary(1), 2: summary(2)}) as fake:
+            sds = totle_client.try_swaps(totle_client.name(), [('ETH', 'USDC', {'fromAmount': a}) for a in [1, 2, 1, 5]], verbose=False)
+    finally:
+        totle_client.MAX_SWAPS_PER_REQUEST = max_swaps
+
+    assert [ len(r['swaps']) for r in fake.requests ] == [2, 2]
+    assert [ sd.get('tradeSize') for sd in sds ] == [1, 2, 1, None]
+
+def test_failed_request_falls_back_to_single_swaps():
+    with fake_swap_endpoint({1: summary(1), 2: summary(2)}, fail_multi_swap_requests=True) as fake:
+        quotes = totle_client.get_quotes([('ETH', 'USDC', 1, None), ('ETH', 'USDC', 2, None), ('ETH', 'USDC', 5, None)])
+
+    assert len(fake.requests) == 4 and [ 'swap' in r for r in fake.requests ] == [False, True, True, True]
+    assert [ q.get('price') for q in quotes ] == [1 / 400, 1 / 399, None]
+
+
+test_multi_swap_request()
+test_requests_are_split_at_max_swaps()
+test_failed_request_falls_back_to_single_swaps()
@@ -1,4 +1,6 @@
 import json
+import os
+import tempfile
 
 import v2_compare_prices
 
@@ -6,6 +8,35 @@ def test_csv_writer():
     with v2_compare_prices.SavingsCSV('foobar', fieldnames="foo bar".split()) as csv_writer:
         csv_writer.append({'foo':1, 'bar':2})
 
+def test_parquet_writer():
+    fieldnames = "time id trade_size token exchange pct_savings splits totle_splits agg_split ex_prices".split()
+    savings_rows = [
+        v2_compare_prices.savings_data('buy', 10.0, 'BAT', '1-Inch', 1.5, ['Uniswap'], 0.004, 0.0041, splits={'Uniswap': 60, 'Kyber': 40},
+                                       totle_splits=[{'Uniswap': 100}, {'BAT/DAI': {'Kyber': 90, 'Uniswap': 10}}], ex_prices={'Uniswap': 0.0041}),
+        # a single route list, an empty route, fractional and whole float pcts and a multi-split without routes
+        v2_compare_prices.savings_data('buy', 5.0, 'DAI', 'Paraswap', -0.5, ['Kyber'], 0.004, 0.0041, splits=[{'Kyber': 100}],
+                                       totle_splits=[{}, {'Uniswap': 12.5, 'Kyber': 87.5}, {'Uniswap': 50.0, 'Kyber': 50}], ex_prices={}),
+        v2_compare_prices.savings_data('sell', 1.0, 'MKR', 'DEX.AG', 0.1, ['Oasis'], 0.3, 0.31, splits={'MKR/DAI': {'Oasis': 100}, 'DAI/ETH': {}}, totle_splits={}),
+    ]
+    savings_rows[0]['agg_split'] = [] # no routes at all, which is not the same as empty splits ({})
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        filename = os.path.join(tmp_dir, 'savings')
+        with v2_compare_prices.savings_writer(filename, fieldnames=fieldnames, output_format='parquet') as writer:
+            writer.writerows(savings_rows)
+        rows = list(v2_compare_prices.read_savings_parquet(filename + '.parquet'))
+
+    assert len(rows) == len(savings_rows)
+    for row, savings in zip(rows, savings_rows):
+        print(row)
+        for f in ['splits', 'totle_splits', 'agg_split']:
+            assert row[f] == savings.get(f) and type(row[f]) == type(savings.get(f)), f"{f}: {row[f]} != {savings.get(f)}"
+        assert row['trade_size'] == savings['trade_size'] and row['token'] == savings['token']
+    assert [ type(pct) for pct in rows[0]['splits'].values() ] == [int, int] # not turned into floats
+    assert rows[0]['agg_split'] == [] and rows[2]['totle_splits'] == {} and rows[0]['ex_prices'] == {'Uniswap': 0.0041}
+    assert type(rows[1]['totle_splits'][1]['Uniswap']) == float and type(rows[1]['splits'][0]['Kyber']) == int
+    assert [ type(pct) for pct in rows[1]['totle_splits'][2].values() ] == [float, int] # 50.0 is not read back as 50
+
 def test_print_average_savings_by_dex():
     avg_savings = {
         'BAT' : {
@@ -33,5 +64,6 @@ def test_best_price_with_fees():
         print(f"trade_size={trade_size} price={price}")
 
 # test_csv_writer()
+test_parquet_writer()
 # test_print_average_savings_by_dex
 test_best_price_with_fees()
\ No newline at end of file
@@ -0,0 +1,30 @@
+import contextlib
+import os
+import tempfile
+
+import quote_cache
+import token_utils
+
+# Shared by the tests that need tokens without calling the Totle API
+
+TOKENS_JSON = [
+    {'symbol': 'ETH', 'address': '0x0000000000000000000000000000000000000000', 'decimals': 18, 'tradable': True},
+    {'symbol': 'USDC', 'address': '0xa0b86991c6218b36c1d19d4a2e9eb0ce3606eb48', 'decimals': 6, 'tradable': True},
+    {'symbol': 'OLD', 'address': '0x1111111111111111111111111111111111111111', 'decimals': 8, 'tradable': False},
+]
+
+@contextlib.contextmanager
+def saved_registry(tokens_json=TOKENS_JSON, created_at=None, quote_ttl=None):
+    """Makes token_utils use a registry of tokens_json saved in a temporary file (and quote_cache use quote_ttl, if
+    given) for the duration of the block, restoring the previous registry and TTL afterwards"""
+    registry_path, registry, ttl = token_utils.REGISTRY_PATH, token_utils._registry, quote_cache.TTL
+    token_utils.REGISTRY_PATH = os.path.join(tempfile.mkdtemp(), 'token_registry.json')
+    token_utils.TokenRegistry(tokens_json, created_at=created_at).save(token_utils.REGISTRY_PATH)
+    token_utils._registry = None
+    if quote_ttl is not None: quote_cache.configure(ttl=quote_ttl)
+    try:
+        yield token_utils.REGISTRY_PATH
+    finally:
+        if token_utils._refresh_thread: token_utils._refresh_thread.join()
+        token_utils.REGISTRY_PATH, token_utils._registry = registry_path, registry
+        quote_cache.configure(ttl=ttl)
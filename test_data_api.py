@@ -48,24 +48,25 @@ def print_summary(base, quote, buys, sells):
 PAGE_SIZE = 200
 NUM_PAGES = 5
 
-try:
-    for base, quote in totle_client.get_trades_pairs():
-        print(f"Doing {base}/{quote} ...")
-        buys, sells, page_num = [], [], 0
-        while page_num < NUM_PAGES:
-            trades = totle_client.get_trades(base, quote, limit=PAGE_SIZE, page=page_num)
-            buys += [t for t in trades if t['side'] == 'buy']
-            sells += [t for t in trades if t['side'] == 'sell']
-            page_num += 1
-
-        print_summary(base, quote, buys, sells)
-        # print_trades(buys, limit=20)
-        # print_trades(sells, limit=20)
-
-except totle_client.TotleAPIException as e:
-    print(f"{type(e)} {e}")
-    for a in e.args: print(a)
-    # TODO: perhaps don't bail on {'message': 'Endpoint request timed out'}
-
-    
-
+def main():
+    try:
+        for base, quote in totle_client.get_trades_pairs():
+            print(f"Doing {base}/{quote} ...")
+            buys, sells, page_num = [], [], 0
+            while page_num < NUM_PAGES:
+                trades = totle_client.get_trades(base, quote, limit=PAGE_SIZE, page=page_num)
+                buys += [t for t in trades if t['side'] == 'buy']
+                sells += [t for t in trades if t['side'] == 'sell']
+                page_num += 1
+
+            print_summary(base, quote, buys, sells)
+            # print_trades(buys, limit=20)
+            # print_trades(sells, limit=20)
+
+    except totle_client.TotleAPIException as e:
+        print(f"{type(e)} {e}")
+        for a in e.args: print(a)
+        # TODO: perhaps don't bail on {'message': 'Endpoint request timed out'}
+
+if __name__ == "__main__":
+    main()
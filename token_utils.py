@@ -1,6 +1,10 @@
 import functools
+import os
 import threading
-import requests
+import time
+
+import http_utils
+import json_utils
 
 import oneinch_client
 ADDRESSES_TO_FILTER_OUT = [
@@ -38,57 +42,143 @@ LOW_VOLUME_TOKENS = ['CVC', 'DATA', 'TUSD', 'SNT', 'GNO']
 @functools.lru_cache(1)
 def select_tokens():
     """Returns the best tokens listed in Totle's data/pairs API endpoint"""
-    r = requests.get('https://api.totle.com/data/pairs').json()
+    r = json_utils.loads(http_utils.get('https://api.totle.com/data/pairs').content)
     if r['success']:
         return [ base for base, quote in r['response'] if quote == 'ETH' and base not in LOW_VOLUME_TOKENS ] # filters out DAI pairs and low-volume tokens
     else:
         raise ValueError(f"{r['name']} ({r['code']}): {r['message']}")
 
+##############################################################################################
+#
+# Token registry
+#
+# All of the token lookups above go through one immutable TokenRegistry, built from the tokens
+# json with an index for each lookup. Threads read the current registry without locking; a
+# refresh builds a new registry and swaps it in with a single assignment. The registry is saved
+# to REGISTRY_PATH, so new processes load it from disk instead of the network, and a saved
+# registry older than REGISTRY_MAX_AGE seconds is refreshed in a background thread.
+
+REGISTRY_PATH = os.environ.get('TOKEN_REGISTRY_PATH', f"{os.path.dirname(os.path.abspath(__file__))}/data/token_registry.json")
+REGISTRY_MAX_AGE = float(os.environ.get('TOKEN_REGISTRY_MAX_AGE', 24 * 60 * 60))
+
+class TokenRegistry:
+    """Indexes of a tokens json by symbol, address and decimals. Registries are never modified once built"""
+    def __init__(self, tokens_json, created_at=None):
+        self.tokens_json = tokens_json
+        self.created_at = created_at or time.time()
+        self.tokens = { t['symbol']: t['address'] for t in tokens_json if t.get('tradable') }
+        self.tradable_tokens = self.tokens
+        self.tokens_by_addr = { addr: sym for sym, addr in self.tokens.items() }
+        self.token_decimals = { t['symbol']: t['decimals'] for t in tokens_json }
+        self.ten_to_the_decimals = { sym: 10 ** decimals for sym, decimals in self.token_decimals.items() }
+
+    @classmethod
+    def fetch(cls):
+        return cls(fetch_tokens_json())
+
+    @classmethod
+    def load(cls, filename):
+        with open(filename) as f:
+            j = json_utils.load(f)
+        return cls(j['tokens'], created_at=j['created_at'])
+
+    def save(self, filename):
+        """Writes this registry to filename atomically, so other processes never load a partial file"""
+        os.makedirs(os.path.dirname(filename) or '.', exist_ok=True)
+        tmp_filename = f"{filename}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_filename, 'w') as f:
+            json_utils.dump({'created_at': self.created_at, 'tokens': self.tokens_json}, f)
+        os.replace(tmp_filename, filename)
+
+    def age(self):
+        return time.time() - self.created_at
+
+
+_registry = None
+_registry_lock = threading.Lock() # only taken to build the first registry and by refresh(), never for lookups
+_refresh_thread = None
+
+def registry():
+    """Returns the current TokenRegistry, loading it (from REGISTRY_PATH if saved, else the network) on first use"""
+    r = _registry
+    if r is None:
+        with _registry_lock:
+            r = _registry or load_registry()
+    return r
+
+def load_registry():
+    """Loads the saved registry, or fetches and saves one if there is none. Must be called with _registry_lock held"""
+    global _registry
+    try:
+        _registry = TokenRegistry.load(REGISTRY_PATH)
+        if _registry.age() > REGISTRY_MAX_AGE: refresh_in_background()
+    except (OSError, ValueError, KeyError):
+        _registry = TokenRegistry.fetch()
+        _registry.save(REGISTRY_PATH)
+    return _registry
+
+def refresh():
+    """Fetches the tokens json, saves it, and swaps in a new registry built from it"""
+    global _registry
+    totle_tokens_json.cache_clear()
+    new_registry = TokenRegistry.fetch()
+    with _registry_lock:
+        new_registry.save(REGISTRY_PATH)
+        _registry = new_registry
+    return new_registry
+
+def refresh_in_background():
+    """Starts a refresh() in a daemon thread (unless one is running). Lookups use the current registry meanwhile"""
+    global _refresh_thread
+    if _refresh_thread and _refresh_thread.is_alive(): return
+    _refresh_thread = threading.Thread(target=refresh_quietly, name='token_registry_refresh', daemon=True)
+    _refresh_thread.start()
+
+def refresh_quietly():
+    try:
+        refresh()
+    except Exception as e:
+        print(f"token_utils: could not refresh the token registry, using the one from {REGISTRY_PATH} ({e})")
+
+
 # get tokens
-@functools.lru_cache(1)
 def tokens():
-    return { t['symbol']: t['address'] for t in tokens_json() if t['tradable'] }
+    return registry().tokens
 
-@functools.lru_cache(1)
 def tradable_tokens():
-    return { t['symbol']: t['address'] for t in tokens_json() if t.get('tradable') }
+    return registry().tradable_tokens
 
-@functools.lru_cache(1)
 def tokens_by_addr():
-    return { addr: sym for sym, addr in tokens().items() }
+    return registry().tokens_by_addr
 
-@functools.lru_cache(1)
 def token_decimals():
-    return { t['symbol']: t['decimals'] for t in tokens_json() }
+    return registry().token_decimals
 
 def ten_to_the_decimals(token):
-    return 10 ** token_decimals()[token]
+    return registry().ten_to_the_decimals[token]
 
-tokens_json_lock = threading.Lock()
 def tokens_json(use_oneinch_tokens=False):
-    tokens_json_lock.acquire()
-    j =  tokens_json_critical(use_oneinch_tokens)
-    tokens_json_lock.release()
-    return j
-
-@functools.lru_cache(1)
-def tokens_json_critical(use_oneinch_tokens=False):
     """Returns the tokens json from Totle and optionally 1-Inch"""
-    # get Totle tokens
+    return combined_tokens_json() if use_oneinch_tokens else registry().tokens_json
+
+def fetch_tokens_json():
+    """Returns the tokens json from Totle"""
     totle_tokens = totle_tokens_json()
     for t in totle_tokens: t['address'] = t['address'].lower()
-    totle_tokens = [ t for t in totle_tokens if t['address'] not in ADDRESSES_TO_FILTER_OUT ]
+    return [ t for t in totle_tokens if t['address'] not in ADDRESSES_TO_FILTER_OUT ]
 
+@functools.lru_cache(1)
+def combined_tokens_json():
+    """Returns the tokens json from Totle and 1-Inch"""
     # 1-Inch has severe rate limiting without an API key, causing API calls to return 'Forbidden'
-    if not use_oneinch_tokens: return totle_tokens
-
     # get 1-inch tokens
     oneinch_tokens = oneinch_tokens_json()
     for t in oneinch_tokens: t['address'] = t['address'].lower()
     oneinch_tokens = [ t for t in oneinch_tokens if t['address'] not in ADDRESSES_TO_FILTER_OUT ]
 
     # Combine Totle's and 1-Inch's info
-    r, syms, addrs = totle_tokens, [ t['symbol'] for t in totle_tokens ], [ t['address'] for t in totle_tokens ]
+    totle_tokens = registry().tokens_json
+    r, syms, addrs = list(totle_tokens), { t['symbol'] for t in totle_tokens }, { t['address'] for t in totle_tokens }
     for t in oneinch_tokens:
         if not (t['symbol'] in syms or t['address'] in addrs):
             r.append(t) # Totle's info takes precendence
@@ -97,8 +187,8 @@ def tokens_json_critical(use_oneinch_tokens=False):
 @functools.lru_cache(2)
 def totle_tokens_json(canonical_symbols=True):
     # totle_client imports token_utils so we avoid a circular dependency by not using TOKENS_ENDPOINT
-    # j = requests.get(totle_client.TOKENS_ENDPOINT).json()
-    j = requests.get('https://api.totle.com/tokens').json()
+    # j = json_utils.loads(http_utils.get(totle_client.TOKENS_ENDPOINT).content)
+    j = json_utils.loads(http_utils.get('https://api.totle.com/tokens').content)
     tokens = j['tokens']
     if canonical_symbols:
         for t in tokens: t['symbol'] = canonize(t['symbol'])
@@ -106,7 +196,7 @@ def totle_tokens_json(canonical_symbols=True):
 
 @functools.lru_cache(2)
 def oneinch_tokens_json(canonical_symbols=True):
-    j = requests.get(oneinch_client.TOKENS_ENDPOINT).json()
+    j = json_utils.loads(http_utils.get(oneinch_client.TOKENS_ENDPOINT).content)
     tokens = list(j.values())
     if canonical_symbols:
         for t in tokens: t['symbol'] = canonize(t['symbol'])
@@ -5,7 +5,6 @@ import os
 ########################################################################################################################
 # read in data
 DATA_DIR = f"{os.path.dirname(os.path.abspath(__file__))}/data"
-print(f"DATA_DIR={DATA_DIR}")
 
 VALID_DAY_VOLUMES = [30,90]
 DAY_VOLUME = VALID_DAY_VOLUMES[-1] # currently tells which CSV to query, eventually can be used with dex.watch API for arbitary period
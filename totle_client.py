@@ -1,11 +1,13 @@
 import sys
 import time
 import functools
-import json
 import traceback
 from collections import defaultdict
 
-import requests
+import http_utils
+import json_utils
+import quote_cache
+import rate_limiter
 import token_utils
 
 ##############################################################################################
@@ -29,7 +31,7 @@ DATA_EXCHANGES_ENDPOINT = DATA_ENDPOINT + '/exchanges'
 
 # pretty print function
 def pp(data):
-    return json.dumps(data, indent=3)
+    return json_utils.dumps(data, indent=3)
 
 # custom exception type
 class TotleAPIException(Exception):
@@ -62,7 +64,9 @@ def name():
 def exchanges():
     return { e['name']: e['id'] for e in exchanges_json() }
 
+@functools.lru_cache(1)
 def exchanges_by_id():
+    """Returns the names of Totle's and the data API's exchanges by id (Totle's names take precedence). Don't modify it"""
     return { **data_exchanges_by_id(), **{ v:k for k,v in exchanges().items() } }
 
 def enabled_exchanges():
@@ -71,20 +75,21 @@ def enabled_exchanges():
 @functools.lru_cache(1)
 def exchanges_json():
     print(f"EXCHANGES_ENDPOINT={EXCHANGES_ENDPOINT}")
-    r = requests.get(EXCHANGES_ENDPOINT).json()
+    r = json_utils.loads(http_utils.get(EXCHANGES_ENDPOINT).content)
     return r['exchanges']
 
+@functools.lru_cache(1)
 def data_exchanges_by_id():
     return { v:k for k,v in data_exchanges().items() }
 
 @functools.lru_cache(1)
 def data_exchanges():
-    r = requests.get(DATA_EXCHANGES_ENDPOINT).json()
+    r = json_utils.loads(http_utils.get(DATA_EXCHANGES_ENDPOINT).content)
     return { e['name']: e['id'] for e in r['exchanges'] }
 
 def get_snapshot(response_id):
     print(f"get_snapshot fetching: https://totle-api-snapshot.s3.amazonaws.com/{response_id}")
-    return requests.get(f"https://totle-api-snapshot.s3.amazonaws.com/{response_id}").json()
+    return json_utils.loads(http_utils.get(f"https://totle-api-snapshot.s3.amazonaws.com/{response_id}").content)
 
 
 ##############################################################################################
@@ -356,23 +361,33 @@ def swap_data(response, is_totle, request={}):
 def post_with_retries(endpoint, inputs, num_retries=3, debug=False, timer=False):
     if debug: print(f"REQUEST to {endpoint}:\n{pp(inputs)}\n\n")
 
+    # http_utils is told not to retry, so this loop is the only one retrying throttled, 5xx, and dropped requests as well
+    # as responses that aren't JSON, and a failing request is sent at most num_retries times
+    limiter = rate_limiter.limiter(http_utils.host(endpoint))
     timer_start = time.time()
     for attempt in range(num_retries):
+        r = None
         try:
             # for production inputs has to be converted to a string input to work
-            r = requests.post(endpoint, data=json.dumps(inputs))
-            j = r.json()
+            r = http_utils.post(endpoint, data=json_utils.dumps(inputs), max_retries=0)
+            j = json_utils.loads(r.content)
 
             timer_end = time.time()
             if timer: print(f"call to {endpoint} {pp(inputs)} took {timer_end - timer_start:.1f} seconds")
             if debug: print(f"RESPONSE from {endpoint}:\n{pp(j)}\n\n")
             return j
+        except rate_limiter.CircuitOpenError:
+            raise TotleAPIException(f"Not calling {endpoint}: too many consecutive failures", inputs, {})
         except Exception as e:
             print(f"failed to extract JSON: {e} \nretrying ...")
-            time.sleep(1)
+            # the limiter has already counted dropped requests and error statuses toward opening the circuit
+            if r is not None and r.status_code not in limiter.settings['retry_statuses']: limiter.record_failure()
+            if attempt == num_retries - 1: break
+            delay = (rate_limiter.retry_after(r) if r is not None else None) or limiter.backoff(attempt)
+            # throttling applies to everyone calling this host, not just this thread
+            if r is not None and r.status_code in (403, 429): limiter.bucket.pause(delay)
+            time.sleep(delay)
 
-    # all attempts failed
-    time.sleep(60)  # wait for servers to reboot, as we've probably killed them all
     raise TotleAPIException(f"Failed to extract JSON response after {num_retries} retries.", inputs, {})
 
 
@@ -462,8 +477,10 @@ def handle_swap_exception(e, dex, from_token, to_token, params, verbose=True):
         if has_args1: print(f"FAILED REQUEST:\n{pp(e.args[1])}\n")
         if has_args2: print(f"FAILED RESPONSE:\n{pp(e.args[2])}\n\n")
 
+@quote_cache.cached
 def try_swap(label, from_token, to_token, exchange=None, params={}, verbose=True, debug=False):
-    """calls swap endpoint Returns the result as a swap_data dict, {} if the call failed"""
+    """calls swap endpoint Returns the result as a swap_data dict, {} if the call failed. Results are cached briefly
+    (see quote_cache), which also covers get_quote"""
     try:
         is_totle = label == name()
         inputs = swap_inputs(from_token, to_token, exchange, params)
@@ -494,6 +511,7 @@ def try_swap(label, from_token, to_token, exchange=None, params={}, verbose=True
 # get quote
 def get_quote(from_token, to_token, from_amount=None, to_amount=None, dex=None, params={}, verbose=False, debug=False):
     if from_amount == 0: raise ValueError(f"from_amount is {from_amount} {from_token} params={params}")
+    params = dict(params) # defensive copy, params should not be modified
 
     if from_amount and to_amount:
         raise ValueError(f"{name()} only accepts either from_amount or to_amount, not both")
@@ -505,7 +523,10 @@ def get_quote(from_token, to_token, from_amount=None, to_amount=None, dex=None,
         raise ValueError(f"{name()}: either from_amount or to_amount must be specified")
 
     sd = try_swap(dex or name(), from_token, to_token, exchange=dex, params=params, verbose=verbose, debug=debug)
+    return quote_data(sd)
 
+def quote_data(sd):
+    """Converts a swap_data dict into a quote dict like the ones other aggregator clients return ({} if sd is empty)"""
     if sd:
         # keep consistent with exchanges_parts from other aggregators
         # TODO, this is not an order split, it is a multi-hop route
@@ -521,10 +542,106 @@ def get_quote(from_token, to_token, from_amount=None, to_amount=None, dex=None,
     else:
         return {}
 
+
+##############################################################################################
+#
+# functions to quote many swaps in one request
+#
+# The swap endpoint takes a list of swaps and returns a summary for each one that could be filled
+# (swaps are marked optional so one unfillable swap doesn't fail the others). Each summary is
+# split back out into a single-summary response so swap_data can handle it as usual, e.g.
+# sweeping 13 trade sizes for a token takes 1 request instead of 13.
+
+MAX_SWAPS_PER_REQUEST = 20
+
+def swaps_inputs(swaps, exchange=None, params={}):
+    """returns a dict for the swap API endpoint that quotes all the given swaps, which are (from_token, to_token,
+    swap_params) tuples with fromAmount or toAmount in swap_params (which override params)"""
+    inputs = [ swap_inputs(from_token, to_token, exchange, {**params, **swap_params}) for from_token, to_token, swap_params in swaps ]
+    base_inputs = { k: v for k, v in inputs[0].items() if k != 'swap' }
+    return {"swaps": [ {**i['swap'], "isOptional": True} for i in inputs ], **base_inputs}
+
+def split_swaps_response(response, swaps, inputs):
+    """Returns a (request, response) pair for each of the swaps in a multi-swap response, with the summary for that swap
+    as the only summary, or None in place of the response for a swap that has no summary"""
+    base_inputs = { k: v for k, v in inputs.items() if k != 'swaps' }
+    summaries = response.get('summary') or []
+    swap_summaries = match_summaries(summaries, [ (from_token, to_token, swap) for (from_token, to_token, _), swap in zip(swaps, inputs['swaps']) ])
+    return [ ({**base_inputs, 'swap': swap}, {**response, 'summary': [summary]} if summary else None) for swap, summary in zip(inputs['swaps'], swap_summaries) ]
+
+def match_summaries(summaries, swaps):
+    """Returns the summary for each of the given (from_token, to_token, swap input) swaps, or None for those without one.
+    A summary matches a swap with the same tokens if its amount is within the swap's minFillPercent of the requested
+    amount, and the closest matches are taken first, since unfillable swaps are left out of the response"""
+    candidates = []
+    for i, (from_token, to_token, swap) in enumerate(swaps):
+        amount_key = 'sourceAmount' if 'sourceAmount' in swap else 'destinationAmount'
+        for k, s in enumerate(summaries):
+            if s['sourceAsset']['symbol'].upper() != from_token.upper() or s['destinationAsset']['symbol'].upper() != to_token.upper(): continue
+            diff = abs(int(s[amount_key]) - int(swap[amount_key])) / int(swap[amount_key])
+            if diff <= 1 - swap['minFillPercent'] / 100: candidates.append((diff, i, k))
+
+    swap_summaries, used = [None] * len(swaps), set()
+    for _, i, k in sorted(candidates):
+        if swap_summaries[i] is None and k not in used:
+            swap_summaries[i] = summaries[k]
+            used.add(k)
+    return swap_summaries
+
+def try_swaps(label, swaps, exchange=None, params={}, verbose=True, debug=False):
+    """calls the swap endpoint with up to MAX_SWAPS_PER_REQUEST swaps per request. Returns a swap_data dict for each of
+    the given (from_token, to_token, swap_params) swaps, {} for those that failed. If a whole request fails, its swaps
+    are retried one at a time (see try_swap) so one bad swap doesn't cost the others their quotes"""
+    swaps = [ (from_token, to_token, dict(swap_params)) for from_token, to_token, swap_params in swaps ]
+    results = []
+    for i in range(0, len(swaps), MAX_SWAPS_PER_REQUEST):
+        batch = swaps[i:i + MAX_SWAPS_PER_REQUEST]
+        try:
+            inputs = swaps_inputs(batch, exchange, params)
+            j = post_with_retries(SWAP_ENDPOINT, inputs, debug=debug)
+            if 'success' not in j:
+                raise TotleAPIException("Unexpected JSON response", inputs, j)
+            elif not j['success']:
+                raise TotleAPIException(None, inputs, j)
+        except Exception as e:
+            if verbose: print(f"{label}: swaps request for {len(batch)} swaps failed ({e.args[0]}), trying them one at a time")
+            results += [ try_swap(label, from_token, to_token, exchange, {**params, **swap_params}, verbose=verbose, debug=debug) for from_token, to_token, swap_params in batch ]
+            continue
+
+        is_totle = label == name()
+        for (from_token, to_token, swap_params), (request, response) in zip(batch, split_swaps_response(j['response'], batch, inputs)):
+            if not response:
+                if verbose: print(f"{label}: Suggester returned no orders for {from_token}->{to_token} ({swap_params}) (id={j['response'].get('id')})")
+                results.append({})
+                continue
+            try:
+                results.append(swap_data(response, is_totle, request=request))
+            except Exception as e:
+                handle_swap_exception(e, label, from_token, to_token, {**params, **swap_params}, verbose=verbose)
+                results.append({})
+    return results
+
+def get_quotes(swaps, dex=None, params={}, verbose=False, debug=False):
+    """Returns a quote dict (as returned by get_quote) for each of the given (from_token, to_token, from_amount,
+    to_amount) swaps, with {} for the swaps that couldn't be quoted"""
+    swaps_params = []
+    for from_token, to_token, from_amount, to_amount in swaps:
+        if from_amount == 0: raise ValueError(f"from_amount is {from_amount} {from_token} params={params}")
+        if from_amount and to_amount:
+            raise ValueError(f"{name()} only accepts either from_amount or to_amount, not both")
+        elif from_amount:
+            swaps_params.append((from_token, to_token, {'fromAmount': from_amount}))
+        elif to_amount:
+            swaps_params.append((from_token, to_token, {'toAmount': to_amount}))
+        else:
+            raise ValueError(f"{name()}: either from_amount or to_amount must be specified")
+
+    return [ quote_data(sd) for sd in try_swaps(dex or name(), swaps_params, exchange=dex, params=params, verbose=verbose, debug=debug) ]
+
 def get_pairs(quote='ETH'):
     # Totle's trade/pairs endpoint returns only select pairs used for the data API, so we just use its tokens
     # endpoint to get tokens, which, if tradable=true, are assumed to pair with quote
-    tokens_json = requests.get(TOKENS_ENDPOINT).json()
+    tokens_json = json_utils.loads(http_utils.get(TOKENS_ENDPOINT).content)
 
     # use only the tokens that are listed in token_utils.tokens() and use the canonical name
     canonical_symbols = [ token_utils.canonical_symbol(t['symbol']) for t in tokens_json['tokens'] if t['tradable'] ]
@@ -539,7 +656,7 @@ def get_pairs(quote='ETH'):
 @functools.lru_cache(1)
 def get_trades_pairs():
     """Returns the set of trade pairs which can be passed to get_trades"""
-    r = requests.get(PAIRS_ENDPOINT).json()
+    r = json_utils.loads(http_utils.get(PAIRS_ENDPOINT).content)
     if r['success']:
         return r['response']
     else:  # some uncommon error we should look into
@@ -556,8 +673,8 @@ def get_trades(base_asset, quote_asset, limit=None, page=None, begin=None, end=N
     url = TRADES_ENDPOINT + f"/{base_asset}/{quote_asset}"
     timer_start = time.time()
     try:
-        r = requests.get(url, params=query)
-        j = r.json()
+        r = http_utils.get(url, params=query)
+        j = json_utils.loads(r.content)
     except ValueError as e:
         print(f"get_trades raised {type(e).__name__}: {e.args[0]}\nresponse was: {r}")
 
@@ -1,3 +1,4 @@
+import asyncio
 import glob
 import os
 import random
@@ -7,6 +8,7 @@ import concurrent.futures
 
 import json
 
+import async_quotes
 import dexag_client
 import exchange_utils
 import oneinch_client
@@ -17,7 +19,7 @@ import split_utils
 import token_utils
 import zrx_client
 import totle_client
-from v2_compare_prices import get_savings, print_savings, get_filename_base, SavingsCSV
+from v2_compare_prices import get_savings, print_savings, get_filename_base, savings_writer
 
 
 AGG_CLIENTS = [dexag_client, oneinch_client, oneinch_v2_client, oneinch_v3_client, paraswap_client, zrx_client]
@@ -37,23 +39,52 @@ def compare_totle_and_aggs_parallel(from_token, to_token, from_amount, usd_trade
 
         for f in concurrent.futures.as_completed(futures_agg):
             agg_name = futures_agg[f]
-            agg_quote = f.result()
-            if agg_quote:
-                # print(f"SUCCESSFUL getting {agg_name} quote for buying {to_token} with {from_amount} {from_token}")
-                if agg_quote['price'] == 0:
-                    print(f"DIVISION BY ZERO: {agg_name} buying {to_token} with {from_amount} {from_token} returned a price of {agg_quote['price']}")
-                    continue
-                savings = get_savings(agg_name, agg_quote['price'], totle_quote, to_token, usd_trade_size or from_amount, 'buy', agg_quote=agg_quote, quote_token=from_token, print_savings=False)
-                print(f"Totle saved {savings['pct_savings']:.2f} percent vs {agg_name} buying {to_token} with {from_amount} {from_token} on {savings['totle_used']}")
-                agg_savings[agg_name] = savings
-            else:
-                print(f"FAILED getting {agg_name} quote: had no price quote for buying {to_token} with {from_amount} {from_token}")
+            savings = get_agg_savings(agg_name, f.result(), totle_quote, from_token, to_token, from_amount, usd_trade_size)
+            if savings: agg_savings[agg_name] = savings
+
+    else:
+        print(f"FAILED getting Totle API Quote buying {to_token} with {from_amount} {from_token}")
+
+    return agg_savings
 
+async def compare_totle_and_aggs_async(from_token, to_token, from_amount, usd_trade_size=None):
+    """Same as compare_totle_and_aggs_parallel, but the Totle quote and all aggregator quotes are requested concurrently"""
+    agg_savings = {}
+
+    async def named_agg_quote(agg_client):
+        return agg_client.name(), await async_quotes.get_quote(agg_client, from_token, to_token, from_amount=from_amount)
+
+    totle_task = asyncio.ensure_future(async_quotes.try_swap(totle_client.name(), from_token, to_token, params={'fromAmount': from_amount}))
+    agg_tasks = [ asyncio.ensure_future(named_agg_quote(agg_client)) for agg_client in AGG_CLIENTS ]
+
+    totle_quote = await totle_task
+    if totle_quote:
+        for f in asyncio.as_completed(agg_tasks):
+            agg_name, agg_quote = await f
+            savings = get_agg_savings(agg_name, agg_quote, totle_quote, from_token, to_token, from_amount, usd_trade_size)
+            if savings: agg_savings[agg_name] = savings
     else:
         print(f"FAILED getting Totle API Quote buying {to_token} with {from_amount} {from_token}")
+        for t in agg_tasks: t.cancel() # quotes that have not been started yet are not needed
+        await asyncio.gather(*agg_tasks, return_exceptions=True)
 
     return agg_savings
 
+def get_agg_savings(agg_name, agg_quote, totle_quote, from_token, to_token, from_amount, usd_trade_size=None):
+    """Returns Totle's savings vs agg_quote, or None if the aggregator did not return a usable quote"""
+    if not agg_quote:
+        print(f"FAILED getting {agg_name} quote: had no price quote for buying {to_token} with {from_amount} {from_token}")
+        return None
+
+    # print(f"SUCCESSFUL getting {agg_name} quote for buying {to_token} with {from_amount} {from_token}")
+    if agg_quote['price'] == 0:
+        print(f"DIVISION BY ZERO: {agg_name} buying {to_token} with {from_amount} {from_token} returned a price of {agg_quote['price']}")
+        return None
+
+    savings = get_savings(agg_name, agg_quote['price'], totle_quote, to_token, usd_trade_size or from_amount, 'buy', agg_quote=agg_quote, quote_token=from_token, print_savings=False)
+    print(f"Totle saved {savings['pct_savings']:.2f} percent vs {agg_name} buying {to_token} with {from_amount} {from_token} on {savings['totle_used']}")
+    return savings
+
 def get_token_prices(tokens):
     cmc_data = json.load(open(f'data/cmc_tokens.json'))['data']
     usd_prices = {t['symbol']: float(t['quote']['USD']['price']) for t in cmc_data if t['symbol'] in tokens and t['platform']['token_address'] not in token_utils.ADDRESSES_TO_FILTER_OUT }
@@ -96,7 +127,7 @@ def do_metamask_top_pairs():
     usd_prices = get_token_prices(metamask_top_tokens)
 
     filename = get_filename_base(prefix='totle_vs_agg_metamask_top_pairs', suffix=order_type)
-    with SavingsCSV(filename, fieldnames=CSV_FIELDS) as csv_writer:
+    with savings_writer(filename, fieldnames=CSV_FIELDS) as csv_writer:
         for pair in METAMASK_TOP_PAIRS: # these were recorded as (base,quote) i.e. (to_token, from_token)
             to_token, from_token = pair
             for usd_trade_size in USD_TRADE_SIZES:
@@ -125,33 +156,34 @@ ROWAN_SPLIT_FRIENDLY = ['DAI', 'USDC', 'USDT', 'WBTC', 'UMA', 'renBTC', 'SNX', '
 GANG_OF_FOUR = ['BAL', 'KNC', 'LEND', 'REPV2']
 
 
-tokens = ROWAN_SPLIT_FRIENDLY + GANG_OF_FOUR
-random.shuffle(tokens)
 TRADE_SIZES  = [20.0, 30.0, 40.0, 50.0, 100.0, 200.0, 300.0, 400.0, 500.0, 1000.0, 1500.0, 2000.0, 2500.0]
 
-def do_eth_pairs_parallel():
+def eth_pair_tokens():
+    """Returns the tokens to compare against ETH, shuffled for each run"""
+    tokens = ROWAN_SPLIT_FRIENDLY + GANG_OF_FOUR
+    random.shuffle(tokens)
+    return tokens
+
+def do_eth_pairs_parallel(max_concurrency=async_quotes.MAX_CONCURRENCY):
+    tokens = eth_pair_tokens()
     all_buy_savings = defaultdict(lambda: defaultdict(lambda: defaultdict(dict))) # extra lambda prevents KeyError in print_savings
     order_type, quote = 'buy', 'ETH'
     filename = get_filename_base(prefix='totle_vs_agg_eth_pairs', suffix=order_type)
-    with SavingsCSV(filename, fieldnames=CSV_FIELDS) as csv_writer:
-        todo = []
-
-        for base in tokens:
-            for trade_size in TRADE_SIZES:
-                todo.append((compare_totle_and_aggs_parallel, quote, base, trade_size))
-
-        MAX_THREADS = 1
-        print(f"Queueing up {len(todo)} todos ({len(tokens)} tokens x {len(TRADE_SIZES)} trade sizes) for execution on {MAX_THREADS} workers")
-        with concurrent.futures.ThreadPoolExecutor(max_workers=MAX_THREADS) as executor:
-            futures_p = {executor.submit(*p): p for p in todo}
-
-            for f in concurrent.futures.as_completed(futures_p):
-                _, quote, base, trade_size = futures_p[f]
-                agg_savings = f.result()
-                for agg_name, savings in agg_savings.items():
-                    all_buy_savings[agg_name][base][trade_size] = savings
-                    print(f"WRITING savings to CSV ...")
-                    csv_writer.append(savings)
+    with savings_writer(filename, fieldnames=CSV_FIELDS) as csv_writer:
+        async def compare_and_write(base, trade_size):
+            agg_savings = await compare_totle_and_aggs_async(quote, base, trade_size)
+            # runs on the event loop thread, so rows are streamed to the CSV as each pair completes without locking
+            for agg_name, savings in agg_savings.items():
+                all_buy_savings[agg_name][base][trade_size] = savings
+                print(f"WRITING savings to CSV ...")
+                csv_writer.append(savings)
+
+        async def compare_all():
+            await asyncio.gather(*[ compare_and_write(base, trade_size) for base in tokens for trade_size in TRADE_SIZES ])
+
+        async_quotes.configure(max_concurrency)
+        print(f"Queueing up {len(tokens) * len(TRADE_SIZES)} comparisons ({len(tokens)} tokens x {len(TRADE_SIZES)} trade sizes) with at most {max_concurrency} requests in flight")
+        asyncio.run(compare_all())
 
     # print(json.dumps(all_buy_savings, indent=3))
 
@@ -165,10 +197,11 @@ def do_eth_pairs_parallel():
 
 
 def do_eth_pairs():
+    tokens = eth_pair_tokens()
     all_buy_savings = defaultdict(lambda: defaultdict(lambda: defaultdict(dict))) # extra lambda prevents KeyError in print_savings
     order_type, quote = 'buy', 'ETH'
     filename = get_filename_base(prefix='totle_vs_agg_eth_pairs', suffix=order_type)
-    with SavingsCSV(filename, fieldnames=CSV_FIELDS) as csv_writer:
+    with savings_writer(filename, fieldnames=CSV_FIELDS) as csv_writer:
         for base in tokens:
             for trade_size in TRADE_SIZES:
                 agg_savings = compare_totle_and_aggs_parallel(quote, base, trade_size)
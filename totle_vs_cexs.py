@@ -10,7 +10,7 @@ import huobi_client
 import kraken_client
 import totle_client
 import v2_compare_prices
-from v2_compare_prices import best_price_with_fees, get_savings, print_savings, get_filename_base, SavingsCSV
+from v2_compare_prices import best_price_with_fees, get_savings, print_savings, get_filename_base, savings_writer
 
 def compare_totle_and_cexs(cex_name_client, base, quote, trade_size, books, order_type, totle_quote=None, fee_override=None):
     print(f"compare_totle_and_cexs client_names = {list(cex_name_client.keys())}")
@@ -95,7 +95,7 @@ def main():
 
     for order_type in ['buy', 'sell']:
         filename = get_filename_base(prefix='totle_vs_cexs', suffix=order_type)
-        with SavingsCSV(filename, fieldnames=CSV_FIELDS) as csv_writer:
+        with savings_writer(filename, fieldnames=CSV_FIELDS) as csv_writer:
             for token, cex_list in select_token_cexs.items(): # Each token has it's own list of CEXs that support token/ETH pair
                 # Get books for the 8 CEXs from cryptowatch
                 bids, asks = {}, {}
@@ -6,7 +6,7 @@ from collections import defaultdict
 import token_utils
 import totle_client
 import v2_compare_prices
-from v2_compare_prices import compare_dex_prices, print_average_savings, get_filename_base, SavingsCSV, redirect_stdout
+from v2_compare_prices import compare_dex_prices, print_average_savings, get_filename_base, savings_writer, redirect_stdout
 
 ##############################################################################################
 #
@@ -49,7 +49,7 @@ def do_eth_pairs(order_type='buy'):
     all_savings, all_supported_pairs = {}, {}
 
     CSV_FIELDS = "time id action trade_size token quote exchange exchange_price totle_used totle_price totle_splits pct_savings splits ex_prices".split()
-    with SavingsCSV(filename, fieldnames=CSV_FIELDS) as csv_writer:
+    with savings_writer(filename, fieldnames=CSV_FIELDS) as csv_writer:
         for trade_size in TRADE_SIZES:
 
             non_liquid_tokens = []
@@ -82,28 +82,31 @@ def do_eth_pairs(order_type='buy'):
 # Main program
 #
 
-working_dir = os.path.dirname(__file__)
-if working_dir: os.chdir(working_dir)
+def main():
+    working_dir = os.path.dirname(__file__)
+    if working_dir: os.chdir(working_dir)
 
 
-# Define program arguments
-parser = argparse.ArgumentParser(description='Run price comparisons')
-parser.add_argument('--sell', dest='orderType', action='store_const', const='sell', default='buy', help='execute sell orders (default is buy)')
-parser.add_argument('maxMarketSlippagePercent', type=int, nargs='?', help='acceptable percent of slippage')
-parser.add_argument('maxExecutionSlippagePercent', type=int, nargs='?', help='acceptable percent of execution slippage')
-parser.add_argument('minFillPercent', type=int, nargs='?', help='acceptable percent of amount to acquire')
-parser.add_argument('partnerContract', nargs='?', help='address of partner fee contract')
-parser.add_argument('apiKey', nargs='?', help='API key')
+    # Define program arguments
+    parser = argparse.ArgumentParser(description='Run price comparisons')
+    parser.add_argument('--sell', dest='orderType', action='store_const', const='sell', default='buy', help='execute sell orders (default is buy)')
+    parser.add_argument('maxMarketSlippagePercent', type=int, nargs='?', help='acceptable percent of slippage')
+    parser.add_argument('maxExecutionSlippagePercent', type=int, nargs='?', help='acceptable percent of execution slippage')
+    parser.add_argument('minFillPercent', type=int, nargs='?', help='acceptable percent of amount to acquire')
+    parser.add_argument('partnerContract', nargs='?', help='address of partner fee contract')
+    parser.add_argument('apiKey', nargs='?', help='API key')
 
-params = vars(parser.parse_args())
+    params = vars(parser.parse_args())
 
-order_type = params['orderType']
-filename = get_filename_base(suffix=order_type)
-redirect_stdout(filename)
+    order_type = params['orderType']
+    filename = get_filename_base(suffix=order_type)
+    redirect_stdout(filename)
 
-all_savings, all_supported_pairs = do_eth_pairs(order_type)
+    all_savings, all_supported_pairs = do_eth_pairs(order_type)
 
-print_average_savings(all_savings)
-print_supported_pairs(all_supported_pairs)
-reportnegative_savings(all_savings)
+    print_average_savings(all_savings)
+    print_supported_pairs(all_supported_pairs)
+    reportnegative_savings(all_savings)
 
+if __name__ == "__main__":
+    main()
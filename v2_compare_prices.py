@@ -3,8 +3,14 @@ import csv
 from collections import defaultdict
 from datetime import datetime
 
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None # pyarrow is only needed for Parquet output (see SavingsParquet)
+
 import exchange_utils
-from split_utils import is_multi_split, canonicalize_and_sort_splits
+from split_utils import is_multi_split, canonicalize_and_sort_splits, split_entries, splits_from_entries
 
 import totle_client
 
@@ -279,6 +285,85 @@ class SavingsCSV():
     def __exit__(self, type, value, traceback):
         self.csvfile.close()
 
+##############################################################################################
+#
+# Parquet methods
+#
+
+# Columns not listed here are stored as strings
+FLOAT_FIELDS = {'trade_size', 'exchange_price', 'totle_price', 'pct_savings', 'agg_price', 'no_split_totle_price', 'no_split_pct_savings',
+                'totle_split_price', 'totle_split_pct_savings', 'cost_error_pct', 'tokens_error_pct'}
+SPLIT_FIELDS = {'splits', 'totle_splits', 'agg_split', 'totle_split'} # stored as list<struct<route, pair, dex, pct, is_int>> (see split_utils.split_entries)
+PRICE_MAP_FIELDS = {'ex_prices'} # stored as map<dex, price>
+
+def parquet_type(field):
+    if field == 'time': return pa.timestamp('us')
+    if field in FLOAT_FIELDS: return pa.float64()
+    if field in SPLIT_FIELDS: return pa.list_(pa.struct([('route', pa.int32()), ('pair', pa.string()), ('dex', pa.string()), ('pct', pa.float64()), ('is_int', pa.bool_())]))
+    if field in PRICE_MAP_FIELDS: return pa.map_(pa.string(), pa.float64())
+    return pa.string()
+
+def parquet_value(field, value):
+    if value is None or value == '': return None
+    if field == 'time': return datetime.fromisoformat(value) if isinstance(value, str) else value
+    if field in FLOAT_FIELDS: return float(value)
+    if field in SPLIT_FIELDS: return split_entries(value)
+    if field in PRICE_MAP_FIELDS: return list(value.items())
+    return str(value)
+
+class SavingsParquet():
+    """Same interface as SavingsCSV, but writes a typed Parquet file with splits as nested columns. Rows are buffered and
+    written row_group_size at a time, so (unlike SavingsCSV) up to row_group_size rows are lost if the process dies"""
+    def __init__(self, filename, fieldnames=CSV_FIELDS, row_group_size=5000):
+        if not pa: raise ImportError("SavingsParquet requires pyarrow (pip install pyarrow)")
+        self.filename = filename if filename.endswith('.parquet') else filename + '.parquet'
+        self.fieldnames = fieldnames
+        self.row_group_size = row_group_size
+        self.schema = pa.schema([ (f, parquet_type(f)) for f in fieldnames ])
+
+    def __enter__(self):
+        self.rows = []
+        self.parquet_writer = pq.ParquetWriter(self.filename, self.schema, compression='zstd')
+        return self
+
+    def append(self, savings):
+        self.writerow(savings)
+
+    def writerow(self, rowdict):
+        self.rows.append(rowdict)
+        if len(self.rows) >= self.row_group_size: self.flush()
+
+    def writerows(self, rowdicts):
+        for r in rowdicts: self.writerow(r)
+
+    def flush(self):
+        if not self.rows: return
+        columns = { f: [ parquet_value(f, r.get(f)) for r in self.rows ] for f in self.fieldnames }
+        self.parquet_writer.write_table(pa.table(columns, schema=self.schema))
+        self.rows = []
+
+    def __exit__(self, type, value, traceback):
+        self.flush()
+        self.parquet_writer.close()
+
+def read_savings_parquet(filename):
+    """Yields the rows of a file written by SavingsParquet as dicts, with splits and ex_prices converted back to dicts"""
+    if not pa: raise ImportError("read_savings_parquet requires pyarrow (pip install pyarrow)")
+    parquet_file = pq.ParquetFile(filename)
+    for i in range(parquet_file.num_row_groups):
+        for row in parquet_file.read_row_group(i).to_pylist():
+            for f in row:
+                if f in SPLIT_FIELDS and row[f] is not None: row[f] = splits_from_entries(row[f])
+                elif f in PRICE_MAP_FIELDS and row[f] is not None: row[f] = dict(row[f])
+            yield row
+
+SAVINGS_WRITERS = {'csv': SavingsCSV, 'parquet': SavingsParquet}
+OUTPUT_FORMAT = 'csv'
+
+def savings_writer(filename, fieldnames=CSV_FIELDS, output_format=None):
+    """Returns a SavingsCSV or SavingsParquet (depending on output_format, default OUTPUT_FORMAT) for filename"""
+    return SAVINGS_WRITERS[output_format or OUTPUT_FORMAT](filename, fieldnames=fieldnames)
+
 ##############################################################################################
 #
 # txt file methods
@@ -2,6 +2,9 @@ import json
 import sys
 import functools
 import requests
+import http_utils
+import json_utils
+import quote_cache
 import token_utils
 
 # https://0x.org/docs/api
@@ -28,6 +31,7 @@ def fee_pct():
 
 
 # get quote
+@quote_cache.cached
 def get_quote(from_token, to_token, from_amount=None, to_amount=None, dex=None, verbose=False, debug=False):
     return get_swap(from_token, to_token, from_amount=from_amount, to_amount=to_amount, dex=dex, verbose=verbose, debug=debug)
 
@@ -54,8 +58,8 @@ def get_swap(from_token, to_token, from_amount=None, to_amount=None, dex=None, f
     if debug: print(f"REQUEST to {SWAP_ENDPOINT}:\n{json.dumps(query, indent=3)}\n\n")
     r = None
     try:
-        r = requests.get(SWAP_ENDPOINT, params=query)
-        j = r.json()
+        r = http_utils.get(SWAP_ENDPOINT, params=query)
+        j = json_utils.loads(r.content)
         if debug: print(f"RESPONSE from {SWAP_ENDPOINT}:\n{json.dumps(j, indent=3)}\n\n")
 
         # Response: